@@ -1,8 +1,13 @@
+import time
+from typing import Optional
+
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from . import shared_state
+from .cache import LRUCache
 from .config import settings
 from .database import get_database
 from .models import schemas
@@ -12,6 +17,34 @@ from .services import user_service
 # tokenUrl points to the login endpoint. The path is relative to the root.
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
+# Verified token -> (user, generation) for recently seen tokens, so most
+# requests skip both the JWT signature check and the user lookup.
+_user_cache = LRUCache(max_size=lambda: settings.auth_cache_max_entries, name="auth")
+
+# Bumped per email by invalidate_user; cached entries from an older generation
+# are ignored. Other workers see a bump within SHARED_STATE_SYNC_SECONDS.
+_user_generations = shared_state.Generations("auth")
+
+async def invalidate_user(email: str):
+    """
+    Drops every cached token for a user, in every worker. Call this whenever
+    a user's password changes or their account is deleted.
+    """
+    await _user_generations.bump(email)
+
+def token_subject(token: str) -> Optional[str]:
+    """
+    The email a token was issued to, or None if it is not a valid token.
+    Cheap enough to call before routing: cached tokens skip the signature check.
+    """
+    cached = _user_cache.peek(token)
+    if cached is not None:
+        return cached[0].email
+    try:
+        return jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]).get("sub")
+    except JWTError:
+        return None
+
 async def get_current_user(
     token: str = Depends(oauth2_scheme), 
     db: AsyncIOMotorDatabase = Depends(get_database)
@@ -25,6 +58,12 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+    cached = _user_cache.get(token)
+    if cached is not None:
+        user, generation = cached
+        if generation == _user_generations.get(user.email):
+            return user
+
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
@@ -34,7 +73,14 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
+    generation = _user_generations.get(token_data.email)
     user = await user_service.get_user_by_email(db, email=token_data.email)
     if user is None:
         raise credentials_exception
+
+    if settings.auth_cache_ttl_seconds > 0:
+        # Never cache a token past its own expiry
+        ttl = min(settings.auth_cache_ttl_seconds, payload.get("exp", float("inf")) - time.time())
+        if ttl > 0:
+            _user_cache.set(token, (user, generation), ttl=ttl)
     return user
@@ -0,0 +1,113 @@
+import time
+from collections import OrderedDict
+from functools import cached_property
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple, Union
+
+
+class LRUCache:
+    """
+    An in-process, size-bounded LRU cache with optional expiry.
+    Each entry's size comes from `sizeof` (1 per entry by default), and the
+    least recently used entries are evicted once the total exceeds `max_size`.
+    It is not thread-safe; it is meant to be used from the event loop.
+    A cache given a `name` reports its stats at /metrics.
+    `max_size` and `ttl` may be callables, read on first use, so module-level
+    caches can be sized from settings that are not loaded yet.
+    """
+    def __init__(
+        self,
+        max_size: Union[int, Callable[[], int]],
+        sizeof: Callable[[Any], int] = lambda value: 1,
+        ttl: Union[None, float, Callable[[], Optional[float]]] = None,
+        name: Optional[str] = None,
+    ):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._sizeof = sizeof
+        self._entries: "OrderedDict[Hashable, Tuple[Any, int, Optional[float]]]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        if name is not None:
+            _named_caches[name] = self
+
+    @cached_property
+    def max_size(self) -> int:
+        return self._max_size() if callable(self._max_size) else self._max_size
+
+    @cached_property
+    def ttl(self) -> Optional[float]:
+        return self._ttl() if callable(self._ttl) else self._ttl
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        value, _, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self.pop(key)
+            self.misses += 1
+            return default
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Like get, but leaves the entry's recency and the hit and miss counts alone."""
+        entry = self._entries.get(key)
+        if entry is None or (entry[2] is not None and entry[2] <= time.monotonic()):
+            return default
+        return entry[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Stores a value; `ttl` overrides the cache-wide expiry for this entry."""
+        self.pop(key)
+        size = self._sizeof(value)
+        if size > self.max_size:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._entries[key] = (value, size, expires_at)
+        self.size += size
+        while self.size > self.max_size:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        self.size -= entry[1]
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "size": self.size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+
+_MISSING = object()
+
+_named_caches: Dict[str, LRUCache] = {}
+
+def named_caches() -> Dict[str, LRUCache]:
+    """Caches created with a name, by name."""
+    return dict(_named_caches)
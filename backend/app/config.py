@@ -1,3 +1,5 @@
+from functools import lru_cache
+from typing import Any, Dict, List, Literal, Optional, Union
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,9 +13,174 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
 
+    # MongoDB client: connection pool bounds (when a minimum is set, the pool
+    # is opened up to it at startup), how long a request may wait for a free
+    # connection before failing (unset waits indefinitely), wire compression,
+    # and the read preference and write concern. Unset options keep the value
+    # from the connection string or the driver's default (a pool of up to 100
+    # connections, none opened in advance).
+    mongo_max_pool_size: Optional[int] = None
+    mongo_min_pool_size: Optional[int] = None
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_compressors: List[Literal["zstd", "snappy", "zlib"]] = []
+    mongo_read_preference: Optional[Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"]] = None
+    mongo_write_concern: Optional[Union[int, Literal["majority"]]] = None
+    mongo_write_concern_timeout_ms: Optional[int] = None
+    # How long the database ping in /health/ready may take
+    mongo_health_timeout_seconds: float = 2.0
+
+    # Authenticated-user cache: how long a verified token maps to its user
+    # without a database lookup (0 disables it), and how many tokens to keep.
+    auth_cache_ttl_seconds: float = 30.0
+    auth_cache_max_entries: int = 10_000
+
+    # Password hashing: bcrypt cost factor (existing hashes are upgraded on
+    # login when it changes) and the bounded thread pool bcrypt runs in.
+    bcrypt_rounds: int = 12
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 64
+    password_hash_retry_after_seconds: int = 1
+
+    # Insights response cache: how many (user, endpoint) responses to keep
+    insights_cache_max_entries: int = 5000
+
+    # Serve expense lists and insights through the orjson fast path, which
+    # skips re-validating documents the app wrote itself
+    fast_json_responses: bool = False
+
+    # Expense import: rows validated and inserted per insert_many batch
+    import_batch_size: int = 1000
+
+    # OCR executor: worker processes, how many uploads may wait for a worker,
+    # and the per-pass Tesseract timeout.
+    ocr_workers: int = 2
+    ocr_max_queue: int = 8
+    ocr_retry_after_seconds: int = 5
+    ocr_pass_timeout_seconds: float = 20.0
+
+    # OCR passes to try, in order (names from ocr_engine.OCR_PASSES), and the
+    # score (mean word confidence, plus a bonus for a keyword-anchored total)
+    # at which the engine stops early.
+    ocr_passes: List[Literal["simple", "adaptive", "otsu", "denoise", "deskew"]] = ["simple", "adaptive", "otsu", "denoise", "deskew"]
+    ocr_confidence_threshold: float = 80.0
+
+    # Preprocessing: receipts are cropped and scaled to this width in pixels
+    # before OCR. Larger uploads are rejected, and each OCR worker process can
+    # be capped to a memory limit in MB (0 means no limit).
+    ocr_target_width: int = 1000
+    ocr_max_upload_bytes: int = 15 * 1024 * 1024
+    ocr_max_image_pixels: int = 50_000_000
+    ocr_worker_memory_limit_mb: int = 0
+
+    # OCR result cache for re-uploaded receipts: an in-memory LRU tier bounded
+    # in bytes, backed by an optional Mongo collection with a TTL.
+    ocr_cache_max_bytes: int = 32 * 1024 * 1024
+    ocr_cache_persistent: bool = True
+    ocr_cache_ttl_days: int = 30
+
+    # Batch receipt upload: maximum receipts per request (zip contents
+    # included) and their maximum total size in bytes once unpacked
+    ocr_batch_max_files: int = 100
+    ocr_batch_max_bytes: int = 200 * 1024 * 1024
+
+    # Receipt category rules: defaults to the bundled app/data/category_rules.json.
+    # Edits to the file are picked up without a restart; it is checked at most
+    # this often (0 disables reloading).
+    category_rules_path: Optional[str] = None
+    category_rules_reload_seconds: float = 5.0
+
+    # Learned per-user categories: memory for cached models, how long a cached
+    # model is used before reloading it (other processes train it too), and
+    # how much evidence a prediction needs before it beats the rules.
+    category_model_cache_max_bytes: int = 64 * 1024 * 1024
+    category_model_cache_ttl_seconds: float = 300.0
+    category_model_min_examples: int = 5
+    category_model_min_confidence: float = 0.6
+
+    # Asynchronous OCR jobs: worker loops run inside the API process
+    # (set to 0 when running `python -m app.worker` separately).
+    ocr_job_workers: int = 1
+    ocr_job_poll_seconds: float = 1.0
+    ocr_job_lease_seconds: int = 300
+
+    # Subsystems to load at startup instead of on first use: "ocr" (the OCR
+    # engine, in each OCR pool process) and "analytics" (NumPy).
+    warmup_preload: List[Literal["ocr", "analytics"]] = []
+
+    # State shared across worker processes: cache invalidations, counters and
+    # rate-limit buckets are kept in this process ("local") or in Mongo
+    # ("mongo", needed with more than one worker or node; `python -m app.serve`
+    # uses it unless told otherwise when it starts several workers). Other
+    # workers' invalidations reach this one at most this many seconds later.
+    shared_state_backend: Literal["local", "mongo"] = "local"
+    shared_state_sync_seconds: float = 1.0
+
+    # `python -m app.serve`: API worker processes (default: one per core not
+    # used by the OCR worker's pool), and OCR pool processes in each API worker
+    # for synchronous uploads, which are not sent to the OCR worker.
+    api_workers: Optional[int] = None
+    api_ocr_workers: int = 1
+
+    # Rate limiting: every user (or client IP, for the auth endpoints and
+    # requests without a valid token) has a bucket of up to RATE_LIMIT_BURST
+    # tokens, refilled at RATE_LIMIT_RATE a second. Requests cost 1 token
+    # unless their "METHOD /path" is listed here. Buckets are per process,
+    # at most this many of them, unless shared through the shared state.
+    rate_limit_enabled: bool = True
+    rate_limit_rate: float = 5.0
+    rate_limit_burst: float = 60.0
+    rate_limit_route_costs: Dict[str, float] = {
+        "POST /api/auth/token": 10,
+        "POST /api/auth/register": 10,
+        "POST /api/upload/receipt": 20,
+        "POST /api/upload/receipts": 60,
+        "POST /api/upload/jobs": 20,
+        "POST /api/expenses/import": 20,
+        "GET /api/expenses/export": 10,
+        "GET /api/expenses/stream": 5,
+    }
+    rate_limit_max_buckets: int = 100_000
+    rate_limit_shared: bool = False
+
+    # Metrics at /metrics, in the Prometheus text format. With a token set,
+    # scrapers must send it as a bearer token.
+    metrics_enabled: bool = True
+    metrics_token: Optional[str] = None
+
+    # Slow-request traces: this share of requests is traced, and traced ones
+    # slower than this many seconds are printed with their database commands
+    # and OCR stages (0 disables tracing).
+    slow_request_seconds: float = 0.0
+    slow_request_sample_rate: float = 1.0
+
+    # Report each request's database round trips in an X-DB-Calls response
+    # header. For development: it exposes how requests are served.
+    db_calls_header: bool = False
+
     class Config:
         # Specifies the file to load environment variables from
         env_file = ".env"
 
-# Create a single instance of the settings to be used throughout the app
-settings = Settings()
\ No newline at end of file
+@lru_cache
+def get_settings() -> Settings:
+    """The settings, read from the environment and .env the first time they are needed."""
+    return Settings()
+
+class _LazySettings:
+    """
+    The app-wide settings. The environment is read on first use rather than
+    on import, so modules (and tools such as `python -m app.serve --help`)
+    can be imported before it is complete. Keep it that way: code that runs
+    at import time must not read settings (module-level caches take their
+    sizes as callables; see LRUCache).
+    """
+    # __getattribute__ rather than __getattr__: it skips the failed lookup on
+    # the proxy itself, which keeps reads on hot paths cheap.
+    def __getattribute__(self, name: str) -> Any:
+        return getattr(get_settings(), name)
+
+    def __setattr__(self, name: str, value: Any):
+        setattr(get_settings(), name, value)
+
+# A single settings object used throughout the app
+settings = _LazySettings()
@@ -1,5 +1,15 @@
+import asyncio
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional
+
 import motor.motor_asyncio
+from pymongo import common, monitoring
+from . import metrics
 from .config import settings
+from .indexes import ensure_indexes
+from .services import db_ops
 
 class MongoDB:
     client: motor.motor_asyncio.AsyncIOMotorClient = None
@@ -8,13 +18,133 @@ class MongoDB:
 # Create an instance of the MongoDB connection manager
 db_manager = MongoDB()
 
+# Recent checkout waits kept for the percentiles in /health/ready
+_RECENT_WAITS = 1000
+
+class ConnectionPoolStats(monitoring.ConnectionPoolListener):
+    """
+    Tracks the driver's connection pools from pymongo's pool events: open
+    and checked-out connections, requests waiting for one, and how long
+    checkouts waited. Events arrive on Motor's threads, hence the lock.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        # Each server has its own pool of up to this many connections (0 for
+        # no limit); the real value, which may come from the connection
+        # string, is learned when a pool is created.
+        self.max_pool_size: Optional[int] = common.MAX_POOL_SIZE
+        self._checked_out_by_server: Counter = Counter()
+        self._recent_waits: Deque[float] = deque(maxlen=_RECENT_WAITS)
+
+    def connection_created(self, event: monitoring.ConnectionCreatedEvent):
+        with self._lock:
+            self.open += 1
+
+    def connection_closed(self, event: monitoring.ConnectionClosedEvent):
+        with self._lock:
+            self.open -= 1
+
+    def connection_check_out_started(self, event: monitoring.ConnectionCheckOutStartedEvent):
+        with self._lock:
+            self.waiting += 1
+
+    def connection_checked_out(self, event: monitoring.ConnectionCheckedOutEvent):
+        with self._lock:
+            self.waiting -= 1
+            self.checked_out += 1
+            self._checked_out_by_server[event.address] += 1
+            self._recent_waits.append(event.duration)
+        metrics.mongo_pool_checkout_wait.observe(event.duration)
+
+    def connection_check_out_failed(self, event: monitoring.ConnectionCheckOutFailedEvent):
+        with self._lock:
+            self.waiting -= 1
+            self.checkout_failures += 1
+        metrics.mongo_pool_checkout_failures.inc(event.reason)
+
+    def connection_checked_in(self, event: monitoring.ConnectionCheckedInEvent):
+        with self._lock:
+            self.checked_out -= 1
+            self._checked_out_by_server[event.address] -= 1
+
+    def pool_created(self, event: monitoring.PoolCreatedEvent):
+        # Options left at the driver's defaults are not listed
+        with self._lock:
+            self.max_pool_size = event.options.get("maxPoolSize", common.MAX_POOL_SIZE)
+
+    # Other lifecycle and readiness events carry nothing the stats need
+
+    def pool_ready(self, event: monitoring.PoolReadyEvent):
+        pass
+
+    def pool_cleared(self, event: monitoring.PoolClearedEvent):
+        pass
+
+    def pool_closed(self, event: monitoring.PoolClosedEvent):
+        pass
+
+    def connection_ready(self, event: monitoring.ConnectionReadyEvent):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool usage, with checkout wait percentiles over the recent checkouts."""
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            busiest = max(self._checked_out_by_server.values(), default=0)
+            stats = {
+                "max_pool_size": self.max_pool_size,
+                "open": self.open,
+                "checked_out": self.checked_out,
+                "waiting": self.waiting,
+                # The busiest server's pool, as that is the one requests queue for
+                "utilisation": round(busiest / self.max_pool_size, 3) if self.max_pool_size else 0.0,
+                "checkout_failures": self.checkout_failures,
+            }
+        for name, fraction in (("p50", 0.5), ("p95", 0.95), ("max", 1.0)):
+            wait = waits[min(len(waits) - 1, int(fraction * len(waits)))] if waits else 0.0
+            stats[f"checkout_wait_{name}_ms"] = round(wait * 1000, 2)
+        return stats
+
+pool_stats = ConnectionPoolStats()
+
+def _client_options() -> Dict[str, Any]:
+    """Client keyword arguments from the settings; unset ones are left to the URI or the driver."""
+    options: Dict[str, Any] = {"event_listeners": [metrics.mongo_command_listener, pool_stats]}
+    if settings.mongo_max_pool_size is not None:
+        options["maxPoolSize"] = settings.mongo_max_pool_size
+    if settings.mongo_min_pool_size is not None:
+        options["minPoolSize"] = settings.mongo_min_pool_size
+    if settings.mongo_wait_queue_timeout_ms is not None:
+        options["waitQueueTimeoutMS"] = settings.mongo_wait_queue_timeout_ms
+    if settings.mongo_compressors:
+        options["compressors"] = ",".join(settings.mongo_compressors)
+    if settings.mongo_read_preference is not None:
+        options["readPreference"] = settings.mongo_read_preference
+    if settings.mongo_write_concern is not None:
+        options["w"] = settings.mongo_write_concern
+    if settings.mongo_write_concern_timeout_ms is not None:
+        options["wTimeoutMS"] = settings.mongo_write_concern_timeout_ms
+    return options
+
+async def _prewarm_pool(db: motor.motor_asyncio.AsyncIOMotorDatabase, connections: int):
+    # Concurrent pings each need their own connection, so the first requests
+    # after startup do not pay for connection setup and the TLS handshake.
+    await asyncio.gather(*(db_ops.command(db, "ping") for _ in range(max(connections, 1))))
+
 async def connect_to_mongo():
     """
     Connects to the MongoDB instance on application startup.
     """
     print("Connecting to MongoDB...")
-    db_manager.client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongo_details)
+    db_manager.client = motor.motor_asyncio.AsyncIOMotorClient(settings.mongo_details, **_client_options())
     db_manager.db = db_manager.client[settings.database_name]
+    if settings.mongo_min_pool_size:
+        await _prewarm_pool(db_manager.db, settings.mongo_min_pool_size)
+    await ensure_indexes(db_manager.db)
     print("Successfully connected to MongoDB!")
 
 async def close_mongo_connection():
@@ -25,8 +155,17 @@ async def close_mongo_connection():
     db_manager.client.close()
     print("MongoDB connection closed.")
 
+async def check_database() -> Dict[str, Any]:
+    """
+    Pings the database and reports the connection pool's state. Raises
+    asyncio.TimeoutError if the ping takes longer than MONGO_HEALTH_TIMEOUT_SECONDS.
+    """
+    started = time.perf_counter()
+    await asyncio.wait_for(db_ops.command(db_manager.db, "ping"), timeout=settings.mongo_health_timeout_seconds)
+    return {"ping_ms": round((time.perf_counter() - started) * 1000, 2), "pool": pool_stats.stats()}
+
 def get_database() -> motor.motor_asyncio.AsyncIOMotorDatabase:
     """
     A dependency function to get the database instance for API endpoints.
     """
-    return db_manager.db
\ No newline at end of file
+    return db_manager.db
@@ -0,0 +1,165 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from .config import settings
+
+try:
+    import resource
+except ImportError:
+    # Unix only; OCR_WORKER_MEMORY_LIMIT_MB cannot be applied elsewhere
+    resource = None
+
+
+class ExecutorBusyError(Exception):
+    """
+    Raised when a bounded executor's admission queue is full.
+    `retry_after` is the number of seconds the client should wait before retrying.
+    """
+    def __init__(self, name: str, retry_after: int):
+        super().__init__(f"The {name} executor is at capacity.")
+        self.retry_after = retry_after
+
+
+class BoundedExecutor:
+    """
+    Runs blocking work in a pool without tying up the event loop.
+    At most `max_workers` jobs run at once and at most `max_queue` more may wait;
+    anything beyond that is rejected immediately with ExecutorBusyError.
+    """
+    def __init__(self, name: str, executor_factory: Callable[[int], Executor]):
+        self.name = name
+        self._executor_factory = executor_factory
+        self.pool: Optional[Executor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.max_workers = 0
+        self.max_queue = 0
+        self.retry_after = 1
+        # Queue metrics
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.timed_out = 0
+        self.rejected = 0
+
+    def start(self, max_workers: int, max_queue: int, retry_after: int = 1):
+        """Creates the underlying pool. Called from the application lifespan."""
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self.pool = self._executor_factory(max_workers)
+        self._slots = asyncio.Semaphore(max_workers + max_queue)
+
+    def shutdown(self):
+        """Stops the pool, dropping any work that has not started yet."""
+        if self.pool is not None:
+            self.pool.shutdown(wait=True, cancel_futures=True)
+            self.pool = None
+            self._slots = None
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """
+        Runs `fn(*args)` in the pool and returns its result.
+        Raises ExecutorBusyError if the admission queue is full and
+        asyncio.TimeoutError if the job does not finish within `timeout` seconds.
+        A job that times out keeps its slot until the worker actually finishes it,
+        so abandoned jobs still count against the admission bound.
+        """
+        if self.pool is None:
+            raise RuntimeError(f"The {self.name} executor has not been started.")
+        if self._slots.locked():
+            self.rejected += 1
+            raise ExecutorBusyError(self.name, self.retry_after)
+
+        slots = self._slots
+        await slots.acquire()
+        self.in_flight += 1
+        loop = asyncio.get_running_loop()
+        try:
+            job = self.pool.submit(fn, *args)
+        except BaseException:
+            self._release(slots)
+            raise
+        job.add_done_callback(lambda _: self._release_threadsafe(loop, slots))
+
+        try:
+            result = await asyncio.wait_for(asyncio.wrap_future(job), timeout=timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        self.completed += 1
+        return result
+
+    def _release(self, slots: asyncio.Semaphore):
+        self.in_flight -= 1
+        slots.release()
+
+    def _release_threadsafe(self, loop: asyncio.AbstractEventLoop, slots: asyncio.Semaphore):
+        """Done callback for pool futures, which may run on a worker or pool management thread."""
+        try:
+            loop.call_soon_threadsafe(self._release, slots)
+        except RuntimeError:
+            # The loop has already closed during shutdown; nothing is waiting on the slot.
+            pass
+
+    def stats(self) -> Dict[str, int]:
+        """Reports capacity and load; `queued` jobs are admitted but waiting for a worker."""
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "running": min(self.in_flight, self.max_workers),
+            "queued": max(self.in_flight - self.max_workers, 0),
+            "completed": self.completed,
+            "failed": self.failed,
+            "timed_out": self.timed_out,
+            "rejected": self.rejected,
+        }
+
+
+def _limit_worker_memory(limit_mb: int):
+    """Caps a worker process's address space so one huge image cannot exhaust the host."""
+    limit = limit_mb * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _create_ocr_pool(workers: int) -> Executor:
+    if settings.ocr_worker_memory_limit_mb > 0 and resource is None:
+        print("Warning: OCR_WORKER_MEMORY_LIMIT_MB is not supported on this platform and is ignored.")
+    elif settings.ocr_worker_memory_limit_mb > 0:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_limit_worker_memory,
+            initargs=(settings.ocr_worker_memory_limit_mb,),
+        )
+    return ProcessPoolExecutor(max_workers=workers)
+
+# CV and Tesseract work is CPU bound and holds the GIL in places, so it gets processes.
+ocr_executor = BoundedExecutor("OCR", _create_ocr_pool)
+
+# bcrypt releases the GIL while hashing, so threads are enough to keep it off the event loop.
+password_executor = BoundedExecutor(
+    "password hashing",
+    lambda workers: ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash"),
+)
+
+
+def start_executors():
+    """Starts all bounded executors on application startup."""
+    ocr_executor.start(
+        max_workers=settings.ocr_workers,
+        max_queue=settings.ocr_max_queue,
+        retry_after=settings.ocr_retry_after_seconds,
+    )
+    password_executor.start(
+        max_workers=settings.password_hash_workers,
+        max_queue=settings.password_hash_max_queue,
+        retry_after=settings.password_hash_retry_after_seconds,
+    )
+
+
+def shutdown_executors():
+    """Shuts down all bounded executors on application shutdown."""
+    ocr_executor.shutdown()
+    password_executor.shutdown()
@@ -0,0 +1,253 @@
+# backend/app/indexes.py
+"""
+Index bootstrap and query-plan verification.
+
+`ensure_indexes` runs from `connect_to_mongo` on every startup and is a no-op
+when the indexes already exist. The diagnostic command explains every query
+shape the services issue and exits non-zero if any of them is a COLLSCAN:
+
+    python -m app.indexes
+"""
+import asyncio
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from . import shared_state
+from .config import settings
+from .models.schemas import UserInDB
+from .services import category_model_service, expense_service, job_service, ocr_cache, rollup_service, user_service
+
+# MongoDB's error code when a unique index cannot be built over existing duplicates
+DUPLICATE_KEY = 11000
+# Stands in for the unique email index while duplicate emails remain
+EMAIL_FALLBACK_INDEX = "email_id"
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    user_service.USERS_COLLECTION: [
+        # Looked up on every authenticated request; unique so concurrent registrations cannot both succeed
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+    ],
+    expense_service.EXPENSES_COLLECTION: [
+        # Serves owner filters, date ranges and the (date, _id) keyset pagination sort
+        IndexModel([("owner_id", ASCENDING), ("date", DESCENDING), ("_id", DESCENDING)], name="owner_date"),
+        IndexModel([("owner_id", ASCENDING), ("category", ASCENDING), ("date", DESCENDING)], name="owner_category_date"),
+    ],
+    rollup_service.EXPENSE_ROLLUPS_COLLECTION: [
+        # One bucket per user, month and category; also the key rebuilds upsert on
+        IndexModel([("owner_id", ASCENDING), ("month", ASCENDING), ("category", ASCENDING)], name="owner_month_category", unique=True),
+    ],
+    job_service.OCR_JOBS_COLLECTION: [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)], name="status_created"),
+    ],
+}
+
+async def _find_index(db: AsyncIOMotorDatabase, collection: str, keys: List[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+    """The existing index on exactly these keys, whatever its name."""
+    async for index in db[collection].list_indexes():
+        if list(index["key"].items()) == keys:
+            return index
+    return None
+
+async def _ensure_ttl_index(db: AsyncIOMotorDatabase, collection: str, field: str, expire_after_seconds: int):
+    """
+    Creates a TTL index on `field`, or updates the expiry of the one already
+    there in place. Earlier versions created it under the default name
+    (`created_at_1`), so the existing index is looked up by key.
+    """
+    existing = await _find_index(db, collection, [(field, ASCENDING)])
+    if existing is None:
+        await db[collection].create_index(field, name=f"{field}_ttl", expireAfterSeconds=expire_after_seconds)
+    elif "expireAfterSeconds" not in existing:
+        # A plain index on the field cannot be turned into a TTL index in place
+        await db[collection].drop_index(existing["name"])
+        await db[collection].create_index(field, name=f"{field}_ttl", expireAfterSeconds=expire_after_seconds)
+    elif existing["expireAfterSeconds"] != expire_after_seconds:
+        await db.command("collMod", collection, index={"name": existing["name"], "expireAfterSeconds": expire_after_seconds})
+
+async def _duplicate_emails(db: AsyncIOMotorDatabase, limit: int = 10) -> List[Dict[str, Any]]:
+    return await db[user_service.USERS_COLLECTION].aggregate([
+        {"$group": {"_id": "$email", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$limit": limit},
+    ]).to_list(None)
+
+async def _ensure_user_indexes(db: AsyncIOMotorDatabase):
+    """
+    Creates the unique email index. Registration used to allow duplicate
+    emails, so on a deployment that has some the index cannot be built: the
+    duplicates are reported and a non-unique index keeps lookups fast until
+    they are merged or removed and the app restarts.
+    """
+    users = db[user_service.USERS_COLLECTION]
+    try:
+        await users.create_indexes(INDEXES[user_service.USERS_COLLECTION])
+    except OperationFailure as e:
+        if e.code != DUPLICATE_KEY:
+            raise
+        duplicates = await _duplicate_emails(db)
+        listed = ", ".join(f"{doc['_id']} ({doc['count']} accounts)" for doc in duplicates)
+        print(
+            f"ERROR: cannot create the unique index on {user_service.USERS_COLLECTION}.email because some "
+            f"emails belong to more than one account: {listed}. Until they are resolved, registering an "
+            f"existing email concurrently can still create another duplicate."
+        )
+        await users.create_index([("email", ASCENDING), ("_id", ASCENDING)], name=EMAIL_FALLBACK_INDEX)
+    else:
+        if await _find_index(db, user_service.USERS_COLLECTION, [("email", ASCENDING), ("_id", ASCENDING)]) is not None:
+            await users.drop_index(EMAIL_FALLBACK_INDEX)
+
+async def ensure_indexes(db: AsyncIOMotorDatabase):
+    """Creates every index the services rely on."""
+    await _ensure_user_indexes(db)
+    for collection, indexes in INDEXES.items():
+        if collection != user_service.USERS_COLLECTION:
+            await db[collection].create_indexes(indexes)
+    if settings.ocr_cache_persistent:
+        await _ensure_ttl_index(db, ocr_cache.OCR_CACHE_COLLECTION, "created_at", settings.ocr_cache_ttl_days * 24 * 3600)
+    if settings.shared_state_backend == "mongo":
+        await db[shared_state.SHARED_STATE_COLLECTION].create_indexes([
+            # Read by every worker's sync; buckets and the epoch have no updated_at
+            IndexModel([("updated_at", ASCENDING)], name="updated_at", sparse=True),
+            IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+        ])
+
+
+# --- QUERY-PLAN VERIFICATION ---
+
+def query_shapes() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Every query shape the services issue, as explainable commands.
+    Keep this in step with the services when adding new queries.
+    """
+    user = UserInDB(email="explain@example.com", hashed_password="")
+    now = datetime.now(timezone.utc)
+    expenses = expense_service.EXPENSES_COLLECTION
+    rollups = rollup_service.EXPENSE_ROLLUPS_COLLECTION
+    newest_first = {"date": -1, "_id": -1}
+
+    def find(query: Dict[str, Any], sort: Dict[str, int] = newest_first) -> Dict[str, Any]:
+        return {"find": expenses, "filter": query, "sort": sort}
+
+    page_query = expense_service.build_expense_query(user)
+    cursor = expense_service.encode_cursor({"date": now, "_id": ObjectId()})
+    date, expense_id = expense_service.decode_cursor(cursor)
+    keyset_query = {"$and": [page_query, {"$or": [
+        {"date": {"$lt": date}},
+        {"date": date, "_id": {"$lt": expense_id}},
+    ]}]}
+    batch_query = {"_id": {"$in": [ObjectId(), ObjectId()]}, "owner_id": user.id}
+
+    return [
+        ("user_service.get_user_by_email",
+         {"find": user_service.USERS_COLLECTION, "filter": {"email": user.email}, "limit": 1}),
+        ("expense_service.find_expenses",
+         find(page_query)),
+        ("expense_service.find_expenses (cursor)",
+         find(keyset_query)),
+        ("expense_service.find_expenses (date range)",
+         find(expense_service.build_expense_query(user, start_date=now - timedelta(days=30), end_date=now))),
+        ("expense_service.find_expenses (category)",
+         find(expense_service.build_expense_query(user, category="Food", start_date=now - timedelta(days=30)))),
+        ("expense_service.find_expenses (amount range)",
+         find(expense_service.build_expense_query(user, min_amount=10, max_amount=100))),
+        ("expense_service.update_expense_by_id",
+         {"find": expenses, "filter": {"_id": ObjectId(), "owner_id": user.id}}),
+        ("expense_service._find_batch_targets (ids)",
+         {"find": expenses, "filter": batch_query}),
+        ("expense_service._find_batch_targets (filter)",
+         {"find": expenses, "filter": expense_service.build_expense_query(user, category="Food", end_date=now)}),
+        ("expense_service.update_expenses",
+         {"update": expenses, "updates": [{"q": batch_query, "u": {"$set": {"category": "Food"}}, "multi": True}]}),
+        ("expense_service.delete_expenses",
+         {"delete": expenses, "deletes": [{"q": batch_query, "limit": 0}]}),
+        ("rollup_service.apply_changes",
+         {"find": rollups, "filter": {"owner_id": user.id, "month": rollup_service.month_of(now), "category": "Food"}}),
+        ("insights_service.get_dashboard_summary",
+         {"aggregate": rollups, "pipeline": [
+             {"$match": {"owner_id": user.id}},
+             {"$group": {"_id": None, "total": {"$sum": "$total"}}},
+         ], "cursor": {}}),
+        ("insights_service.get_spending_by_category",
+         {"aggregate": rollups, "pipeline": [
+             {"$match": {"owner_id": user.id, "count": {"$gt": 0}}},
+             {"$group": {"_id": "$category", "total_amount": {"$sum": "$total"}}},
+         ], "cursor": {}}),
+        ("analytics_service.get_spending_timeseries",
+         {"aggregate": expenses, "pipeline": [
+             {"$match": {"owner_id": user.id, "date": {"$gte": now - timedelta(days=90), "$lte": now}}},
+             {"$group": {"_id": {"$dateTrunc": {"date": "$date", "unit": "day"}}, "total": {"$sum": "$amount"}}},
+         ], "cursor": {}}),
+        ("analytics_service.get_top_merchants",
+         {"aggregate": expenses, "pipeline": [
+             {"$match": {"owner_id": user.id, "date": {"$gte": now - timedelta(days=30), "$lte": now}}},
+             {"$group": {"_id": {"$toLower": {"$trim": {"input": "$description"}}}, "total": {"$sum": "$amount"}}},
+             {"$sort": {"total": -1}},
+             {"$limit": 10},
+         ], "cursor": {}}),
+        ("analytics_service.get_category_matrix",
+         {"find": rollups, "filter": {"owner_id": user.id, "month": {"$gte": rollup_service.month_of(now)}, "count": {"$gt": 0}}}),
+        ("job_service.claim_next_job",
+         {"find": job_service.OCR_JOBS_COLLECTION, "filter": {"$or": [
+             {"status": job_service.JOB_QUEUED},
+             {"status": job_service.JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+         ]}, "sort": {"created_at": 1}, "limit": 1}),
+        ("job_service.get_job",
+         {"find": job_service.OCR_JOBS_COLLECTION, "filter": {"_id": ObjectId(), "owner_id": user.id}}),
+        ("category_model_service.get_model",
+         {"find": category_model_service.CATEGORY_MODELS_COLLECTION, "filter": {"_id": user.id}}),
+        ("ocr_cache.get_cached_result",
+         {"find": ocr_cache.OCR_CACHE_COLLECTION, "filter": {"_id": "key"}}),
+        ("shared_state.MongoSharedState.take",
+         {"findAndModify": shared_state.SHARED_STATE_COLLECTION, "query": {"_id": "rate:user:explain"},
+          "update": [{"$set": {"tokens": {"$ifNull": ["$tokens", 1]}, "refilled_at": 0}}], "upsert": True}),
+        ("shared_state.MongoSharedState.changes_since",
+         {"find": shared_state.SHARED_STATE_COLLECTION, "filter": {"updated_at": {"$gt": now - timedelta(seconds=5)}}}),
+    ]
+
+def _plan_stages(plan: Any) -> List[str]:
+    """Collects every stage name in an explain() plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(_plan_stages(value))
+    elif isinstance(plan, list):
+        for value in plan:
+            stages.extend(_plan_stages(value))
+    return stages
+
+async def find_collection_scans(db: AsyncIOMotorDatabase) -> List[Tuple[str, List[str]]]:
+    """Explains every query shape and returns those whose winning plan scans a collection."""
+    failures = []
+    for name, command in query_shapes():
+        explained = await db.command({"explain": command, "verbosity": "queryPlanner"})
+        # Aggregations nest the query planner output under their $cursor stage
+        stages = _plan_stages(explained.get("queryPlanner", {}).get("winningPlan")) or _plan_stages(explained.get("stages"))
+        print(f"{'COLLSCAN' if 'COLLSCAN' in stages else 'ok':<9} {name}: {' <- '.join(stages)}")
+        if "COLLSCAN" in stages:
+            failures.append((name, stages))
+    return failures
+
+async def main() -> int:
+    from .database import connect_to_mongo, close_mongo_connection, get_database
+
+    await connect_to_mongo()
+    try:
+        failures = await find_collection_scans(get_database())
+    finally:
+        await close_mongo_connection()
+    if failures:
+        print(f"{len(failures)} query shape(s) do a collection scan.")
+        return 1
+    print("Every query shape uses an index.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,24 @@
+import importlib
+from types import ModuleType
+from typing import Any
+
+class LazyModule(ModuleType):
+    """
+    Stands in for a module until one of its attributes is first used, then
+    imports it. Lets a module that only sometimes needs a heavy dependency
+    (numpy, cv2) keep a plain `np.zeros(...)` style without paying for the
+    import at startup. Modules using it should start with
+    `from __future__ import annotations`, so `np.ndarray` annotations are
+    not evaluated at import time either.
+    """
+    def __init__(self, name: str):
+        super().__init__(name)
+
+    def __getattr__(self, attr: str) -> Any:
+        module = importlib.import_module(self.__name__)
+        # Later lookups find the module's attributes here directly
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+def lazy_module(name: str) -> ModuleType:
+    return LazyModule(name)
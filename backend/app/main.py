@@ -1,16 +1,32 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import hmac
+import time
 
-from .database import connect_to_mongo, close_mongo_connection
-from .routers import auth_router, expenses_router, insights_router, upload_router # <-- ADDED upload_router
+from . import metrics, rate_limit, shared_state, warmup
+from .config import settings
+from .database import connect_to_mongo, close_mongo_connection, get_database
+from .executors import start_executors, shutdown_executors
+from .services import db_ops, rollup_service
+from .worker import job_workers
+from .routers import auth_router, expenses_router, health_router, insights_router, upload_router # <-- ADDED upload_router
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Code to run on application startup
     await connect_to_mongo()
+    await shared_state.start(get_database())
+    await rollup_service.backfill_if_empty(get_database())
+    start_executors()
+    await warmup.preload(settings.warmup_preload)
+    job_workers.start(get_database(), settings.ocr_job_workers)
     yield
     # Code to run on application shutdown
+    await job_workers.stop()
+    shutdown_executors()
+    await shared_state.stop()
     await close_mongo_connection()
 
 app = FastAPI(
@@ -20,6 +36,10 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# --- Rate Limiting ---
+# Added before CORS so that 429 responses pass through it and carry CORS headers
+app.middleware("http")(rate_limit.limit_requests)
+
 # --- CORS Middleware ---
 app.add_middleware(
     CORSMiddleware,
@@ -29,11 +49,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Request Instrumentation ---
+def _route_template(request: Request) -> str:
+    """
+    The request path with its path parameters named ("/api/expenses/{expense_id}"),
+    so latency series stay bounded. Requests no route matched share one series.
+    """
+    route = request.scope.get("route")
+    if route is None:
+        return "unmatched"
+    # Newer FastAPI versions keep an included router's routes relative to its
+    # prefix; the prefix is the part of the path before the route's own match.
+    path = request.scope["path"]
+    for start in (index for index, char in enumerate(path) if char == "/"):
+        if route.path_regex.match(path[start:]):
+            return path[:start] + route.path
+    return route.path
+
+@app.middleware("http")
+async def instrument_request(request: Request, call_next):
+    """
+    Records each request's latency by route template. With DB_CALLS_HEADER
+    set, it also reports the database round trips the request made in
+    X-DB-Calls, so a change that adds queries to a hot path is visible.
+    Calls made while a streamed body is being sent happen after the headers
+    and are not counted.
+    """
+    metrics.http_requests_in_flight.inc()
+    started = time.perf_counter()
+    trace = metrics.start_trace()
+    status_code = 500
+    try:
+        with db_ops.count_db_calls() as counter:
+            response = await call_next(request)
+        status_code = response.status_code
+        if settings.db_calls_header:
+            response.headers["X-DB-Calls"] = str(counter.calls)
+        return response
+    finally:
+        seconds = time.perf_counter() - started
+        metrics.http_requests_in_flight.dec()
+        route_path = _route_template(request)
+        metrics.http_request_duration.observe(seconds, request.method, route_path, str(status_code))
+        metrics.log_if_slow(trace, request.method, route_path, status_code, seconds, dict(counter.by_operation))
+
 # --- API Routers ---
 app.include_router(auth_router.router, tags=["Authentication"], prefix="/api/auth")
 app.include_router(expenses_router.router, tags=["Expenses"], prefix="/api/expenses")
 app.include_router(insights_router.router, tags=["Insights"], prefix="/api/insights")
 app.include_router(upload_router.router, tags=["Upload"], prefix="/api/upload") # <-- ADDED THIS LINE
+app.include_router(health_router.router, tags=["Health"], prefix="/health")
+
+# --- Metrics Endpoint ---
+@app.get("/metrics", include_in_schema=False)
+async def read_metrics(request: Request):
+    """ Metrics for this process in the Prometheus text format. """
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metrics_token and not hmac.compare_digest(
+        request.headers.get("Authorization", "").encode(), f"Bearer {settings.metrics_token}".encode()
+    ):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid metrics token.")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 # --- Root Endpoint ---
 @app.get("/", tags=["Root"])
@@ -0,0 +1,322 @@
+"""
+Process-wide metrics, served at /metrics in the Prometheus text format.
+
+Request latency and in-flight counts come from the request middleware,
+MongoDB command timings from a pymongo command listener, and OCR stage
+timings from the OCR engine. Executor and cache gauges are read when the
+endpoint is scraped. Every number is for this process only; with several
+processes, each is scraped on its own.
+
+Requests can also carry a trace of their database commands and OCR stages;
+a sampled share of them is traced, and traced requests slower than
+SLOW_REQUEST_SECONDS are printed.
+"""
+import bisect
+import json
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+from .config import settings
+
+try:
+    import resource
+except ImportError:
+    # Unix only; the peak memory gauge is left out elsewhere
+    resource = None
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{%s}" % ",".join(pairs) if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Metric(ABC):
+    """
+    A named metric with a fixed set of labels. Label values are passed
+    positionally, in the order the label names were given. Updates are
+    thread-safe, since the Mongo listener reports from Motor's threads.
+    """
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    @abstractmethod
+    def samples(self) -> Iterable[str]:
+        """The metric's sample lines in the Prometheus text format."""
+
+    def render(self) -> str:
+        return "\n".join([f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}", *self.samples()])
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1):
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, *labelvalues: str, amount: float = 1):
+        self.inc(*labelvalues, amount=-amount)
+
+    def set(self, value: float, *labelvalues: str):
+        with self._lock:
+            self._values[labelvalues] = value
+
+class CallbackGauge(Metric):
+    """A gauge whose values are read from `collect` at scrape time, as (label values, value) pairs."""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], collect: Callable[[], Iterable[Tuple[LabelValues, float]]]):
+        super().__init__(name, help, labelnames)
+        self._collect = collect
+
+    def samples(self) -> Iterable[str]:
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in self._collect()]
+
+class CallbackCounter(CallbackGauge):
+    """A counter kept elsewhere (such as executor or cache stats), read at scrape time."""
+    type = "counter"
+
+class Histogram(Metric):
+    """Counts observations into fixed buckets (upper bounds in seconds) per label set."""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], buckets: Sequence[float]):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: a count per bucket (the last for +Inf), the sum and the count
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, *labelvalues: str):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+        lines = []
+        for key, counts, total, count in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="%s"' % _number(float(bound))
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+_registry: List[Metric] = []
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+# --- REQUEST TRACES ---
+
+# Spans kept per trace; a large import makes thousands of database calls
+MAX_TRACE_SPANS = 200
+
+class RequestTrace:
+    """Timed steps (database commands, OCR stages) of one request, for slow-request logs."""
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+        self.dropped = 0
+
+    def add(self, name: str, seconds: float):
+        if len(self.spans) < MAX_TRACE_SPANS:
+            self.spans.append((name, seconds))
+        else:
+            self.dropped += 1
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+def start_trace() -> Optional[RequestTrace]:
+    """
+    Starts tracing the current request if slow-request logging is on and it is
+    sampled. Work the request does, including in tasks it starts, is traced.
+    """
+    if settings.slow_request_seconds <= 0 or random.random() >= settings.slow_request_sample_rate:
+        return None
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+def record_span(name: str, seconds: float):
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+def log_if_slow(trace: Optional[RequestTrace], method: str, route: str, status: int, seconds: float, db_calls: Dict[str, int]):
+    if trace is None or seconds < settings.slow_request_seconds:
+        return
+    print("Slow request: " + json.dumps({
+        "method": method,
+        "route": route,
+        "status": status,
+        "ms": round(seconds * 1000, 1),
+        "db_calls": db_calls,
+        "spans": [[name, round(span * 1000, 2)] for name, span in trace.spans],
+        "dropped_spans": trace.dropped,
+    }))
+
+# --- APPLICATION METRICS ---
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_MONGO_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight", "Requests being handled.")
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route template.",
+    ("method", "route", "status"), _LATENCY_BUCKETS)
+http_requests_rate_limited = Counter(
+    "http_requests_rate_limited_total", "Requests refused with a 429, by what they were limited by (user or ip).",
+    ("limited_by",))
+mongo_command_duration = Histogram(
+    "mongo_command_duration_seconds", "MongoDB command round trips, by collection and command.",
+    ("collection", "command"), _MONGO_BUCKETS)
+mongo_command_failures = Counter(
+    "mongo_command_failures_total", "MongoDB commands that returned an error.",
+    ("collection", "command"))
+mongo_pool_checkout_wait = Histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the MongoDB pool.",
+    (), _MONGO_BUCKETS)
+mongo_pool_checkout_failures = Counter(
+    "mongo_pool_checkout_failures_total", "Connection checkouts that failed, such as wait queue timeouts.",
+    ("reason",))
+ocr_stage_duration = Histogram(
+    "ocr_stage_duration_seconds",
+    "Time in each OCR stage. Per-pass stages carry the pass name; queue is the wait for an OCR worker.",
+    ("stage", "pass"), _LATENCY_BUCKETS)
+
+def _executor_stats() -> Iterable[Tuple[str, Dict[str, int]]]:
+    from .executors import ocr_executor, password_executor
+    return [(executor.name, executor.stats()) for executor in (ocr_executor, password_executor)]
+
+def _register_stats(prefix: str, label: str, source: Callable[[], Iterable[Tuple[str, Dict[str, Any]]]], stats: Iterable[Tuple[type, str, str]]):
+    """One metric per stat, labelled by `label`; counters get the conventional _total suffix."""
+    for metric_class, stat, help in stats:
+        name = f"{prefix}_{stat}_total" if metric_class is CallbackCounter else f"{prefix}_{stat}"
+        metric_class(name, help, (label,), lambda stat=stat: [((key,), values[stat]) for key, values in source()])
+
+_register_stats("executor", "executor", _executor_stats, [
+    (CallbackGauge, "max_workers", "Workers in the executor's pool."),
+    (CallbackGauge, "running", "Jobs running in the executor."),
+    (CallbackGauge, "queued", "Jobs admitted to the executor and waiting for a worker."),
+    (CallbackCounter, "completed", "Jobs the executor has finished successfully."),
+    (CallbackCounter, "failed", "Jobs that raised an error in the executor."),
+    (CallbackCounter, "timed_out", "Jobs abandoned after their timeout; they keep a slot until the worker finishes."),
+    (CallbackCounter, "rejected", "Jobs turned away because the executor's queue was full."),
+])
+
+def _pool_stats() -> Iterable[Tuple[str, Dict[str, Any]]]:
+    from .database import pool_stats
+    return [("mongodb", pool_stats.stats())]
+
+_register_stats("mongo_pool", "pool", _pool_stats, [
+    (CallbackGauge, "open", "Open connections to MongoDB, over all servers."),
+    (CallbackGauge, "checked_out", "Connections in use, over all servers."),
+    (CallbackGauge, "waiting", "Operations waiting for a free connection."),
+    (CallbackGauge, "utilisation", "Share of the busiest server's pool in use."),
+])
+
+def _cache_stats() -> Iterable[Tuple[str, Dict[str, Any]]]:
+    from .cache import named_caches
+    return [(name, cache.stats()) for name, cache in named_caches().items()]
+
+_register_stats("cache", "cache", _cache_stats, [
+    (CallbackGauge, "entries", "Entries in the in-process cache."),
+    (CallbackGauge, "size", "Size of the in-process cache, in its own units (entries or bytes)."),
+    (CallbackGauge, "max_size", "Capacity of the in-process cache, in its own units."),
+    (CallbackCounter, "hits", "Lookups the in-process cache answered."),
+    (CallbackCounter, "misses", "Lookups the in-process cache could not answer, expired entries included."),
+    (CallbackCounter, "evictions", "Entries evicted from the in-process cache to make room."),
+])
+
+def _ocr_cache_stats() -> Iterable[Tuple[str, Dict[str, Any]]]:
+    from .services import ocr_cache
+    return [("ocr", ocr_cache.stats.as_dict())]
+
+_register_stats("ocr_cache", "cache", _ocr_cache_stats, [
+    (CallbackCounter, "memory_hits", "OCR runs saved by the in-memory result cache."),
+    (CallbackCounter, "persistent_hits", "OCR runs saved by the MongoDB result cache."),
+    (CallbackCounter, "misses", "Receipts that had to be run through OCR."),
+    (CallbackCounter, "saved_ocr_seconds", "OCR time saved by cached results."),
+])
+
+CallbackCounter("process_cpu_seconds_total", "CPU time used by this process.", (), lambda: [((), time.process_time())])
+if resource is not None:
+    # ru_maxrss is in KB on Linux
+    CallbackGauge("process_max_resident_memory_bytes", "Peak resident memory of this process.", (),
+                  lambda: [((), resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)])
+
+# --- MONGODB COMMAND LISTENER ---
+
+class MongoCommandTimings(monitoring.CommandListener):
+    """
+    Times every command the driver sends. The listener is called on the
+    thread that ran the command, where Motor has copied the caller's context,
+    so commands also land in the trace of the request that issued them.
+    """
+    def __init__(self):
+        self._collections: Dict[Tuple[Any, int], str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        # Most commands name their collection as the command's value; getMore names it separately
+        target = event.command.get(event.command_name)
+        collection = target if isinstance(target, str) else event.command.get("collection", "")
+        self._collections[(event.connection_id, event.request_id)] = collection
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event)
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        collection = self._finish(event)
+        mongo_command_failures.inc(collection, event.command_name)
+
+    def _finish(self, event) -> str:
+        collection = self._collections.pop((event.connection_id, event.request_id), "")
+        seconds = event.duration_micros / 1e6
+        mongo_command_duration.observe(seconds, collection, event.command_name)
+        record_span(f"mongo {collection}.{event.command_name}" if collection else f"mongo {event.command_name}", seconds)
+        return collection
+
+mongo_command_listener = MongoCommandTimings()
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import BaseModel, Field, EmailStr, model_validator
 from bson import ObjectId
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 
 # This class is only used for internal validation within other Pydantic models.
@@ -55,8 +55,13 @@ class ExpenseBase(BaseModel):
     category: str = Field(..., example="Food")
     date: datetime = Field(..., example="2025-09-05T10:00:00Z")
 
+# Longest receipt text accepted alongside a new expense
+MAX_RECEIPT_TEXT_LENGTH = 20000
+
 class ExpenseCreate(ExpenseBase):
-    pass
+    # Not stored: the user's category model learns from the receipt an expense was
+    # scanned from, and only the receipt's hashed features are kept with it
+    receipt_text: Optional[str] = Field(None, max_length=MAX_RECEIPT_TEXT_LENGTH, exclude=True)
 
 class ExpenseUpdate(BaseModel):
     description: Optional[str] = None
@@ -77,6 +82,58 @@ class ExpenseInDB(MongoBaseModel):
     owner_id: PyObjectId
 
 
+# --- Batch Expense Schemas ---
+# Most ids or matched expenses a single batch request may touch
+MAX_BATCH_EXPENSES = 10000
+
+class ExpenseFilter(BaseModel):
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    category: Optional[str] = None
+    min_amount: Optional[float] = Field(None, ge=0)
+    max_amount: Optional[float] = Field(None, ge=0)
+
+class ExpenseSelection(BaseModel):
+    """Selects expenses either by id or by filter, but not both."""
+    ids: Optional[List[str]] = Field(None, max_length=MAX_BATCH_EXPENSES, example=["60c72b2f9b1e8b3b3e3e3e3f"])
+    filter: Optional[ExpenseFilter] = None
+
+    @model_validator(mode="after")
+    def check_one_selector(self):
+        if (self.ids is None) == (self.filter is None):
+            raise ValueError("Provide either `ids` or `filter`.")
+        return self
+
+class ExpenseBatchUpdate(ExpenseSelection):
+    update: ExpenseUpdate
+
+class ExpenseBatchDelete(ExpenseSelection):
+    pass
+
+class CategorySuggestion(BaseModel):
+    category: str = Field(..., example="Food")
+    confidence: Optional[float] = Field(None, example=0.92)
+    source: str = Field(..., example="learned")
+
+class ExpenseBatchItemResult(BaseModel):
+    id: str
+    status: str = Field(..., example="updated")
+
+class ExpenseBatchResponse(BaseModel):
+    matched: int
+    results: List[ExpenseBatchItemResult]
+
+# --- Receipt Job Schemas ---
+class ReceiptJobResponse(BaseModel):
+    id: str = Field(..., example="60c72b2f9b1e8b3b3e3e3e40")
+    status: str = Field(..., example="queued")
+    filename: str = Field(..., example="receipt.jpg")
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+
 # --- Token Schemas ---
 class Token(BaseModel):
     access_token: str
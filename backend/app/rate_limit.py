@@ -0,0 +1,65 @@
+"""
+Per-client rate limiting with token buckets.
+
+Each user has a bucket refilled at RATE_LIMIT_RATE tokens a second, holding
+up to RATE_LIMIT_BURST. Each request takes its route's cost from it
+(RATE_LIMIT_ROUTE_COSTS, 1 for anything not listed), so an OCR upload or a
+bcrypt login uses up far more than listing expenses. Requests that find too
+few tokens get a 429 with Retry-After and take nothing. The auth endpoints,
+and requests without a valid token, are limited by client IP instead.
+"""
+import math
+
+from fastapi import Request, status
+from fastapi.responses import JSONResponse
+
+from . import auth, metrics, shared_state
+from .config import settings
+
+# Probes and scrapes are never limited
+EXEMPT_PREFIXES = ("/health", "/metrics")
+
+def client_key(request: Request) -> str:
+    """Whose bucket a request takes from: "user:<email>" or "ip:<address>"."""
+    if not request.url.path.startswith("/api/auth/"):
+        scheme, _, token = request.headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            subject = auth.token_subject(token)
+            if subject is not None:
+                return f"user:{subject}"
+    # Behind a proxy, uvicorn's --proxy-headers puts the original client here
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def route_cost(request: Request) -> float:
+    cost = settings.rate_limit_route_costs.get(f"{request.method} {request.url.path}", 1.0)
+    # A cost above the burst could never be paid
+    return min(cost, settings.rate_limit_burst)
+
+def _buckets() -> shared_state.SharedState:
+    # A shared store costs a round trip per request, so it is opt-in;
+    # otherwise each worker process enforces the limits on its own.
+    return shared_state.state if settings.rate_limit_shared else shared_state.local_state
+
+async def limit_requests(request: Request, call_next):
+    """Middleware refusing requests whose client has run out of tokens."""
+    if not settings.rate_limit_enabled or request.method == "OPTIONS" or request.url.path.startswith(EXEMPT_PREFIXES):
+        return await call_next(request)
+
+    key = client_key(request)
+    try:
+        retry_after = await _buckets().take(
+            f"rate:{key}", route_cost(request), settings.rate_limit_rate, settings.rate_limit_burst
+        )
+    except Exception as e:
+        # Fail open: an unreachable shared store must not take the API down with it
+        print(f"Rate limit check failed: {e!r}")
+        retry_after = 0.0
+
+    if retry_after > 0:
+        metrics.http_requests_rate_limited.inc(key.partition(":")[0])
+        return JSONResponse(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            content={"detail": "Too many requests. Please try again shortly."},
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+    return await call_next(request)
@@ -0,0 +1,47 @@
+# backend/app/rollups.py
+"""
+Rebuilds or checks the per-user monthly expense rollups behind the insights
+endpoints. Run it after restoring a backup, importing data directly into
+MongoDB, or whenever the check reports drift:
+
+    python -m app.rollups [--email user@example.com] [--check]
+"""
+import argparse
+import asyncio
+import sys
+
+from .database import connect_to_mongo, close_mongo_connection, get_database
+from .services import rollup_service, user_service
+
+async def main(email: str = None, check: bool = False) -> int:
+    await connect_to_mongo()
+    try:
+        db = get_database()
+        owner_id = None
+        if email is not None:
+            user = await user_service.get_user_by_email(db, email=email)
+            if user is None:
+                print(f"No user with email {email}.")
+                return 1
+            owner_id = user.id
+
+        if check:
+            drift = await rollup_service.find_rollup_drift(db, owner_id)
+            for bucket in drift:
+                print(f"{bucket['owner_id']} {bucket['month']:%Y-%m} {bucket['category']}: "
+                      f"stored {bucket['stored']} expected {bucket['expected']}")
+            print(f"{len(drift)} rollup bucket(s) out of date.")
+            return 1 if drift else 0
+
+        await rollup_service.rebuild_rollups(db, owner_id)
+        print("Expense rollups rebuilt.")
+        return 0
+    finally:
+        await close_mongo_connection()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild or check the expense rollups.")
+    parser.add_argument("--email", help="only this user (default: everyone)")
+    parser.add_argument("--check", action="store_true", help="report drift without changing anything")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.email, args.check)))
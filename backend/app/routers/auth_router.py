@@ -1,30 +1,43 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
 
-from .. import security
+from .. import auth, security
 from ..database import get_database
+from ..executors import ExecutorBusyError
 from ..models import schemas
 from ..services import user_service
 
 router = APIRouter()
 
+def busy_exception(error: ExecutorBusyError) -> HTTPException:
+    """Response for when the password hashing pool is saturated."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="The server is busy. Please try again shortly.",
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
 @router.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user: schemas.UserCreate, 
     db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    """Handles user registration."""
-    db_user = await user_service.get_user_by_email(db, email=user.email)
-    if db_user:
+    """
+    Handles user registration. The unique email index rejects duplicates, so
+    registering costs a single insert.
+    """
+    try:
+        new_user = await user_service.create_user(db, user)
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="Email already registered")
-    
-    new_user = await user_service.create_user(db, user)
-    created_user_doc = await db[user_service.USERS_COLLECTION].find_one({"email": new_user.email})
+    except ExecutorBusyError as e:
+        raise busy_exception(e)
     
     # Manually format the response to guarantee the ID is a string
     return {
-        "id": str(created_user_doc["_id"]),
-        "email": created_user_doc["email"]
+        "id": str(new_user.id),
+        "email": new_user.email
     }
 
 
@@ -35,13 +48,24 @@ async def login_for_access_token(
 ):
     """Handles user login and returns a JWT access token."""
     user = await user_service.get_user_by_email(db, email=form_data.email)
-    if not user or not security.verify_password(form_data.password, user.hashed_password):
+    verified, new_hash = False, None
+    if user:
+        try:
+            verified, new_hash = await security.verify_and_update_password(form_data.password, user.hashed_password)
+        except ExecutorBusyError as e:
+            raise busy_exception(e)
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    if new_hash:
+        await user_service.update_password_hash(db, user.email, new_hash)
+        # Cached sessions hold the old hash
+        await auth.invalidate_user(user.email)
+
     access_token = security.create_access_token(data={"sub": user.email})
     
     return {"access_token": access_token, "token_type": "bearer"}
\ No newline at end of file
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, Depends, status, HTTPException
+from fastapi import APIRouter, Depends, File, Query, Response, UploadFile, status, HTTPException
+from fastapi.responses import StreamingResponse
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List
+from bson import ObjectId
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import json
 
-from .. import auth
+from .. import auth, serialization
 from ..database import get_database
 from ..models import schemas
-from ..services import expense_service
+from ..services import category_model_service, expense_service, import_export_service
 
 # Helper function to reliably format the database document into the response shape
 def format_expense(doc: dict) -> dict:
@@ -15,6 +19,38 @@ def format_expense(doc: dict) -> dict:
         "owner_id": str(doc["owner_id"]),
     }
 
+def _json_default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+# Serializes a raw (possibly projected) database document straight to JSON
+def serialize_expense(doc: dict) -> str:
+    doc = dict(doc)
+    doc["id"] = str(doc.pop("_id"))
+    if serialization.enabled():
+        return serialization.dumps(doc).decode()
+    return json.dumps(doc, default=_json_default)
+
+# Fields a client may ask for with `fields=`
+EXPENSE_FIELDS = {"description", "amount", "category", "date", "owner_id"}
+
+# Shared query parameters for filtering a user's expenses
+def expense_query(
+    start_date: Optional[datetime] = Query(None, description="Only expenses on or after this date."),
+    end_date: Optional[datetime] = Query(None, description="Only expenses before this date."),
+    category: Optional[str] = None,
+    min_amount: Optional[float] = Query(None, ge=0),
+    max_amount: Optional[float] = Query(None, ge=0),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+) -> Dict[str, Any]:
+    return expense_service.build_expense_query(
+        current_user, start_date=start_date, end_date=end_date,
+        category=category, min_amount=min_amount, max_amount=max_amount,
+    )
+
 router = APIRouter()
 
 @router.post("/", response_model=schemas.ExpenseResponse, status_code=status.HTTP_201_CREATED)
@@ -26,18 +62,167 @@ async def create_expense(
     created_doc = await expense_service.add_expense(db, expense, current_user)
     if created_doc is None:
         raise HTTPException(status_code=500, detail="Failed to create expense.")
+    if serialization.enabled():
+        return serialization.json_response(serialization.expense_json(created_doc), status_code=status.HTTP_201_CREATED)
     return format_expense(created_doc)
 
 
 @router.get("/", response_model=List[schemas.ExpenseResponse])
 async def get_all_expenses(
-    db: AsyncIOMotorDatabase = Depends(get_database),
-    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all expenses are returned if omitted."),
+    cursor: Optional[str] = Query(None, description="The X-Next-Cursor value from the previous page."),
+    query: Dict[str, Any] = Depends(expense_query),
+    db: AsyncIOMotorDatabase = Depends(get_database)
 ):
-    expenses_docs = await expense_service.get_expenses_by_owner(db, current_user)
+    """
+    Lists the user's expenses, newest first. When `limit` is given the result
+    is paginated and the cursor for the next page is sent in X-Next-Cursor.
+    """
+    try:
+        if limit is None:
+            expenses_docs = await expense_service.find_expenses(db, query, cursor=cursor).to_list(None)
+        else:
+            expenses_docs, next_cursor = await expense_service.get_expenses_page(db, query, limit, cursor)
+            if next_cursor is not None:
+                response.headers["X-Next-Cursor"] = next_cursor
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if serialization.enabled():
+        return serialization.json_response(serialization.expense_list_json(expenses_docs), response)
     # Explicitly format every document to ensure the ID is a string
     return [format_expense(doc) for doc in expenses_docs]
 
+@router.get("/stream")
+async def stream_expenses(
+    format: str = Query("ndjson", pattern="^(ndjson|json)$"),
+    fields: Optional[List[str]] = Query(None, description="Only return these fields."),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = None,
+    query: Dict[str, Any] = Depends(expense_query),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """
+    Streams the user's expenses, newest first, as NDJSON or a JSON array.
+    Documents are written as the database cursor yields them, so memory use
+    does not grow with the size of the user's history.
+    """
+    if fields and not set(fields) <= EXPENSE_FIELDS:
+        raise HTTPException(status_code=400, detail=f"Unknown field. Choose from: {', '.join(sorted(EXPENSE_FIELDS))}.")
+    try:
+        db_cursor = expense_service.find_expenses(db, query, cursor=cursor, limit=limit, fields=fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def ndjson():
+        async for doc in db_cursor:
+            yield serialize_expense(doc) + "\n"
+
+    async def json_array():
+        separator = "["
+        async for doc in db_cursor:
+            yield separator + serialize_expense(doc)
+            separator = ","
+        yield "[]" if separator == "[" else "]"
+
+    if format == "json":
+        return StreamingResponse(json_array(), media_type="application/json")
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.get("/suggest-category", response_model=schemas.CategorySuggestion)
+async def suggest_category(
+    text: str = Query(..., min_length=1, max_length=schemas.MAX_RECEIPT_TEXT_LENGTH, description="An expense description or receipt text."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Suggests a category from the user's own past categorisations, falling
+    back to the built-in rules until it has learned enough.
+    """
+    return await category_model_service.suggest_category(db, current_user.id, text)
+
+@router.post("/import", response_model=Dict[str, Any])
+async def import_expenses(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Detected from the file name if omitted."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Imports expenses from a CSV (with a date, description, amount, category
+    header) or NDJSON file. Rows are validated and inserted in batches; rows
+    that fail are listed in the report and do not stop the import. Rows
+    without a category get a suggested one. A file that cannot be read to
+    the end keeps the rows before the problem, and the report's `error`
+    says where the import stopped.
+    """
+    if format is None:
+        filename = (file.filename or "").lower()
+        if filename.endswith(".csv") or file.content_type == "text/csv":
+            format = "csv"
+        elif filename.endswith((".ndjson", ".jsonl")) or file.content_type == "application/x-ndjson":
+            format = "ndjson"
+        else:
+            raise HTTPException(status_code=400, detail="Could not tell the file format. Pass format=csv or format=ndjson.")
+
+    if format == "csv":
+        rows = import_export_service.iter_csv_rows(file.file)
+    else:
+        rows = import_export_service.iter_ndjson_rows(file.file)
+    return await import_export_service.import_expenses(db, rows, current_user)
+
+@router.get("/export")
+async def export_expenses(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    query: Dict[str, Any] = Depends(expense_query),
+    db: AsyncIOMotorDatabase = Depends(get_database)
+):
+    """Downloads the user's expenses, newest first, as CSV or NDJSON."""
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        import_export_service.export_expenses(db, query, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="expenses.{format}"'},
+    )
+
+def _batch_selection(selection: schemas.ExpenseSelection, user: schemas.UserInDB) -> Dict[str, Any]:
+    if selection.filter is None:
+        return {"ids": selection.ids}
+    return {"query": expense_service.build_expense_query(user, **selection.filter.model_dump())}
+
+@router.patch("/batch", response_model=schemas.ExpenseBatchResponse)
+async def update_expenses_batch(
+    batch: schemas.ExpenseBatchUpdate,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Applies one update (e.g. a new category) to many expenses, chosen by
+    `ids` or by `filter`, and reports the outcome for each expense.
+    """
+    try:
+        return await expense_service.update_expenses(
+            db, batch.update, current_user,
+            max_expenses=schemas.MAX_BATCH_EXPENSES, **_batch_selection(batch, current_user)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/batch-delete", response_model=schemas.ExpenseBatchResponse)
+async def delete_expenses_batch(
+    batch: schemas.ExpenseBatchDelete,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """Deletes many expenses, chosen by `ids` or by `filter`, and reports the outcome for each."""
+    try:
+        return await expense_service.delete_expenses(
+            db, current_user,
+            max_expenses=schemas.MAX_BATCH_EXPENSES, **_batch_selection(batch, current_user)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.put("/{expense_id}", response_model=schemas.ExpenseResponse)
 async def update_expense(
     expense_id: str,
@@ -48,6 +233,8 @@ async def update_expense(
     updated_doc = await expense_service.update_expense_by_id(db, expense_id, expense, current_user)
     if updated_doc is None:
         raise HTTPException(status_code=404, detail="Expense not found.")
+    if serialization.enabled():
+        return serialization.json_response(serialization.expense_json(updated_doc))
     return format_expense(updated_doc)
 
 
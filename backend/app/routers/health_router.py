@@ -0,0 +1,30 @@
+# backend/app/routers/health_router.py
+import asyncio
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse
+from pymongo.errors import PyMongoError
+
+from .. import database
+
+router = APIRouter()
+
+@router.get("/ready")
+async def readiness():
+    """
+    Endpoint for load balancers and orchestrators: ready when the database
+    answers a ping, with the connection pool's utilisation and recent
+    checkout wait times.
+    """
+    try:
+        mongo = await database.check_database()
+    except asyncio.TimeoutError:
+        error = "The database did not answer in time."
+    except PyMongoError as e:
+        error = f"The database is unavailable ({type(e).__name__})."
+    else:
+        return {"status": "ready", "mongo": mongo}
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "unavailable", "mongo": {"error": error, "pool": database.pool_stats.stats()}},
+    )
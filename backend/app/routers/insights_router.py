@@ -1,16 +1,46 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Awaitable, Callable, List, Optional
+from urllib.parse import urlencode
 
-from .. import auth
+from .. import auth, serialization
 from ..database import get_database
 from ..models import schemas
-from ..services import insights_service
+from ..services import analytics_service, insights_cache, insights_service
 
 router = APIRouter()
 
+# Serves an insight from the per-user cache, or a 304 when the client's ETag is current
+async def cached_insight(
+    request: Request,
+    response: Response,
+    user: schemas.UserInDB,
+    compute: Callable[[], Awaitable[Any]]
+) -> Any:
+    route_key = request.url.path + "?" + urlencode(sorted(request.query_params.multi_items()))
+    await insights_cache.refresh_generation(user.id)
+    etag = insights_cache.etag_for(user.id, route_key)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    # Browsers must revalidate, which the ETag makes cheap
+    response.headers["Cache-Control"] = "private, no-cache"
+    if serialization.enabled():
+        # The cache keeps the encoded body, so hits skip serialization too
+        async def compute_json() -> bytes:
+            return serialization.dumps(await compute())
+        body = await insights_cache.get_or_compute(user.id, route_key + "|json", compute_json)
+        return serialization.json_response(body, response)
+    return await insights_cache.get_or_compute(user.id, route_key, compute)
+
 @router.get("/summary", response_model=Dict[str, Any])
 async def get_summary(
+    request: Request,
+    response: Response,
     db: AsyncIOMotorDatabase = Depends(get_database),
     current_user: schemas.UserInDB = Depends(auth.get_current_user)
 ):
@@ -18,16 +48,95 @@ async def get_summary(
     Endpoint to get a summary of total expenses, monthly expenses, 
     and transaction count for the dashboard.
     """
-    summary = await insights_service.get_dashboard_summary(db, current_user)
-    return summary
+    return await cached_insight(
+        request, response, current_user,
+        lambda: insights_service.get_dashboard_summary(db, current_user)
+    )
 
 @router.get("/by-category", response_model=Dict[str, float])
 async def get_by_category(
+    request: Request,
+    response: Response,
     db: AsyncIOMotorDatabase = Depends(get_database),
     current_user: schemas.UserInDB = Depends(auth.get_current_user)
 ):
     """
     Endpoint to get total spending grouped by category for charts.
     """
-    category_totals = await insights_service.get_spending_by_category(db, current_user)
-    return category_totals
\ No newline at end of file
+    return await cached_insight(
+        request, response, current_user,
+        lambda: insights_service.get_spending_by_category(db, current_user)
+    )
+
+@router.get("/timeseries", response_model=Dict[str, Any])
+async def get_timeseries(
+    request: Request,
+    response: Response,
+    granularity: str = Query("month", pattern="^(day|week|month)$"),
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    rolling_window: Optional[int] = Query(None, ge=2, le=366, description="Periods in the trailing rolling average."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to get spending per day, week or month over a date range,
+    optionally with a rolling average.
+    """
+    return await cached_insight(
+        request, response, current_user,
+        lambda: analytics_service.get_spending_timeseries(
+            db, current_user, granularity, start_date, end_date, rolling_window
+        )
+    )
+
+@router.get("/category-matrix", response_model=Dict[str, Any])
+async def get_category_matrix(
+    request: Request,
+    response: Response,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to get spending per category per month for stacked charts.
+    """
+    return await cached_insight(
+        request, response, current_user,
+        lambda: analytics_service.get_category_matrix(db, current_user, start_date, end_date)
+    )
+
+@router.get("/month-over-month", response_model=Dict[str, Any])
+async def get_month_over_month(
+    request: Request,
+    response: Response,
+    months: int = Query(12, ge=1, le=120),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to get monthly totals with the change from the previous month.
+    """
+    return await cached_insight(
+        request, response, current_user,
+        lambda: analytics_service.get_month_over_month(db, current_user, months)
+    )
+
+@router.get("/top-merchants", response_model=List[Dict[str, Any]])
+async def get_top_merchants(
+    request: Request,
+    response: Response,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = Query(10, ge=1, le=100),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to get the merchants the user spent the most with.
+    """
+    return await cached_insight(
+        request, response, current_user,
+        lambda: analytics_service.get_top_merchants(db, current_user, start_date, end_date, limit)
+    )
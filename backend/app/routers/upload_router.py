@@ -1,16 +1,23 @@
 # backend/app/routers/upload_router.py
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
-from typing import Dict, Any
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from typing import Dict, Any, List
+import json
 
 from .. import auth
+from ..config import settings
+from ..database import get_database
+from ..executors import ExecutorBusyError
 from ..models import schemas
-from ..services import ocr_service
+from ..services import batch_upload_service, job_service, ocr_cache, ocr_service
 
 router = APIRouter()
 
 @router.post("/receipt", response_model=Dict[str, Any])
 async def upload_receipt(
     file: UploadFile = File(...),
+    db: AsyncIOMotorDatabase = Depends(get_database),
     current_user: schemas.UserInDB = Depends(auth.get_current_user)
 ):
     """
@@ -24,15 +31,115 @@ async def upload_receipt(
         )
 
     try:
-        extracted_data = await ocr_service.process_receipt_image(file)
+        extracted_data = await ocr_service.process_receipt_image(file, db, current_user.id)
         return extracted_data
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=str(e)
         )
+    except ExecutorBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="The receipt scanner is busy. Please try again shortly.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="Processing the receipt took too long."
+        )
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="There was an error processing the file."
         )
+
+
+@router.post("/receipts")
+async def upload_receipts(
+    files: List[UploadFile] = File(...),
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$"),
+    create_expenses: bool = Query(False, description="Save every recognised receipt as an expense."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to upload many receipt images (or zip archives of them) at once.
+    Each result is streamed back as NDJSON or Server-Sent Events as soon as
+    it is ready, followed by a summary line.
+    """
+    try:
+        items = await batch_upload_service.read_uploads(files)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+    async def stream():
+        async for item in batch_upload_service.process_receipts(db, items, current_user, create_expenses):
+            if format == "sse":
+                event = "summary" if "summary" in item else "result"
+                yield f"event: {event}\ndata: {json.dumps(item)}\n\n"
+            else:
+                yield json.dumps(item) + "\n"
+
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(stream(), media_type=media_type)
+
+
+@router.post("/jobs", response_model=schemas.ReceiptJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_receipt_job(
+    file: UploadFile = File(...),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to queue a receipt image for OCR. Returns a job id right away;
+    the extracted details are fetched from GET /jobs/{job_id}.
+    """
+    if not file.content_type.startswith("image/"):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="File provided is not an image."
+        )
+
+    # Reject oversized images here, before they are written into the job queue
+    image_content = await file.read(settings.ocr_max_upload_bytes + 1)
+    if len(image_content) > settings.ocr_max_upload_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Image file is too large."
+        )
+    job = await job_service.create_job(db, image_content, file.filename, current_user)
+    return job_service.format_job(job)
+
+
+@router.get("/jobs/{job_id}", response_model=schemas.ReceiptJobResponse)
+async def get_receipt_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=60, description="Seconds to long-poll for the job to finish."),
+    db: AsyncIOMotorDatabase = Depends(get_database),
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to fetch the status and, once done, the result of a receipt job.
+    """
+    if wait > 0:
+        job = await job_service.wait_for_job(db, job_id, current_user, timeout=wait)
+    else:
+        job = await job_service.get_job(db, job_id, current_user)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_service.format_job(job)
+
+
+@router.get("/cache/stats", response_model=Dict[str, Any])
+async def get_ocr_cache_stats(
+    current_user: schemas.UserInDB = Depends(auth.get_current_user)
+):
+    """
+    Endpoint to report OCR result cache hits, misses and the OCR time saved.
+    """
+    return ocr_cache.stats.as_dict()
@@ -1,20 +1,48 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
 from passlib.context import CryptContext
 from jose import jwt
 
 from .config import settings
+from .executors import password_executor
 
 # Password Hashing Setup
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Pinning min/max rounds to the configured cost makes hashes made with any
+# other cost "need update", so they are transparently rehashed on login.
+# Built on first use, once the settings have been loaded.
+@lru_cache(maxsize=None)
+def pwd_context() -> CryptContext:
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=settings.bcrypt_rounds,
+        bcrypt__min_rounds=settings.bcrypt_rounds,
+        bcrypt__max_rounds=settings.bcrypt_rounds,
+    )
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifies a plain password against a hashed one."""
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hashes a plain password."""
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
+
+async def hash_password(password: str) -> str:
+    """
+    Hashes a plain password on the password hashing pool, keeping the event loop free.
+    Raises ExecutorBusyError when too many hashes are already waiting.
+    """
+    return await password_executor.run(get_password_hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifies a password on the password hashing pool. Returns whether it
+    matched and, if the stored hash uses an outdated cost, a replacement hash.
+    Raises ExecutorBusyError when too many checks are already waiting.
+    """
+    return await password_executor.run(pwd_context().verify_and_update, plain_password, hashed_password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Creates a new JWT access token."""
@@ -0,0 +1,65 @@
+from bson import ObjectId
+from fastapi import Response
+from typing import Any, Dict, Iterable, List, Optional
+import orjson
+
+from .config import settings
+
+# The fast JSON path (FAST_JSON_RESPONSES). Responses built from documents
+# the app itself wrote are encoded straight to JSON with orjson: ObjectIds
+# and datetimes are written directly, and the response model is not
+# validated a second time. The output is the same JSON the response models
+# produce, so clients cannot tell which path served them.
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+# Numpy values can reach the analytics responses, and UTC datetimes are
+# written with a "Z" as pydantic writes them
+_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+def dumps(content: Any) -> bytes:
+    """JSON for `content`, which may contain ObjectIds, datetimes and numpy values."""
+    return orjson.dumps(content, default=_default, option=_OPTIONS)
+
+def enabled() -> bool:
+    return settings.fast_json_responses
+
+class FastJSONResponse(Response):
+    """A JSON response encoded with orjson. Content is trusted and not validated."""
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        # Pre-encoded bodies (such as cached insights) are sent as they are
+        if isinstance(content, bytes):
+            return content
+        return dumps(content)
+
+def json_response(content: Any, response: Optional[Response] = None, status_code: int = 200) -> FastJSONResponse:
+    """
+    Wraps content for the fast path. Headers already set on the route's
+    injected `response` (ETag, X-Next-Cursor and so on) are carried over,
+    since FastAPI only applies them to responses it builds itself.
+    """
+    fast_response = FastJSONResponse(content, status_code=status_code)
+    if response is not None:
+        for name, value in response.headers.items():
+            if name != "content-length":
+                fast_response.headers[name] = value
+    return fast_response
+
+def expense_json(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """An expense document in the ExpenseResponse shape, ready for dumps()."""
+    return {
+        "description": doc["description"],
+        "amount": doc["amount"],
+        "category": doc["category"],
+        "date": doc["date"],
+        "id": doc["_id"],
+        "owner_id": doc["owner_id"],
+    }
+
+def expense_list_json(docs: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [expense_json(doc) for doc in docs]
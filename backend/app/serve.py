@@ -0,0 +1,80 @@
+# backend/app/serve.py
+"""
+Production entry point: API workers and the OCR worker as separate processes.
+
+    python -m app.serve                      # API workers and the OCR worker
+    python -m app.serve --role api           # API workers only; OCR runs elsewhere
+    python -m app.serve --role ocr           # the OCR worker only (python -m app.worker)
+
+API workers are uvicorn processes, by default one per core not taken by the
+OCR worker's OCR_WORKERS pool. They run no OCR job loops, so queued receipts
+are left to the OCR worker, and keep only API_OCR_WORKERS pool processes for
+synchronous uploads. Caches are per process, so their invalidations (and,
+with RATE_LIMIT_SHARED, the rate limits) are shared through Mongo: with more
+than one worker SHARED_STATE_BACKEND defaults to mongo, and setting it to
+local is refused. With several single-worker nodes, set it to mongo yourself.
+"""
+import argparse
+import os
+import signal
+import subprocess
+import sys
+
+from .config import settings
+
+def default_api_workers(role: str) -> int:
+    cores = os.cpu_count() or 1
+    if role == "all":
+        cores -= settings.ocr_workers
+    return max(cores, 1)
+
+def start_ocr_worker() -> subprocess.Popen:
+    return subprocess.Popen([sys.executable, "-m", "app.worker"])
+
+def stop_ocr_worker(process: subprocess.Popen):
+    """Lets the OCR worker finish its in-flight jobs, as it does on SIGTERM."""
+    if process.poll() is None:
+        process.send_signal(signal.SIGTERM)
+    process.wait()
+
+def run_api(workers: int, host: str, port: int):
+    import uvicorn
+
+    # Read by the workers' settings; uvicorn starts them fresh, not forked
+    os.environ["OCR_JOB_WORKERS"] = "0"
+    os.environ["OCR_WORKERS"] = str(settings.api_ocr_workers)
+    uvicorn.run("app.main:app", host=host, port=port, workers=workers, proxy_headers=True)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--role", choices=["all", "api", "ocr"], default="all")
+    parser.add_argument("--workers", type=int, help="API worker processes (default: API_WORKERS).")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    if args.role == "ocr":
+        os.execv(sys.executable, [sys.executable, "-m", "app.worker"])
+
+    workers = args.workers or settings.api_workers or default_api_workers(args.role)
+    if workers > 1 and settings.shared_state_backend == "local":
+        # Per-process caches would serve other workers' stale insights indefinitely
+        if "shared_state_backend" in settings.model_fields_set:
+            parser.error(f"SHARED_STATE_BACKEND=local cannot share cache invalidations between {workers} API workers. "
+                         "Set SHARED_STATE_BACKEND=mongo or run one worker with --workers 1.")
+        # Read by the workers' settings, like the OCR settings in run_api
+        os.environ["SHARED_STATE_BACKEND"] = "mongo"
+        print(f"Using SHARED_STATE_BACKEND=mongo for {workers} API workers.")
+    elif args.role == "api" and settings.shared_state_backend == "local":
+        print("Warning: SHARED_STATE_BACKEND=local with --role api; if other nodes serve the API, "
+              "cache invalidations and rate limits will not be shared with them.")
+
+    ocr_worker = start_ocr_worker() if args.role == "all" else None
+    try:
+        run_api(workers, args.host, args.port)
+    finally:
+        if ocr_worker is not None:
+            stop_ocr_worker(ocr_worker)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..lazy import lazy_module
+from ..models.schemas import UserInDB
+from . import db_ops, expense_service, rollup_service
+
+# Imported on the first analytics request (or at startup with WARMUP_PRELOAD=analytics)
+np = lazy_module("numpy")
+
+# Grouping is pushed down into MongoDB ($dateTrunc needs MongoDB 5.0+), so only
+# one row per period/category comes back. Gap filling, rolling averages and
+# deltas are then vectorized NumPy over those rows, never per-expense Python.
+
+GRANULARITIES = ("day", "week", "month")
+
+# How far back a series reaches when no start date is given
+DEFAULT_SPANS = {"day": timedelta(days=90), "week": timedelta(weeks=26), "month": timedelta(days=365)}
+
+def _naive_utc(date: datetime) -> datetime:
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return date
+
+def resolve_range(granularity: str, start_date: Optional[datetime], end_date: Optional[datetime]) -> Tuple[datetime, datetime]:
+    """Fills in a default date range and normalises it to naive UTC, as MongoDB returns dates."""
+    end_date = _naive_utc(end_date or datetime.now(timezone.utc))
+    start_date = _naive_utc(start_date) if start_date else end_date - DEFAULT_SPANS[granularity]
+    return start_date, end_date
+
+def period_axis(granularity: str, start_date: datetime, end_date: datetime) -> np.ndarray:
+    """Every period start between the two dates, matching MongoDB's $dateTrunc buckets."""
+    if granularity == "month":
+        return np.arange(
+            np.datetime64(start_date, "M"), np.datetime64(end_date, "M") + 1
+        ).astype("datetime64[D]")
+    start_day = np.datetime64(start_date, "D")
+    end_day = np.datetime64(end_date, "D")
+    if granularity == "week":
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        start_day -= (start_day.astype(np.int64) + 3) % 7
+        return np.arange(start_day, end_day + 1, np.timedelta64(7, "D"))
+    return np.arange(start_day, end_day + 1)
+
+def _bucket_indices(axis: np.ndarray, periods: List[datetime]) -> np.ndarray:
+    return np.searchsorted(axis, np.array(periods, dtype="datetime64[D]"))
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing mean over `window` periods; the first window-1 periods average what is available."""
+    cumulative = np.cumsum(np.insert(values, 0, 0.0))
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return (cumulative[1:] - cumulative[np.maximum(np.arange(1, len(values) + 1) - window, 0)]) / counts
+
+def _round(values: np.ndarray) -> List[float]:
+    return np.round(values, 2).tolist()
+
+def _iso_dates(axis: np.ndarray) -> List[str]:
+    return np.datetime_as_string(axis, unit="D").tolist()
+
+async def get_spending_timeseries(
+    db: AsyncIOMotorDatabase,
+    user: UserInDB,
+    granularity: str,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    rolling_window: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Total spending and transaction count per day, week or month, with empty
+    periods filled in as zero and an optional trailing rolling average.
+    """
+    start_date, end_date = resolve_range(granularity, start_date, end_date)
+    pipeline = [
+        {"$match": {"owner_id": user.id, "date": {"$gte": start_date, "$lte": end_date}}},
+        {"$group": {
+            "_id": {"$dateTrunc": {"date": "$date", "unit": granularity, "startOfWeek": "monday"}},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+    ]
+    rows = await db_ops.aggregate(db, expense_service.EXPENSES_COLLECTION, pipeline).to_list(None)
+
+    axis = period_axis(granularity, start_date, end_date)
+    totals = np.zeros(len(axis))
+    counts = np.zeros(len(axis), dtype=np.int64)
+    if rows:
+        indices = _bucket_indices(axis, [row["_id"] for row in rows])
+        totals[indices] = [row["total"] for row in rows]
+        counts[indices] = [row["count"] for row in rows]
+
+    series = {
+        "granularity": granularity,
+        "periods": _iso_dates(axis),
+        "totals": _round(totals),
+        "counts": counts.tolist(),
+    }
+    if rolling_window:
+        series["rolling_average"] = _round(rolling_mean(totals, rolling_window))
+    return series
+
+async def get_category_matrix(
+    db: AsyncIOMotorDatabase,
+    user: UserInDB,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    """
+    Spending per category per month as a matrix (rows are categories, columns
+    months), read from the monthly rollups.
+    """
+    start_date, end_date = resolve_range("month", start_date, end_date)
+    rows = await db_ops.find(
+        db, rollup_service.EXPENSE_ROLLUPS_COLLECTION,
+        {
+            "owner_id": user.id,
+            "month": {"$gte": rollup_service.month_of(start_date), "$lte": end_date},
+            "count": {"$gt": 0},
+        },
+        {"_id": False, "month": True, "category": True, "total": True},
+    ).to_list(None)
+
+    axis = period_axis("month", start_date, end_date)
+    categories, category_indices = np.unique([row["category"] for row in rows], return_inverse=True)
+    matrix = np.zeros((len(categories), len(axis)))
+    if rows:
+        np.add.at(matrix, (category_indices, _bucket_indices(axis, [row["month"] for row in rows])),
+                  [row["total"] for row in rows])
+
+    return {
+        "months": _iso_dates(axis),
+        "categories": categories.tolist(),
+        "totals": [_round(row) for row in matrix],
+    }
+
+async def get_month_over_month(db: AsyncIOMotorDatabase, user: UserInDB, months: int = 12) -> Dict[str, Any]:
+    """
+    Monthly totals for the last `months` months with the absolute and
+    percentage change from the month before, read from the monthly rollups.
+    """
+    current_month = np.datetime64(_naive_utc(datetime.now(timezone.utc)), "M")
+    axis = np.arange(current_month - months, current_month + 1).astype("datetime64[D]")
+
+    pipeline = [
+        # Bounded at the current month: a future-dated expense has no slot on the axis
+        {"$match": {"owner_id": user.id, "month": {
+            "$gte": axis[0].astype("datetime64[s]").item(),
+            "$lte": axis[-1].astype("datetime64[s]").item(),
+        }}},
+        {"$group": {"_id": "$month", "total": {"$sum": "$total"}}},
+    ]
+    rows = await db_ops.aggregate(db, rollup_service.EXPENSE_ROLLUPS_COLLECTION, pipeline).to_list(None)
+
+    totals = np.zeros(len(axis))
+    if rows:
+        totals[_bucket_indices(axis, [row["_id"] for row in rows])] = [row["total"] for row in rows]
+
+    # The extra leading month only exists to give the first reported month a delta
+    deltas = np.diff(totals)
+    previous = totals[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        percent = np.where(previous > 0, 100 * deltas / previous, np.nan)
+
+    return {
+        "months": _iso_dates(axis[1:]),
+        "totals": _round(totals[1:]),
+        "deltas": _round(deltas),
+        "percent_changes": [None if np.isnan(p) else round(float(p), 2) for p in percent],
+    }
+
+async def get_top_merchants(
+    db: AsyncIOMotorDatabase,
+    user: UserInDB,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    limit: int = 10,
+) -> List[Dict[str, Any]]:
+    """
+    The merchants (expense descriptions, case- and whitespace-insensitive)
+    the user spent the most with.
+    """
+    start_date, end_date = resolve_range("month", start_date, end_date)
+    pipeline = [
+        {"$match": {"owner_id": user.id, "date": {"$gte": start_date, "$lte": end_date}}},
+        {"$group": {
+            "_id": {"$toLower": {"$trim": {"input": "$description"}}},
+            "name": {"$first": "$description"},
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$sort": {"total": -1}},
+        {"$limit": limit},
+    ]
+    rows = await db_ops.aggregate(db, expense_service.EXPENSES_COLLECTION, pipeline).to_list(limit)
+    return [
+        {"merchant": row["name"].strip(), "total": round(row["total"], 2), "count": row["count"]}
+        for row in rows
+    ]
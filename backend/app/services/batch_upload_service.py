@@ -0,0 +1,121 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from fastapi import UploadFile
+from io import BytesIO
+from typing import AsyncIterator, Dict, Any, List, Tuple
+import asyncio
+import zipfile
+
+from ..config import settings
+from ..executors import ExecutorBusyError
+from ..models.schemas import MAX_RECEIPT_TEXT_LENGTH, ExpenseCreate, UserInDB
+from . import expense_service, ocr_service
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp", ".bmp", ".tif", ".tiff")
+ZIP_CONTENT_TYPES = ("application/zip", "application/x-zip-compressed")
+
+# How often a receipt is retried while the OCR queue is full before giving up.
+MAX_BUSY_RETRIES = 5
+
+def _is_zip(file: UploadFile) -> bool:
+    return file.content_type in ZIP_CONTENT_TYPES or (file.filename or "").lower().endswith(".zip")
+
+async def read_uploads(files: List[UploadFile]) -> List[Tuple[str, bytes]]:
+    """
+    Reads every uploaded image, unpacking zip archives into their images.
+    Raises ValueError for unsupported files or batches that are too large.
+    """
+    items = []
+    count = total_bytes = 0
+
+    def admit(size: int):
+        # Counts a receipt against the batch limits before it is inflated
+        nonlocal count, total_bytes
+        count += 1
+        total_bytes += size
+        if count > settings.ocr_batch_max_files:
+            raise ValueError(f"A batch can contain at most {settings.ocr_batch_max_files} receipts.")
+        if total_bytes > settings.ocr_batch_max_bytes:
+            raise ValueError(f"A batch can contain at most {settings.ocr_batch_max_bytes // (1024 * 1024)} MB of receipts.")
+
+    for file in files:
+        content = await file.read()
+        if _is_zip(file):
+            try:
+                archive = zipfile.ZipFile(BytesIO(content))
+            except zipfile.BadZipFile:
+                raise ValueError(f"{file.filename} is not a valid zip archive.")
+            entries = [
+                info for info in archive.infolist()
+                if not info.is_dir() and info.filename.lower().endswith(IMAGE_EXTENSIONS)
+            ]
+            # Check every entry's declared size before inflating any, so zip bombs are rejected cheaply.
+            for info in entries:
+                if info.file_size > settings.ocr_max_upload_bytes:
+                    raise ValueError(f"{info.filename} is too large.")
+                admit(info.file_size)
+            items.extend((info.filename, archive.read(info)) for info in entries)
+        elif file.content_type.startswith("image/"):
+            admit(len(content))
+            items.append((file.filename, content))
+        else:
+            raise ValueError(f"{file.filename} is not an image or zip archive.")
+    return items
+
+async def _process_one(db: AsyncIOMotorDatabase, user: UserInDB, index: int, filename: str, image_content: bytes, slots: asyncio.Semaphore) -> Dict[str, Any]:
+    async with slots:
+        for attempt in range(MAX_BUSY_RETRIES + 1):
+            try:
+                result = await ocr_service.process_receipt_bytes(image_content, filename, db, user.id)
+                return {"index": index, "filename": filename, "status": "ok", "result": result}
+            except ExecutorBusyError as e:
+                # Synchronous uploads share the OCR pool; wait for room rather than failing the batch.
+                if attempt == MAX_BUSY_RETRIES:
+                    return {"index": index, "filename": filename, "status": "error", "error": "The receipt scanner is busy."}
+                await asyncio.sleep(e.retry_after)
+            except ValueError as e:
+                return {"index": index, "filename": filename, "status": "error", "error": str(e)}
+            except TimeoutError:
+                return {"index": index, "filename": filename, "status": "error", "error": "Processing the receipt took too long."}
+            except Exception:
+                return {"index": index, "filename": filename, "status": "error", "error": "There was an error processing the file."}
+
+async def process_receipts(db: AsyncIOMotorDatabase, items: List[Tuple[str, bytes]], user: UserInDB, create_expenses: bool = False) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Runs OCR over a batch of receipts, at most one per OCR worker at a time,
+    yielding each result as soon as it is ready. When `create_expenses` is set,
+    the recognised receipts are bulk-inserted as expenses at the end, and a
+    final summary is yielded.
+    """
+    slots = asyncio.Semaphore(settings.ocr_workers)
+    tasks = [
+        asyncio.create_task(_process_one(db, user, index, filename, content, slots))
+        for index, (filename, content) in enumerate(items)
+    ]
+    expenses = []
+    failed = 0
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            if item["status"] == "ok":
+                result = item["result"]
+                if create_expenses and result["amount"] > 0:
+                    expenses.append(ExpenseCreate(
+                        description=result["description"],
+                        amount=result["amount"],
+                        category=result["category"],
+                        date=result["date"],
+                        receipt_text=result["extracted_text"][:MAX_RECEIPT_TEXT_LENGTH],
+                    ))
+            else:
+                failed += 1
+            yield item
+    finally:
+        # Stop outstanding OCR work if the client went away mid-batch.
+        for task in tasks:
+            task.cancel()
+
+    summary = {"processed": len(items), "failed": failed}
+    if create_expenses:
+        created = await expense_service.add_expenses(db, expenses, user) if expenses else []
+        summary["created_expense_ids"] = [str(doc["_id"]) for doc in created]
+    yield {"summary": summary}
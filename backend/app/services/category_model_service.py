@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import zlib
+
+from ..cache import LRUCache
+from ..config import settings
+from ..lazy import lazy_module
+from . import category_classifier, db_ops
+
+# Each user gets a multinomial naive Bayes model over hashed word and
+# word-pair features, trained from the descriptions (and receipt text) of the
+# expenses they save. Receipt text is not kept, so an expense scanned from a
+# receipt stores the receipt's features instead (RECEIPT_FEATURES_FIELD), and
+# they can be forgotten again when the expense is edited or deleted. Every
+# write path feeds it, so when a user corrects a category the model learns
+# from it straight away; it is the first choice for category suggestions and
+# the rule-based classifier is the fallback.
+#
+# Counts are stored sparsely in one document per user and trained with $inc,
+# so several processes can learn at once without overwriting each other.
+CATEGORY_MODELS_COLLECTION = "category_models"
+# Expense field holding the receipt's feature buckets as packed uint16s
+RECEIPT_FEATURES_FIELD = "receipt_features"
+
+# Imported on first use, which API workers may never reach before a write
+np = lazy_module("numpy")
+
+# Features are hashed into this many buckets (a power of two)
+N_FEATURES = 1 << 12
+# Receipt text beyond this many words adds noise rather than signal
+MAX_WORDS = 400
+# Additive smoothing. Well below 1, because descriptions are a few words
+# spread over thousands of buckets and one word seen twice should count.
+ALPHA = 0.1
+
+def extract_features(text: str) -> np.ndarray:
+    """Bucket indices of the words and adjacent word pairs in `text`, ignoring bare numbers."""
+    words = [word for word in category_classifier.tokenize(text)[:MAX_WORDS] if not word.isdigit()]
+    grams = words + [b"%s %s" % pair for pair in zip(words, words[1:])]
+    return np.fromiter((zlib.crc32(gram) & (N_FEATURES - 1) for gram in grams), dtype=np.intp, count=len(grams))
+
+def _category_key(category: str) -> str:
+    # Category names can contain characters that are not allowed in field paths
+    return f"{zlib.crc32(category.encode()):08x}"
+
+class CategoryModel:
+    """A user's feature counts per category, held densely for fast prediction."""
+    def __init__(self, categories: List[str], counts: np.ndarray, examples: np.ndarray):
+        self.categories = categories
+        self.counts = counts
+        self.examples = examples
+        self._log_tables: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    @property
+    def nbytes(self) -> int:
+        return self.counts.nbytes * 2 + 500
+
+    def learn(self, category: str, features: np.ndarray, sign: int):
+        if category not in self.categories:
+            self.categories.append(category)
+            self.counts = np.vstack([self.counts, np.zeros((1, N_FEATURES), np.float32)])
+            self.examples = np.append(self.examples, 0.0)
+        row = self.categories.index(category)
+        np.add.at(self.counts[row], features, sign)
+        self.examples[row] += sign
+        self._log_tables = None
+
+    def _tables(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # Log-probabilities only change when the model learns, so they are cached until then
+        if self._log_tables is None:
+            counts = np.maximum(self.counts, 0)
+            examples = np.maximum(self.examples, 0)
+            log_prior = np.log(examples + 1) - np.log(examples.sum() + len(examples))
+            log_likelihood = np.log(counts + ALPHA) - np.log(counts.sum(axis=1, keepdims=True) + ALPHA * N_FEATURES)
+            self._log_tables = (log_prior, log_likelihood, examples)
+        return self._log_tables
+
+    def predict(self, text: str) -> Optional[Tuple[str, float]]:
+        """
+        The most likely category and its posterior probability, or None if
+        the model has too little to go on.
+        """
+        log_prior, log_likelihood, examples = self._tables()
+        if (examples > 0).sum() < 2 or examples.sum() < settings.category_model_min_examples:
+            return None
+        features = extract_features(text)
+        if features.size == 0:
+            return None
+        scores = log_prior + log_likelihood[:, features].sum(axis=1)
+        posterior = np.exp(scores - scores.max())
+        posterior /= posterior.sum()
+        best = int(posterior.argmax())
+        return self.categories[best], float(posterior[best])
+
+def _empty_model() -> CategoryModel:
+    return CategoryModel([], np.zeros((0, N_FEATURES), np.float32), np.zeros(0))
+
+def _model_from_document(doc: Optional[Dict[str, Any]]) -> CategoryModel:
+    model = _empty_model()
+    if doc is None:
+        return model
+    keys = list(doc.get("names", {}))
+    model.categories = [doc["names"][key] for key in keys]
+    model.counts = np.zeros((len(keys), N_FEATURES), np.float32)
+    model.examples = np.array([doc.get("examples", {}).get(key, 0) for key in keys], dtype=float)
+    for row, key in enumerate(keys):
+        buckets = doc.get("counts", {}).get(key, {})
+        if buckets:
+            model.counts[row, np.fromiter(map(int, buckets), dtype=np.intp)] = list(buckets.values())
+    return model
+
+_models = LRUCache(
+    max_size=lambda: settings.category_model_cache_max_bytes,
+    sizeof=lambda model: model.nbytes,
+    # Other processes train the stored model too, so cached copies are refreshed now and then
+    ttl=lambda: settings.category_model_cache_ttl_seconds,
+    name="category_models",
+)
+
+async def get_model(db: AsyncIOMotorDatabase, owner_id: ObjectId) -> CategoryModel:
+    model = _models.get(owner_id)
+    if model is None:
+        doc = await db_ops.find_one(db, CATEGORY_MODELS_COLLECTION, {"_id": owner_id})
+        model = _model_from_document(doc)
+        _models.set(owner_id, model)
+    return model
+
+def receipt_features(receipt_text: str) -> bytes:
+    """A receipt's features in the compact form stored on its expense."""
+    return extract_features(receipt_text).astype(np.uint16).tobytes()
+
+def _expense_features(doc: Dict[str, Any]) -> np.ndarray:
+    features = extract_features(doc["description"])
+    if doc.get(RECEIPT_FEATURES_FIELD):
+        features = np.concatenate([features, np.frombuffer(doc[RECEIPT_FEATURES_FIELD], dtype=np.uint16).astype(np.intp)])
+    return features
+
+async def apply_changes(db: AsyncIOMotorDatabase, owner_id: ObjectId, changes: Iterable[Tuple[Dict[str, Any], int]]):
+    """
+    Trains a user's model from expense changes in one write. Each change is
+    an expense document (with its RECEIPT_FEATURES_FIELD, if it has one)
+    and +1 to learn it or -1 to forget it; a recategorisation is the old
+    document forgotten plus the new one learned.
+    """
+    increments: Dict[str, float] = {}
+    names: Dict[str, str] = {}
+    learned = []
+    for doc, sign in changes:
+        features = _expense_features(doc)
+        key = _category_key(doc["category"])
+        names[f"names.{key}"] = doc["category"]
+        increments[f"examples.{key}"] = increments.get(f"examples.{key}", 0) + sign
+        buckets, bucket_counts = np.unique(features, return_counts=True)
+        for bucket, count in zip(buckets.tolist(), bucket_counts.tolist()):
+            path = f"counts.{key}.{bucket}"
+            increments[path] = increments.get(path, 0) + sign * count
+        learned.append((doc["category"], features, sign))
+
+    increments = {path: value for path, value in increments.items() if value}
+    if not increments:
+        return
+    await db_ops.update_one(
+        db, CATEGORY_MODELS_COLLECTION, {"_id": owner_id},
+        {"$set": names, "$inc": increments}, upsert=True
+    )
+    # Keep a cached model in step; an uncached one is loaded fresh when next needed
+    model = _models.get(owner_id)
+    if model is not None:
+        for category, features, sign in learned:
+            model.learn(category, features, sign)
+        # Stored again so the cache accounts for any categories it gained
+        _models.set(owner_id, model)
+
+async def learn_expenses(db: AsyncIOMotorDatabase, owner_id: ObjectId, docs: List[Dict[str, Any]]):
+    await apply_changes(db, owner_id, ((doc, 1) for doc in docs))
+
+async def forget_expenses(db: AsyncIOMotorDatabase, owner_id: ObjectId, docs: List[Dict[str, Any]]):
+    await apply_changes(db, owner_id, ((doc, -1) for doc in docs))
+
+async def relearn_expense(db: AsyncIOMotorDatabase, owner_id: ObjectId, before: Dict[str, Any], after: Dict[str, Any]):
+    """Moves an edited expense to its new category or description, if either changed."""
+    if before["category"] == after["category"] and before["description"] == after["description"]:
+        return
+    await apply_changes(db, owner_id, [(before, -1), (after, 1)])
+
+async def suggest_category(db: AsyncIOMotorDatabase, owner_id: ObjectId, text: str) -> Dict[str, Any]:
+    """
+    Suggests a category for an expense description or receipt text: the
+    user's learned model when it is confident, otherwise the category rules.
+    """
+    prediction = (await get_model(db, owner_id)).predict(text)
+    if prediction is not None and prediction[1] >= settings.category_model_min_confidence:
+        return {"category": prediction[0], "confidence": round(prediction[1], 3), "source": "learned"}
+    return {"category": category_classifier.classify(text).category, "confidence": None, "source": "rules"}
@@ -0,0 +1,127 @@
+from motor.motor_asyncio import AsyncIOMotorCommandCursor, AsyncIOMotorCursor, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError
+from pymongo.results import BulkWriteResult, DeleteResult, UpdateResult
+from bson import ObjectId
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# Every service talks to MongoDB through these helpers. Each one is a single
+# round trip, and each is counted against the current request so a change
+# that quietly adds a query shows up in count_db_calls() (and, with
+# DB_CALLS_HEADER set, in the X-DB-Calls response header).
+#
+# Inserts generate the _id locally and hand back the document as written,
+# so no write ever needs a read-back to learn what it stored.
+
+class DbCallCounter:
+    """Database round trips made in one request, in total and per operation."""
+    def __init__(self):
+        self.calls = 0
+        self.by_operation: Counter = Counter()
+
+    def record(self, operation: str, collection: str):
+        self.calls += 1
+        self.by_operation[f"{collection}.{operation}"] += 1
+
+_current_counter: ContextVar[Optional[DbCallCounter]] = ContextVar("db_call_counter", default=None)
+
+@contextmanager
+def count_db_calls() -> Iterator[DbCallCounter]:
+    """
+    Counts the round trips made inside the block, including in tasks it starts.
+    Cursor batches after the first (getMore) are not counted.
+    """
+    counter = DbCallCounter()
+    token = _current_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        _current_counter.reset(token)
+
+def _record(operation: str, collection: str):
+    counter = _current_counter.get()
+    if counter is not None:
+        counter.record(operation, collection)
+
+async def find_one(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    _record("find_one", collection)
+    return await db[collection].find_one(query, projection)
+
+def find(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> AsyncIOMotorCursor:
+    """A cursor for streaming or paging; counted as one call when created."""
+    _record("find", collection)
+    return db[collection].find(query, projection)
+
+def aggregate(db: AsyncIOMotorDatabase, collection: str, pipeline: List[Dict[str, Any]]) -> AsyncIOMotorCommandCursor:
+    _record("aggregate", collection)
+    return db[collection].aggregate(pipeline)
+
+async def insert_one(db: AsyncIOMotorDatabase, collection: str, doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Inserts a document and returns it with its _id, exactly as stored."""
+    doc.setdefault("_id", ObjectId())
+    _record("insert_one", collection)
+    await db[collection].insert_one(doc)
+    return doc
+
+async def insert_many(db: AsyncIOMotorDatabase, collection: str, docs: List[Dict[str, Any]], ordered: bool = True) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """
+    Inserts documents in one round trip. Returns the documents that were
+    stored and an error message for each index in `docs` that was not.
+    """
+    for doc in docs:
+        doc.setdefault("_id", ObjectId())
+    errors: Dict[int, str] = {}
+    _record("insert_many", collection)
+    try:
+        await db[collection].insert_many(docs, ordered=ordered)
+    except BulkWriteError as e:
+        errors = {error["index"]: error["errmsg"] for error in e.details["writeErrors"]}
+        if ordered:
+            # An ordered insert stops at the first failure
+            first_failure = min(errors)
+            errors.update({index: "Not attempted." for index in range(first_failure + 1, len(docs))})
+    return [doc for index, doc in enumerate(docs) if index not in errors], errors
+
+async def find_one_and_update(
+    db: AsyncIOMotorDatabase,
+    collection: str,
+    query: Dict[str, Any],
+    update: Dict[str, Any],
+    return_document: bool = ReturnDocument.AFTER,
+    **kwargs: Any,
+) -> Optional[Dict[str, Any]]:
+    """Updates a document and returns it (after the update, by default) in one round trip."""
+    _record("find_one_and_update", collection)
+    return await db[collection].find_one_and_update(query, update, return_document=return_document, **kwargs)
+
+async def find_one_and_delete(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    _record("find_one_and_delete", collection)
+    return await db[collection].find_one_and_delete(query)
+
+async def update_one(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+    _record("update_one", collection)
+    return await db[collection].update_one(query, update, upsert=upsert)
+
+async def update_many(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any], update: Dict[str, Any]) -> UpdateResult:
+    _record("update_many", collection)
+    return await db[collection].update_many(query, update)
+
+async def replace_one(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any], doc: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+    _record("replace_one", collection)
+    return await db[collection].replace_one(query, doc, upsert=upsert)
+
+async def delete_many(db: AsyncIOMotorDatabase, collection: str, query: Dict[str, Any]) -> DeleteResult:
+    _record("delete_many", collection)
+    return await db[collection].delete_many(query)
+
+async def command(db: AsyncIOMotorDatabase, command: str) -> Dict[str, Any]:
+    """Runs a simple database command such as "ping"."""
+    _record(command, "$cmd")
+    return await db.command(command)
+
+async def bulk_write(db: AsyncIOMotorDatabase, collection: str, operations: List[Any], ordered: bool = True) -> BulkWriteResult:
+    _record("bulk_write", collection)
+    return await db[collection].bulk_write(operations, ordered=ordered)
@@ -1,11 +1,23 @@
-from motor.motor_asyncio import AsyncIOMotorDatabase
-from typing import List, Dict, Any, Optional
+from motor.motor_asyncio import AsyncIOMotorCursor, AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from typing import List, Dict, Any, Optional, Tuple
 from bson import ObjectId
+from datetime import datetime
+import base64
+import json
 
 from ..models.schemas import ExpenseCreate, ExpenseInDB, UserInDB, ExpenseUpdate
+from . import category_model_service, db_ops, insights_cache, rollup_service
 
 EXPENSES_COLLECTION = "expenses"
 
+def _to_document(expense: ExpenseInDB, receipt_text: Optional[str] = None) -> Dict[str, Any]:
+    doc = {"_id": expense.id, **expense.model_dump(exclude={"id"})}
+    if receipt_text:
+        # Kept so the category model can forget what it learned from the receipt
+        doc[category_model_service.RECEIPT_FEATURES_FIELD] = category_model_service.receipt_features(receipt_text)
+    return doc
+
 async def add_expense(db: AsyncIOMotorDatabase, expense: ExpenseCreate, user: UserInDB) -> Dict[str, Any]:
     """
     Creates a new expense record in the database for the given user.
@@ -16,24 +28,126 @@ async def add_expense(db: AsyncIOMotorDatabase, expense: ExpenseCreate, user: Us
         owner_id=user.id
     )
     
-    expense_doc = expense_in_db.model_dump(exclude={"id"})
-    
-    result = await db[EXPENSES_COLLECTION].insert_one(expense_doc)
-    
-    created_doc = await db[EXPENSES_COLLECTION].find_one({"_id": result.inserted_id})
+    # The document is returned as written; reading it back would cost another round trip
+    created_doc = await db_ops.insert_one(db, EXPENSES_COLLECTION, _to_document(expense_in_db, expense.receipt_text))
+    await rollup_service.add_expenses(db, [created_doc])
+    await category_model_service.learn_expenses(db, user.id, [created_doc])
+    await insights_cache.bump_generation(user.id)
     
     return created_doc
 
-async def get_expenses_by_owner(db: AsyncIOMotorDatabase, user: UserInDB) -> List[dict]:
+async def insert_expenses(db: AsyncIOMotorDatabase, expenses: List[ExpenseCreate], user: UserInDB) -> Tuple[List[Dict[str, Any]], Dict[int, str]]:
+    """
+    Creates many expense records for the given user in a single unordered
+    insert_many, so one bad document does not stop the rest.
+    Returns the documents that were inserted and an error message for each
+    index in `expenses` that was not.
+    """
+    expense_docs = [
+        _to_document(ExpenseInDB(**expense.model_dump(), owner_id=user.id), expense.receipt_text)
+        for expense in expenses
+    ]
+    inserted_docs, errors = await db_ops.insert_many(db, EXPENSES_COLLECTION, expense_docs, ordered=False)
+    if inserted_docs:
+        await rollup_service.add_expenses(db, inserted_docs)
+        await category_model_service.learn_expenses(db, user.id, inserted_docs)
+        await insights_cache.bump_generation(user.id)
+    return inserted_docs, errors
+
+async def add_expenses(db: AsyncIOMotorDatabase, expenses: List[ExpenseCreate], user: UserInDB) -> List[Dict[str, Any]]:
+    """
+    Creates many expense records for the given user in a single round trip.
+    Returns the new documents, including their generated IDs.
     """
-    Retrieves all expenses from the database for a specific user.
+    inserted_docs, _ = await insert_expenses(db, expenses, user)
+    return inserted_docs
+
+def build_expense_query(
+    user: UserInDB,
+    start_date: Optional[datetime] = None,
+    end_date: Optional[datetime] = None,
+    category: Optional[str] = None,
+    min_amount: Optional[float] = None,
+    max_amount: Optional[float] = None,
+) -> Dict[str, Any]:
     """
-    expenses = []
-    cursor = db[EXPENSES_COLLECTION].find({"owner_id": user.id})
-    async for document in cursor:
-        expenses.append(document)
-        
-    return expenses
+    Builds the Mongo filter for a user's expenses. The date range is
+    inclusive of `start_date` and exclusive of `end_date`.
+    """
+    query: Dict[str, Any] = {"owner_id": user.id}
+    if start_date is not None or end_date is not None:
+        query["date"] = {}
+        if start_date is not None:
+            query["date"]["$gte"] = start_date
+        if end_date is not None:
+            query["date"]["$lt"] = end_date
+    if category is not None:
+        query["category"] = category
+    if min_amount is not None or max_amount is not None:
+        query["amount"] = {}
+        if min_amount is not None:
+            query["amount"]["$gte"] = min_amount
+        if max_amount is not None:
+            query["amount"]["$lte"] = max_amount
+    return query
+
+def encode_cursor(doc: Dict[str, Any]) -> str:
+    """Encodes the (date, _id) sort key of the last document on a page."""
+    raw = json.dumps([doc["date"].isoformat(), str(doc["_id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str) -> Tuple[datetime, ObjectId]:
+    """Decodes a page cursor. Raises ValueError if it was not produced by encode_cursor."""
+    try:
+        date, expense_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(date), ObjectId(expense_id)
+    except Exception:
+        raise ValueError("Invalid cursor.")
+
+def find_expenses(
+    db: AsyncIOMotorDatabase,
+    query: Dict[str, Any],
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[List[str]] = None,
+) -> AsyncIOMotorCursor:
+    """
+    Returns a Motor cursor over expenses matching `query`, newest first.
+    Paging is keyset-based on (date, _id): `cursor` resumes after the last
+    document of the previous page, so deep pages cost the same as the first.
+    `fields` limits which fields are fetched (`_id` and `date` always are);
+    otherwise everything but the stored receipt features is.
+    """
+    if cursor is not None:
+        date, expense_id = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"date": {"$lt": date}},
+            {"date": date, "_id": {"$lt": expense_id}},
+        ]}]}
+    if fields:
+        projection = {field: True for field in [*fields, "date"]}
+    else:
+        projection = {category_model_service.RECEIPT_FEATURES_FIELD: False}
+    db_cursor = db_ops.find(db, EXPENSES_COLLECTION, query, projection).sort([("date", -1), ("_id", -1)])
+    if limit is not None:
+        db_cursor = db_cursor.limit(limit)
+    return db_cursor
+
+async def get_expenses_page(
+    db: AsyncIOMotorDatabase,
+    query: Dict[str, Any],
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Retrieves one page of expenses. Returns the documents and the cursor
+    for the next page, or None if this is the last page.
+    """
+    docs = await find_expenses(db, query, cursor=cursor, limit=limit + 1).to_list(limit + 1)
+    if len(docs) > limit:
+        docs = docs[:limit]
+        return docs, encode_cursor(docs[-1])
+    return docs, None
 
 async def update_expense_by_id(db: AsyncIOMotorDatabase, expense_id: str, expense_update: ExpenseUpdate, user: UserInDB) -> Optional[Dict[str, Any]]:
     """
@@ -44,21 +158,25 @@ async def update_expense_by_id(db: AsyncIOMotorDatabase, expense_id: str, expens
 
     # If there's nothing to update, don't perform the operation
     if not update_data:
-        return await db[EXPENSES_COLLECTION].find_one({"_id": ObjectId(expense_id), "owner_id": user.id})
+        return await db_ops.find_one(db, EXPENSES_COLLECTION, {"_id": ObjectId(expense_id), "owner_id": user.id})
 
-    result = await db[EXPENSES_COLLECTION].update_one(
+    # Fetch the previous version in the same round trip so the rollups can be
+    # adjusted; the updated document is then built locally rather than read back.
+    previous_doc = await db_ops.find_one_and_update(
+        db, EXPENSES_COLLECTION,
         {"_id": ObjectId(expense_id), "owner_id": user.id},
-        {"$set": update_data}
+        {"$set": update_data},
+        return_document=ReturnDocument.BEFORE
     )
+    if previous_doc is None:
+        return None
 
-    if result.modified_count > 0:
-        updated_doc = await db[EXPENSES_COLLECTION].find_one({"_id": ObjectId(expense_id)})
-        return updated_doc
-    
-    # If nothing was modified (e.g., expense not found), check if the doc exists
-    # This handles cases where the submitted data is identical to the existing data
-    existing_doc = await db[EXPENSES_COLLECTION].find_one({"_id": ObjectId(expense_id), "owner_id": user.id})
-    return existing_doc
+    updated_doc = {**previous_doc, **update_data}
+    await rollup_service.replace_expense(db, previous_doc, updated_doc)
+    # A changed category is the user correcting it, which the category model learns from
+    await category_model_service.relearn_expense(db, user.id, previous_doc, updated_doc)
+    await insights_cache.bump_generation(user.id)
+    return updated_doc
 
 
 async def delete_expense_by_id(db: AsyncIOMotorDatabase, expense_id: str, user: UserInDB) -> bool:
@@ -66,7 +184,131 @@ async def delete_expense_by_id(db: AsyncIOMotorDatabase, expense_id: str, user:
     Deletes an expense by its ID, ensuring it belongs to the current user.
     Returns True if an expense was deleted, False otherwise.
     """
-    delete_result = await db[EXPENSES_COLLECTION].delete_one(
-        {"_id": ObjectId(expense_id), "owner_id": user.id}
+    deleted_doc = await db_ops.find_one_and_delete(
+        db, EXPENSES_COLLECTION, {"_id": ObjectId(expense_id), "owner_id": user.id}
     )
-    return delete_result.deleted_count > 0
\ No newline at end of file
+    if deleted_doc is None:
+        return False
+    await rollup_service.remove_expenses(db, [deleted_doc])
+    await category_model_service.forget_expenses(db, user.id, [deleted_doc])
+    await insights_cache.bump_generation(user.id)
+    return True
+
+
+# --- BATCH UPDATE AND DELETE ---
+
+# Per-id outcomes reported by the batch endpoints
+BATCH_UPDATED = "updated"
+BATCH_DELETED = "deleted"
+BATCH_NOT_FOUND = "not_found"
+BATCH_INVALID_ID = "invalid_id"
+
+async def _find_batch_targets(
+    db: AsyncIOMotorDatabase,
+    user: UserInDB,
+    ids: Optional[List[str]],
+    query: Optional[Dict[str, Any]],
+    max_expenses: int,
+) -> Tuple[List[Dict[str, Any]], Dict[str, str]]:
+    """
+    Loads the expenses a batch request selects, by id or by filter, in one query.
+    Returns the documents and the outcome for ids that matched nothing.
+    """
+    outcomes: Dict[str, str] = {}
+    if ids is not None:
+        object_ids = []
+        for expense_id in ids:
+            if ObjectId.is_valid(expense_id):
+                object_ids.append(ObjectId(expense_id))
+            else:
+                outcomes[expense_id] = BATCH_INVALID_ID
+        query = {"_id": {"$in": object_ids}, "owner_id": user.id}
+
+    # Only what the rollups and the category model need is fetched
+    projection = {
+        "owner_id": True, "date": True, "amount": True, "category": True, "description": True,
+        category_model_service.RECEIPT_FEATURES_FIELD: True,
+    }
+    docs = await db_ops.find(db, EXPENSES_COLLECTION, query, projection).to_list(max_expenses + 1)
+    if len(docs) > max_expenses:
+        raise ValueError(f"The filter matches more than {max_expenses} expenses. Narrow it down.")
+
+    if ids is not None:
+        found = {str(doc["_id"]) for doc in docs}
+        for expense_id in ids:
+            if expense_id not in found:
+                outcomes.setdefault(expense_id, BATCH_NOT_FOUND)
+    return docs, outcomes
+
+def _batch_results(docs: List[Dict[str, Any]], status: str, outcomes: Dict[str, str], ids: Optional[List[str]]) -> List[Dict[str, str]]:
+    """Lists an outcome per requested id, in request order, or per matched expense for filters."""
+    outcomes = {**{str(doc["_id"]): status for doc in docs}, **outcomes}
+    order = ids if ids is not None else outcomes.keys()
+    return [{"id": expense_id, "status": outcomes[expense_id]} for expense_id in dict.fromkeys(order)]
+
+async def update_expenses(
+    db: AsyncIOMotorDatabase,
+    expense_update: ExpenseUpdate,
+    user: UserInDB,
+    ids: Optional[List[str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    max_expenses: int = 10000,
+) -> Dict[str, Any]:
+    """
+    Applies the same update to many of the user's expenses with one update_many.
+    Expenses are selected by `ids` or by a `query` from build_expense_query.
+    Raises ValueError if there is nothing to update or the filter matches too much.
+    """
+    update_data = {k: v for k, v in expense_update.model_dump().items() if v is not None}
+    if not update_data:
+        raise ValueError("No fields to update.")
+
+    docs, outcomes = await _find_batch_targets(db, user, ids, query, max_expenses)
+    if docs:
+        # Updating exactly the loaded ids keeps the rollup adjustment in step with the write
+        result = await db_ops.update_many(
+            db, EXPENSES_COLLECTION,
+            {"_id": {"$in": [doc["_id"] for doc in docs]}, "owner_id": user.id},
+            {"$set": update_data}
+        )
+        if result.matched_count == len(docs):
+            await rollup_service.apply_changes(db, [
+                change for doc in docs for change in ((doc, -1), ({**doc, **update_data}, 1))
+            ])
+        else:
+            # Some expenses were deleted concurrently; recompute rather than guess
+            await rollup_service.rebuild_rollups(db, user.id)
+        if "category" in update_data or "description" in update_data:
+            await category_model_service.apply_changes(db, user.id, [
+                change for doc in docs for change in ((doc, -1), ({**doc, **update_data}, 1))
+            ])
+        await insights_cache.bump_generation(user.id)
+
+    return {"matched": len(docs), "results": _batch_results(docs, BATCH_UPDATED, outcomes, ids)}
+
+async def delete_expenses(
+    db: AsyncIOMotorDatabase,
+    user: UserInDB,
+    ids: Optional[List[str]] = None,
+    query: Optional[Dict[str, Any]] = None,
+    max_expenses: int = 10000,
+) -> Dict[str, Any]:
+    """
+    Deletes many of the user's expenses with one delete_many.
+    Expenses are selected by `ids` or by a `query` from build_expense_query.
+    Raises ValueError if the filter matches too much.
+    """
+    docs, outcomes = await _find_batch_targets(db, user, ids, query, max_expenses)
+    if docs:
+        result = await db_ops.delete_many(
+            db, EXPENSES_COLLECTION,
+            {"_id": {"$in": [doc["_id"] for doc in docs]}, "owner_id": user.id}
+        )
+        if result.deleted_count == len(docs):
+            await rollup_service.remove_expenses(db, docs)
+        else:
+            await rollup_service.rebuild_rollups(db, user.id)
+        await category_model_service.forget_expenses(db, user.id, docs)
+        await insights_cache.bump_generation(user.id)
+
+    return {"matched": len(docs), "results": _batch_results(docs, BATCH_DELETED, outcomes, ids)}
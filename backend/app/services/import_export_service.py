@@ -0,0 +1,149 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from typing import AsyncIterator, BinaryIO, Dict, Any, Iterator, List, Optional, Tuple
+import csv
+import io
+import json
+
+from ..config import settings
+from ..models.schemas import ExpenseCreate, UserInDB
+from . import category_model_service, expense_service
+
+# Columns written by the export, and expected by the CSV import
+EXPORT_FIELDS = ["date", "description", "amount", "category"]
+
+# Only the first few row errors are listed in an import report; the rest are counted.
+MAX_REPORTED_ERRORS = 100
+
+# Each parsed row is (row number, fields, parse error)
+ParsedRow = Tuple[int, Optional[Dict[str, Any]], Optional[str]]
+
+def iter_csv_rows(file: BinaryIO) -> Iterator[ParsedRow]:
+    """Parses a CSV upload with a header row, one line at a time."""
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    try:
+        for row_number, row in enumerate(csv.DictReader(text), start=1):
+            # DictReader puts extra fields under a None key
+            if None in row:
+                yield row_number, None, "Row has more fields than the header."
+                continue
+            yield row_number, row, None
+    finally:
+        # Hand the file back to the upload so it can close it
+        text.detach()
+
+def iter_ndjson_rows(file: BinaryIO) -> Iterator[ParsedRow]:
+    """Parses an NDJSON upload, one JSON object per line. Blank lines are skipped."""
+    for row_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_number, None, "Invalid JSON."
+            continue
+        if not isinstance(row, dict):
+            yield row_number, None, "Each line must be a JSON object."
+            continue
+        yield row_number, row, None
+
+def _read_rows(rows: Iterator[ParsedRow], count: int) -> Tuple[List[ParsedRow], Optional[str]]:
+    """
+    Reads up to `count` rows. A file that cannot be read any further ends the
+    import: the rows before the problem are returned with a message for it.
+    """
+    chunk: List[ParsedRow] = []
+    try:
+        for parsed in rows:
+            chunk.append(parsed)
+            if len(chunk) >= count:
+                break
+    except UnicodeDecodeError:
+        return chunk, "The file must be UTF-8 encoded."
+    except csv.Error as e:
+        return chunk, f"Malformed CSV: {e}"
+    return chunk, None
+
+def _describe(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors())
+
+async def import_expenses(db: AsyncIOMotorDatabase, rows: Iterator[ParsedRow], user: UserInDB) -> Dict[str, Any]:
+    """
+    Validates rows against ExpenseCreate and inserts them in unordered batches.
+    Bad rows are reported and skipped instead of aborting the import. Rows
+    with no category are given the user's suggested category.
+    The upload is read in a thread, a batch at a time, so a large file does
+    not block the event loop. If it cannot be read to the end, the rows before
+    that point are still imported and `error` says why the import stopped.
+    """
+    imported = 0
+    failed = 0
+    errors: List[Dict[str, Any]] = []
+    last_row = 0
+
+    def record_error(row_number: int, message: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"row": row_number, "error": message})
+
+    async def flush(batch: List[Tuple[int, ExpenseCreate]]):
+        nonlocal imported
+        inserted, insert_errors = await expense_service.insert_expenses(db, [expense for _, expense in batch], user)
+        imported += len(inserted)
+        for index, message in insert_errors.items():
+            record_error(batch[index][0], message)
+
+    batch: List[Tuple[int, ExpenseCreate]] = []
+    stopped = None
+    while stopped is None:
+        chunk, stopped = await run_in_threadpool(_read_rows, rows, settings.import_batch_size)
+        if not chunk and stopped is None:
+            break
+        for row_number, row, parse_error in chunk:
+            last_row = row_number
+            if parse_error is not None:
+                record_error(row_number, parse_error)
+                continue
+            if not row.get("category") and row.get("description"):
+                row["category"] = (await category_model_service.suggest_category(db, user.id, str(row["description"])))["category"]
+            try:
+                batch.append((row_number, ExpenseCreate(**row)))
+            except ValidationError as e:
+                record_error(row_number, _describe(e))
+                continue
+            if len(batch) >= settings.import_batch_size:
+                await flush(batch)
+                batch = []
+    if batch:
+        await flush(batch)
+
+    report: Dict[str, Any] = {"imported": imported, "failed": failed, "errors": errors, "error": None}
+    if stopped is not None:
+        report["error"] = f"{stopped} The import stopped after row {last_row}."
+    return report
+
+async def export_expenses(db: AsyncIOMotorDatabase, query: Dict[str, Any], format: str) -> AsyncIterator[str]:
+    """Streams a user's expenses as CSV or NDJSON straight from the database cursor."""
+    cursor = expense_service.find_expenses(db, query, fields=EXPORT_FIELDS)
+    if format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        async for doc in cursor:
+            writer.writerow([doc["date"].isoformat(), doc["description"], doc["amount"], doc["category"]])
+            # Flush in chunks rather than one tiny write per row
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        async for doc in cursor:
+            yield json.dumps({
+                "date": doc["date"].isoformat(),
+                "description": doc["description"],
+                "amount": doc["amount"],
+                "category": doc["category"],
+            }) + "\n"
@@ -0,0 +1,77 @@
+from abc import ABC, abstractmethod
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Hashable, Optional, Union
+import hashlib
+
+from .. import shared_state
+from ..cache import LRUCache
+from ..config import settings
+
+# Insights responses are cached per user and versioned by that user's
+# "expenses generation", which every expense write bumps. A cached entry or
+# ETag from an older generation can never match again, so reads are never
+# stale and nothing has to expire on a timer. Generations live in the shared
+# state, so a write handled by one worker invalidates every worker's entries.
+
+class InsightsCacheBackend(ABC):
+    """Where cached insights live. Subclass this to share entries across processes."""
+    @abstractmethod
+    def get(self, key: Hashable) -> Optional[Any]:
+        """The cached value, or None on a miss."""
+
+    @abstractmethod
+    def set(self, key: Hashable, value: Any):
+        """Stores a value; the backend may evict it at any time."""
+
+class InMemoryInsightsCache(InsightsCacheBackend):
+    """The default backend: an LRU in this process."""
+    def __init__(self, max_entries: Union[int, Callable[[], int]]):
+        self._cache = LRUCache(max_size=max_entries, name="insights")
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        return self._cache.get(key)
+
+    def set(self, key: Hashable, value: Any):
+        self._cache.set(key, value)
+
+backend: InsightsCacheBackend = InMemoryInsightsCache(lambda: settings.insights_cache_max_entries)
+
+_generations = shared_state.Generations("insights")
+
+def get_generation(user_id: ObjectId) -> int:
+    return _generations.get(user_id)
+
+async def refresh_generation(user_id: ObjectId) -> int:
+    """
+    Reads a user's generation from the shared state, picking up writes other
+    workers made since the last sync. Insights call this before using the
+    cache, as their ETags promise data no older than the last write.
+    """
+    return await _generations.current(user_id)
+
+async def bump_generation(user_id: ObjectId):
+    """Marks every cached insight for a user as out of date. Called on each expense write."""
+    await _generations.bump(user_id)
+
+def _version(user_id: ObjectId, route_key: str) -> str:
+    # Today's date is part of the version because "this month" and default
+    # date ranges move on even when no expense changes.
+    today = datetime.now(timezone.utc).date().isoformat()
+    digest = hashlib.sha1(f"{route_key}|{today}".encode()).hexdigest()[:16]
+    # Generations restart at zero with a fresh shared state, so versions also
+    # carry its epoch; otherwise an old ETag could match different data.
+    return f"{shared_state.epoch()}-{get_generation(user_id)}-{digest}"
+
+def etag_for(user_id: ObjectId, route_key: str) -> str:
+    """A weak ETag that changes whenever the user's expenses or the day change."""
+    return f'W/"{_version(user_id, route_key)}"'
+
+async def get_or_compute(user_id: ObjectId, route_key: str, compute: Callable[[], Awaitable[Any]]) -> Any:
+    """Returns the cached response for this user and route, computing and storing it on a miss."""
+    key = (user_id, _version(user_id, route_key))
+    value = backend.get(key)
+    if value is None:
+        value = await compute()
+        backend.set(key, value)
+    return value
@@ -3,36 +3,27 @@ from datetime import datetime, timezone
 from typing import Dict, Any
 
 from ..models.schemas import UserInDB
-from . import expense_service
+from . import db_ops, rollup_service
 
 async def get_dashboard_summary(db: AsyncIOMotorDatabase, user: UserInDB) -> Dict[str, Any]:
     """
-    Calculates a summary of expenses for the dashboard.
+    Calculates a summary of expenses for the dashboard from the monthly rollups.
     """
-    collection = db[expense_service.EXPENSES_COLLECTION]
-    
     # Define the start of the current month
-    today = datetime.now(timezone.utc)
-    start_of_month = today.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    start_of_month = rollup_service.month_of(datetime.now(timezone.utc))
     
     # Create the aggregation pipeline
     pipeline = [
         {"$match": {"owner_id": user.id}},
-        {"$facet": {
-            "total_expenses": [
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-            ],
-            "month_expenses": [
-                {"$match": {"date": {"$gte": start_of_month}}},
-                {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-            ],
-            "transaction_count": [
-                {"$count": "count"}
-            ]
+        {"$group": {
+            "_id": None,
+            "total_expenses": {"$sum": "$total"},
+            "month_expenses": {"$sum": {"$cond": [{"$eq": ["$month", start_of_month]}, "$total", 0]}},
+            "transaction_count": {"$sum": "$count"},
         }}
     ]
     
-    result = await collection.aggregate(pipeline).to_list(1)
+    result = await db_ops.aggregate(db, rollup_service.EXPENSE_ROLLUPS_COLLECTION, pipeline).to_list(1)
     
     # Process the aggregation result
     if not result:
@@ -40,30 +31,29 @@ async def get_dashboard_summary(db: AsyncIOMotorDatabase, user: UserInDB) -> Dic
         
     data = result[0]
     summary = {
-        "total_expenses": data["total_expenses"][0]["total"] if data["total_expenses"] else 0,
-        "month_expenses": data["month_expenses"][0]["total"] if data["month_expenses"] else 0,
-        "transaction_count": data["transaction_count"][0]["count"] if data["transaction_count"] else 0
+        "total_expenses": data["total_expenses"],
+        "month_expenses": data["month_expenses"],
+        "transaction_count": data["transaction_count"]
     }
     
     return summary
 
 async def get_spending_by_category(db: AsyncIOMotorDatabase, user: UserInDB) -> Dict[str, float]:
     """
-    Calculates the total spending for each category.
+    Calculates the total spending for each category from the monthly rollups.
     """
-    collection = db[expense_service.EXPENSES_COLLECTION]
-    
     pipeline = [
-        {"$match": {"owner_id": user.id}},
+        # Buckets emptied by edits and deletes stay behind with a zero count
+        {"$match": {"owner_id": user.id, "count": {"$gt": 0}}},
         {"$group": {
             "_id": "$category",
-            "total_amount": {"$sum": "$amount"}
+            "total_amount": {"$sum": "$total"}
         }}
     ]
     
     results = {}
-    cursor = collection.aggregate(pipeline)
+    cursor = db_ops.aggregate(db, rollup_service.EXPENSE_ROLLUPS_COLLECTION, pipeline)
     async for doc in cursor:
         results[doc["_id"]] = doc["total_amount"]
         
-    return results
\ No newline at end of file
+    return results
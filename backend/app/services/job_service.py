@@ -0,0 +1,130 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from bson import ObjectId, Binary
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, Optional
+import asyncio
+
+from ..models.schemas import UserInDB
+from . import db_ops
+
+OCR_JOBS_COLLECTION = "ocr_jobs"
+
+# Job lifecycle: queued -> running -> done | failed
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+# A job is given up on after this many claims (e.g. its worker kept crashing).
+MAX_JOB_ATTEMPTS = 3
+
+def format_job(doc: dict) -> dict:
+    """Formats a job document into the response shape, leaving out the image bytes."""
+    return {
+        "id": str(doc["_id"]),
+        "status": doc["status"],
+        "filename": doc["filename"],
+        "result": doc.get("result"),
+        "error": doc.get("error"),
+        "created_at": doc["created_at"],
+        "updated_at": doc["updated_at"],
+    }
+
+async def create_job(db: AsyncIOMotorDatabase, image_content: bytes, filename: str, user: UserInDB) -> Dict[str, Any]:
+    """
+    Queues a receipt image for OCR and returns the new job document.
+    The image is kept on the job until a worker has processed it.
+    """
+    now = datetime.now(timezone.utc)
+    job_doc = {
+        "owner_id": user.id,
+        "status": JOB_QUEUED,
+        "filename": filename,
+        "image": Binary(image_content),
+        "attempts": 0,
+        "created_at": now,
+        "updated_at": now,
+    }
+    return await db_ops.insert_one(db, OCR_JOBS_COLLECTION, job_doc)
+
+async def get_job(db: AsyncIOMotorDatabase, job_id: str, user: UserInDB) -> Optional[Dict[str, Any]]:
+    """Retrieves a job by its ID, ensuring it belongs to the current user."""
+    if not ObjectId.is_valid(job_id):
+        return None
+    return await db_ops.find_one(
+        db, OCR_JOBS_COLLECTION,
+        {"_id": ObjectId(job_id), "owner_id": user.id},
+        projection={"image": False}
+    )
+
+async def wait_for_job(db: AsyncIOMotorDatabase, job_id: str, user: UserInDB, timeout: float, poll_interval: float = 0.5) -> Optional[Dict[str, Any]]:
+    """
+    Long-polls a job until it is finished or `timeout` seconds have passed.
+    Returns the latest job document, or None if the job does not exist.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        job = await get_job(db, job_id, user)
+        if job is None or job["status"] in (JOB_DONE, JOB_FAILED) or loop.time() >= deadline:
+            return job
+        await asyncio.sleep(min(poll_interval, max(deadline - loop.time(), 0)))
+
+async def claim_next_job(db: AsyncIOMotorDatabase, lease_seconds: int) -> Optional[Dict[str, Any]]:
+    """
+    Atomically claims the oldest queued job for this worker.
+    Running jobs whose lease has expired (their worker died) are claimed again.
+    """
+    now = datetime.now(timezone.utc)
+    return await db_ops.find_one_and_update(
+        db, OCR_JOBS_COLLECTION,
+        {"$or": [
+            {"status": JOB_QUEUED},
+            {"status": JOB_RUNNING, "lease_expires_at": {"$lt": now}},
+        ]},
+        {
+            "$set": {
+                "status": JOB_RUNNING,
+                "lease_expires_at": now + timedelta(seconds=lease_seconds),
+                "updated_at": now,
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("created_at", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+
+async def complete_job(db: AsyncIOMotorDatabase, job_id: ObjectId, result: Dict[str, Any]):
+    """Stores the OCR result on a job and drops the image it no longer needs."""
+    await db_ops.update_one(
+        db, OCR_JOBS_COLLECTION,
+        {"_id": job_id},
+        {
+            "$set": {"status": JOB_DONE, "result": result, "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"image": "", "lease_expires_at": ""},
+        }
+    )
+
+async def fail_job(db: AsyncIOMotorDatabase, job_id: ObjectId, error: str):
+    """Marks a job as failed with a message the client can show."""
+    await db_ops.update_one(
+        db, OCR_JOBS_COLLECTION,
+        {"_id": job_id},
+        {
+            "$set": {"status": JOB_FAILED, "error": error, "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"image": "", "lease_expires_at": ""},
+        }
+    )
+
+async def requeue_job(db: AsyncIOMotorDatabase, job_id: ObjectId):
+    """Puts a claimed job back on the queue without counting it as an attempt."""
+    await db_ops.update_one(
+        db, OCR_JOBS_COLLECTION,
+        {"_id": job_id},
+        {
+            "$set": {"status": JOB_QUEUED, "updated_at": datetime.now(timezone.utc)},
+            "$unset": {"lease_expires_at": ""},
+            "$inc": {"attempts": -1},
+        }
+    )
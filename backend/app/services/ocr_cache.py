@@ -0,0 +1,85 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+import hashlib
+
+from pymongo.errors import PyMongoError
+
+from ..cache import LRUCache
+from ..config import settings
+from . import db_ops
+
+OCR_CACHE_COLLECTION = "ocr_cache"
+
+class OcrCacheStats:
+    """Counters showing how often the cache saved an OCR run, and how much time it saved."""
+    def __init__(self):
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+        self.saved_ocr_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "memory_hits": self.memory_hits,
+            "persistent_hits": self.persistent_hits,
+            "misses": self.misses,
+            "saved_ocr_seconds": round(self.saved_ocr_seconds, 3),
+            "memory_entries": len(_memory_cache),
+            "memory_bytes": _memory_cache.size,
+        }
+
+def _entry_size(entry: Dict[str, Any]) -> int:
+    # The extracted text dominates an entry's footprint.
+    return len(entry["extracted_text"]) + 200
+
+_memory_cache = LRUCache(max_size=lambda: settings.ocr_cache_max_bytes, sizeof=_entry_size, name="ocr_results")
+stats = OcrCacheStats()
+
+def cache_key(image_content: bytes, engine_version: str) -> str:
+    """Keys results by the exact image bytes and the OCR engine/config that produced them."""
+    image_hash = hashlib.sha256(image_content).hexdigest()
+    engine_hash = hashlib.sha256(engine_version.encode()).hexdigest()[:16]
+    return f"{image_hash}:{engine_hash}"
+
+async def get_cached_result(db: Optional[AsyncIOMotorDatabase], key: str) -> Optional[Dict[str, Any]]:
+    """
+    Looks a result up in memory first, then in the persistent Mongo tier.
+    Persistent hits are promoted into memory. The persistent tier is best
+    effort: if it cannot be read, the lookup counts as a miss.
+    """
+    entry = _memory_cache.get(key)
+    if entry is not None:
+        stats.memory_hits += 1
+        stats.saved_ocr_seconds += entry["ocr_seconds"]
+        return entry
+
+    if db is not None and settings.ocr_cache_persistent:
+        try:
+            doc = await db_ops.find_one(db, OCR_CACHE_COLLECTION, {"_id": key})
+        except PyMongoError as e:
+            print(f"OCR cache read failed, running OCR instead: {e!r}")
+            doc = None
+        if doc is not None:
+            entry = {k: doc[k] for k in ("amount", "category", "extracted_text", "ocr_seconds")}
+            _memory_cache.set(key, entry)
+            stats.persistent_hits += 1
+            stats.saved_ocr_seconds += entry["ocr_seconds"]
+            return entry
+
+    stats.misses += 1
+    return None
+
+async def store_result(db: Optional[AsyncIOMotorDatabase], key: str, entry: Dict[str, Any]):
+    """Stores a fresh OCR result in both tiers; a failed persistent write is only logged."""
+    _memory_cache.set(key, entry)
+    if db is not None and settings.ocr_cache_persistent:
+        try:
+            await db_ops.replace_one(
+                db, OCR_CACHE_COLLECTION,
+                {"_id": key},
+                {**entry, "created_at": datetime.now(timezone.utc)},
+                upsert=True
+            )
+        except PyMongoError as e:
+            print(f"OCR cache write failed: {e!r}")
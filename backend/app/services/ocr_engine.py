@@ -0,0 +1,225 @@
+# backend/app/services/ocr_engine.py
+"""
+The image side of receipt OCR: preprocessing and the Tesseract passes.
+
+This is the only module that needs cv2, numpy, PIL and pytesseract. It runs
+inside OCR worker processes and is imported the first time one runs a job
+(or at startup with WARMUP_PRELOAD=ocr), so API processes that never scan a
+receipt never load it.
+"""
+from io import BytesIO
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pytesseract
+from PIL import Image
+
+from .ocr_service import OcrOptions, StageTimings, find_total_amount
+
+# Each pass turns the grayscale receipt into a binary image for Tesseract.
+# Passes run in the configured order and the engine stops at the first one
+# whose score clears OCR_CONFIDENCE_THRESHOLD, so cheap passes go first and
+# the stronger (slower) fallbacks only run for hard images.
+
+def _simple_threshold(gray_image: np.ndarray) -> np.ndarray:
+    # Good for clean receipts
+    _, image = cv2.threshold(gray_image, 150, 255, cv2.THRESH_BINARY)
+    return image
+
+def _adaptive_threshold(gray_image: np.ndarray) -> np.ndarray:
+    # Good for receipts with shadows/creases
+    return cv2.adaptiveThreshold(
+        gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+        cv2.THRESH_BINARY, 11, 2
+    )
+
+def _otsu_threshold(gray_image: np.ndarray) -> np.ndarray:
+    # Picks the global threshold from the histogram; good for faded or dark prints
+    _, image = cv2.threshold(gray_image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    return image
+
+def _denoise(gray_image: np.ndarray) -> np.ndarray:
+    # Removes sensor noise and paper texture before thresholding
+    denoised = cv2.fastNlMeansDenoising(gray_image, None, h=15)
+    return _otsu_threshold(denoised)
+
+def _deskew(gray_image: np.ndarray) -> np.ndarray:
+    # Straightens receipts photographed at an angle
+    binary = _otsu_threshold(gray_image)
+    points = cv2.findNonZero(cv2.bitwise_not(binary))
+    if points is None:
+        return binary
+    angle = cv2.minAreaRect(points)[-1]
+    if angle > 45:
+        angle -= 90
+    elif angle < -45:
+        angle += 90
+    if abs(angle) < 0.5:
+        return binary
+    height, width = gray_image.shape
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    rotated = cv2.warpAffine(
+        gray_image, matrix, (width, height),
+        flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE
+    )
+    return _adaptive_threshold(rotated)
+
+OCR_PASSES: Dict[str, Callable[[np.ndarray], np.ndarray]] = {
+    "simple": _simple_threshold,
+    "adaptive": _adaptive_threshold,
+    "otsu": _otsu_threshold,
+    "denoise": _denoise,
+    "deskew": _deskew,
+}
+
+# Added to a pass's score when its text has a keyword-anchored total.
+ANCHORED_TOTAL_BONUS = 15.0
+
+def _image_to_data(image: np.ndarray, timeout: float, stages: Optional[StageTimings] = None, pass_name: str = "") -> Tuple[str, float]:
+    """
+    Runs Tesseract on one preprocessed image, killing it after `timeout` seconds.
+    Returns the recognised text and the mean word confidence (0-100).
+    """
+    started = time.perf_counter()
+    try:
+        data = pytesseract.image_to_data(image, timeout=timeout, output_type=pytesseract.Output.DICT)
+    except RuntimeError as e:
+        # pytesseract reports a killed process as a RuntimeError
+        if "timeout" in str(e).lower():
+            raise TimeoutError("OCR pass timed out.")
+        raise
+    recognised = time.perf_counter()
+
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data["text"]):
+        conf = float(data["conf"][i])
+        if conf < 0 or not word.strip():
+            continue
+        key = (data["block_num"][i], data["par_num"][i], data["line_num"][i])
+        lines.setdefault(key, []).append(word)
+        confidences.append(conf)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    if stages is not None:
+        stages.append(("tesseract", pass_name, recognised - started))
+        stages.append(("parse", pass_name, time.perf_counter() - recognised))
+    return text, mean_confidence
+
+def score_ocr_text(text: str, mean_confidence: float) -> float:
+    """Scores a pass by word confidence, rewarding a keyword-anchored total."""
+    _, anchored = find_total_amount(text)
+    return mean_confidence + (ANCHORED_TOTAL_BONUS if anchored else 0.0)
+
+# --- PREPROCESSING: DECODE SMALL, CROP TO THE PAPER, NORMALISE SCALE ---
+
+# cv2 can decode JPEGs directly at 1/2, 1/4 or 1/8 scale, which is much faster
+# and smaller than decoding a full phone photo and shrinking it afterwards.
+_REDUCED_GRAYSCALE_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    1: cv2.IMREAD_GRAYSCALE,
+}
+
+# Receipt detection runs on a thumbnail of this width.
+_CROP_DETECTION_WIDTH = 500
+
+def _decode_grayscale(image_content: bytes, target_width: int, max_pixels: int) -> np.ndarray:
+    """
+    Decodes straight to grayscale at the smallest built-in reduction that still
+    leaves the short side at least `target_width` pixels wide.
+    Images larger than `max_pixels` are rejected before any pixels are decoded.
+    """
+    try:
+        width, height = Image.open(BytesIO(image_content)).size
+    except Exception:
+        raise ValueError("Invalid or corrupted image file.")
+    if width * height > max_pixels:
+        raise ValueError("Image resolution is too large.")
+
+    short_side = min(width, height)
+    factor = next(f for f in _REDUCED_GRAYSCALE_FLAGS if f == 1 or short_side // f >= target_width)
+    gray_image = cv2.imdecode(np.frombuffer(image_content, np.uint8), _REDUCED_GRAYSCALE_FLAGS[factor])
+    if gray_image is None:
+        raise ValueError("Invalid or corrupted image file.")
+    return gray_image
+
+def _crop_to_receipt(gray_image: np.ndarray) -> np.ndarray:
+    """
+    Crops to the bounding box of the receipt paper, found as the largest bright
+    region on a thumbnail. The full image is kept if no plausible region is found.
+    """
+    height, width = gray_image.shape
+    scale = min(1.0, _CROP_DETECTION_WIDTH / width)
+    thumbnail = cv2.resize(gray_image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    blurred = cv2.GaussianBlur(thumbnail, (5, 5), 0)
+    _, mask = cv2.threshold(blurred, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((15, 15), np.uint8))
+    contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    if not contours:
+        return gray_image
+
+    x, y, w, h = cv2.boundingRect(max(contours, key=cv2.contourArea))
+    coverage = (w * h) / float(thumbnail.shape[0] * thumbnail.shape[1])
+    # Too small is probably a label or glare; nearly everything means the photo is already tight.
+    if coverage < 0.2 or coverage > 0.95:
+        return gray_image
+
+    x0, y0 = int(x / scale), int(y / scale)
+    x1, y1 = min(width, int((x + w) / scale)), min(height, int((y + h) / scale))
+    return gray_image[y0:y1, x0:x1]
+
+def preprocess_receipt_image(image_content: bytes, target_width: int, max_pixels: int, stages: Optional[StageTimings] = None) -> np.ndarray:
+    """
+    Produces the grayscale image the OCR passes run on: decoded at reduced
+    scale, cropped to the receipt and resized so the paper is `target_width`
+    pixels wide (about 300 DPI for an 80mm till roll at the default).
+    """
+    started = time.perf_counter()
+    gray_image = _decode_grayscale(image_content, target_width, max_pixels)
+    decoded = time.perf_counter()
+    gray_image = _crop_to_receipt(gray_image)
+    cropped = time.perf_counter()
+
+    width = gray_image.shape[1]
+    if width != target_width:
+        if width > target_width:
+            scale, interpolation = target_width / width, cv2.INTER_AREA
+        else:
+            # Upscaling helps Tesseract with small text, but past 2x it only adds pixels.
+            scale, interpolation = min(2.0, target_width / width), cv2.INTER_CUBIC
+        gray_image = cv2.resize(gray_image, None, fx=scale, fy=scale, interpolation=interpolation)
+
+    if stages is not None:
+        stages.append(("decode", "", decoded - started))
+        stages.append(("crop", "", cropped - decoded))
+        stages.append(("resize", "", time.perf_counter() - cropped))
+    return gray_image
+
+def run_ocr_passes(image_content: bytes, options: OcrOptions) -> Tuple[str, StageTimings]:
+    """
+    Preprocesses the image and runs the OCR passes in order until one scores
+    at least the confidence threshold. Returns the best text seen and the
+    time spent in each stage, which the calling process records.
+    This is blocking CPU work and runs inside an OCR worker process.
+    """
+    stages: StageTimings = []
+    gray_image = preprocess_receipt_image(image_content, options.target_width, options.max_pixels, stages)
+
+    best_text, best_score = "", float("-inf")
+    for name in options.pass_names:
+        started = time.perf_counter()
+        binary_image = OCR_PASSES[name](gray_image)
+        stages.append(("threshold", name, time.perf_counter() - started))
+        text, mean_confidence = _image_to_data(binary_image, options.pass_timeout, stages, name)
+        score = score_ocr_text(text, mean_confidence)
+        if score > best_score:
+            best_text, best_score = text, score
+        if score >= options.confidence_threshold:
+            break
+    return best_text, stages
@@ -1,88 +1,143 @@
 # backend/app/services/ocr_service.py
 
-import pytesseract
-from PIL import Image
 from fastapi import UploadFile
-from io import BytesIO
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from bson import ObjectId
 import re
+import time
 from datetime import datetime
-from typing import Dict, Any
-import cv2
-import numpy as np
+from typing import Dict, Any, List, NamedTuple, Optional, Tuple
+
+from .. import metrics
+from ..config import settings
+from ..executors import ocr_executor
+from . import category_classifier, category_model_service, ocr_cache
 
 # --- ADVANCED PARSING AND CLASSIFICATION LOGIC ---
 
-def parse_total_amount(text: str) -> float:
+_AMOUNT_PATTERN = re.compile(r'(?:[₹$rs\.]\s*)?(\d+\.\d{2})')
+# "subtotal" and "sub total" are covered by "total"
+_TOTAL_KEYWORD_PATTERN = re.compile(r'total|amount|balance|net')
+
+def find_total_amount(text: str) -> Tuple[float, bool]:
+    """
+    Finds the receipt total. Returns the amount and whether it was anchored
+    to a keyword such as "total" (rather than just the largest number seen).
+    """
     priority_amounts = []
     other_amounts = []
-    amount_pattern = re.compile(r'(?:[₹$rs\.]\s*)?(\d+\.\d{2})')
-    keywords = ["total", "subtotal", "sub total", "amount", "balance", "net"]
     for line in text.lower().split('\n'):
-        matches = amount_pattern.findall(line.replace(',', ''))
+        matches = _AMOUNT_PATTERN.findall(line.replace(',', ''))
         if not matches:
             continue
         line_amounts = [float(m) for m in matches]
-        if any(keyword in line for keyword in keywords):
+        if _TOTAL_KEYWORD_PATTERN.search(line):
             priority_amounts.extend(line_amounts)
         else:
             other_amounts.extend(line_amounts)
     if priority_amounts:
-        return max(priority_amounts)
+        return max(priority_amounts), True
     if other_amounts:
-        return max(other_amounts)
-    return 0.0
+        return max(other_amounts), False
+    return 0.0, False
+
+def parse_total_amount(text: str) -> float:
+    return find_total_amount(text)[0]
 
 def classify_category_with_scoring(text: str) -> str:
-    text = text.lower()
-    scores = {"Food": 0, "Travel": 0, "Shopping": 0, "Bills": 0, "Misc": 1}
-    keyword_scores = {
-        "Food": {"restaurant": 10, "bhavan": 10, "cafe": 8, "food": 5, "hotel": 5, "swiggy": 5, "zomato": 5, "pongal": 3, "vadai": 3, "roast": 3, "tea": 2},
-        "Travel": {"uber": 10, "ola": 10, "taxi": 8, "flight": 8, "fuel": 5, "gas": 5, "metro": 3},
-        "Shopping": {"walmart": 10, "target": 10, "amazon": 10, "dmart": 8, "market": 5},
-        "Bills": {"bill": 2, "invoice": 2, "electricity": 10, "phone": 8, "bill no": -5}
-    }
-    for category, keywords in keyword_scores.items():
-        for keyword, score in keywords.items():
-            if keyword in text:
-                scores[category] += score
-    return max(scores, key=scores.get)
+    """Picks a category using the rules in the category rules file."""
+    return category_classifier.classify(text).category
 
 # --- THE MULTI-PASS OCR ENGINE ---
+# The engine itself (preprocessing and the Tesseract passes) is in ocr_engine,
+# which pulls in cv2, numpy, PIL and pytesseract. Only OCR worker processes
+# import it, when they run their first job.
 
-async def process_receipt_image(file: UploadFile) -> Dict[str, Any]:
-    image_content = await file.read()
-    
-    try:
-        np_arr = np.frombuffer(image_content, np.uint8)
-        image = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-        gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    except Exception:
-        raise ValueError("Invalid or corrupted image file.")
-
-    # --- Pass 1: Simple Thresholding (Good for clean receipts) ---
-    _, simple_thresh_image = cv2.threshold(gray_image, 150, 255, cv2.THRESH_BINARY)
-    text_simple = pytesseract.image_to_string(simple_thresh_image)
-
-    # --- Pass 2: Adaptive Thresholding (Good for receipts with shadows/creases) ---
-    adaptive_thresh_image = cv2.adaptiveThreshold(
-        gray_image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-        cv2.THRESH_BINARY, 11, 2
+# Bump whenever preprocessing, passes or amount parsing change, so
+# cached results from the old engine are no longer used.
+OCR_ENGINE_VERSION = "1"
+
+# Time spent in each OCR stage, as (stage, pass name or "", seconds)
+StageTimings = List[Tuple[str, str, float]]
+
+class OcrOptions(NamedTuple):
+    """Engine settings sent along with each image to the OCR worker process."""
+    pass_names: List[str]
+    pass_timeout: float
+    confidence_threshold: float
+    target_width: int
+    max_pixels: int
+
+def get_ocr_options() -> OcrOptions:
+    return OcrOptions(
+        pass_names=list(settings.ocr_passes),
+        pass_timeout=settings.ocr_pass_timeout_seconds,
+        confidence_threshold=settings.ocr_confidence_threshold,
+        target_width=settings.ocr_target_width,
+        max_pixels=settings.ocr_max_image_pixels,
     )
-    text_adaptive = pytesseract.image_to_string(adaptive_thresh_image)
-    
-    # --- The Decision Logic: Pick the best result ---
-    # We choose the result that has the most characters, as it's the most likely to be correct.
-    results = [text_simple, text_adaptive]
-    best_text = max(results, key=len)
-
-    # Now, parse the BEST text we found
-    total_amount = parse_total_amount(best_text)
-    category = classify_category_with_scoring(best_text)
-    
+
+def run_ocr_passes_in_worker(image_content: bytes, options: OcrOptions) -> Tuple[str, StageTimings]:
+    """Runs ocr_engine.run_ocr_passes; called in an OCR worker process, so only that process imports the engine."""
+    from . import ocr_engine
+    return ocr_engine.run_ocr_passes(image_content, options)
+
+def _record_stage_timings(stages: StageTimings, total_seconds: float):
+    # Whatever the stages do not account for was spent waiting for a worker
+    # process and passing the image to it and the text back.
+    stages = stages + [("queue", "", max(total_seconds - sum(seconds for _, _, seconds in stages), 0.0))]
+    for stage, pass_name, seconds in stages:
+        metrics.ocr_stage_duration.observe(seconds, stage, pass_name)
+        metrics.record_span(f"ocr {stage} {pass_name}".rstrip(), seconds)
+
+async def suggest_receipt_category(text: str, db: Optional[AsyncIOMotorDatabase] = None, owner_id: Optional[ObjectId] = None) -> str:
+    """The user's learned category for the receipt when it is confident, otherwise the rules' choice."""
+    if db is not None and owner_id is not None:
+        return (await category_model_service.suggest_category(db, owner_id, text))["category"]
+    return classify_category_with_scoring(text)
+
+async def process_receipt_bytes(image_content: bytes, filename: str, db: Optional[AsyncIOMotorDatabase] = None, owner_id: Optional[ObjectId] = None) -> Dict[str, Any]:
+    """
+    Runs the OCR passes on the OCR executor so the event loop stays free.
+    Results are cached by image content, so a re-uploaded receipt skips OCR.
+    Given an owner, the category comes from that user's learned model first.
+    Raises ExecutorBusyError when the OCR queue is full and
+    TimeoutError when the passes take too long.
+    """
+    if len(image_content) > settings.ocr_max_upload_bytes:
+        raise ValueError("Image file is too large.")
+
+    options = get_ocr_options()
+    key = ocr_cache.cache_key(image_content, f"{OCR_ENGINE_VERSION}:{options!r}")
+    entry = await ocr_cache.get_cached_result(db, key)
+    if entry is None:
+        started = time.perf_counter()
+        best_text, stages = await ocr_executor.run(
+            run_ocr_passes_in_worker, image_content, options,
+            timeout=options.pass_timeout * len(options.pass_names) + 5,
+        )
+        ocr_seconds = time.perf_counter() - started
+        _record_stage_timings(stages, ocr_seconds)
+        # Now, parse the BEST text we found
+        entry = {
+            "amount": parse_total_amount(best_text),
+            "category": classify_category_with_scoring(best_text),
+            "extracted_text": best_text,
+            "ocr_seconds": ocr_seconds,
+        }
+        await ocr_cache.store_result(db, key, entry)
+
+    # The category is always worked out afresh: rules can change at runtime and
+    # the learned model is per user, while the cache is shared by everyone.
     return {
-        "amount": total_amount,
-        "category": category,
-        "description": f"Scanned Receipt ({file.filename})",
+        "amount": entry["amount"],
+        "category": await suggest_receipt_category(entry["extracted_text"], db, owner_id),
+        "description": f"Scanned Receipt ({filename})",
         "date": datetime.now().isoformat(),
-        "extracted_text": best_text,
-    }
\ No newline at end of file
+        "extracted_text": entry["extracted_text"],
+    }
+
+async def process_receipt_image(file: UploadFile, db: Optional[AsyncIOMotorDatabase] = None, owner_id: Optional[ObjectId] = None) -> Dict[str, Any]:
+    """Reads an uploaded receipt image and extracts the expense details from it."""
+    image_content = await file.read()
+    return await process_receipt_bytes(image_content, file.filename, db, owner_id)
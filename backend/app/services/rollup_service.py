@@ -0,0 +1,160 @@
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReplaceOne, UpdateOne
+from bson import ObjectId
+from datetime import datetime, timezone
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+import uuid
+
+from .. import shared_state
+from . import db_ops, expense_service
+
+# One document per (owner_id, month, category) holding the sum and count of
+# that user's expenses, kept up to date by the expense write paths so the
+# insights endpoints read a handful of rollups instead of every expense.
+EXPENSE_ROLLUPS_COLLECTION = "expense_rollups"
+
+# Set on buckets a rebuild has not rewritten yet
+STALE_FIELD = "stale"
+# Recomputed buckets written per bulk_write during a rebuild
+REBUILD_BATCH_SIZE = 1000
+# Held by the worker backfilling the rollups; expires if that worker dies
+BACKFILL_LOCK = "rollup_backfill"
+BACKFILL_LOCK_SECONDS = 600
+
+def month_of(date: datetime) -> datetime:
+    """The start of the (UTC) month a date falls in, as stored by MongoDB."""
+    if date.tzinfo is not None:
+        date = date.astimezone(timezone.utc).replace(tzinfo=None)
+    return datetime(date.year, date.month, 1)
+
+def _bucket(doc: Dict[str, Any]) -> Tuple[ObjectId, datetime, str]:
+    return doc["owner_id"], month_of(doc["date"]), doc["category"]
+
+async def apply_changes(db: AsyncIOMotorDatabase, changes: Iterable[Tuple[Dict[str, Any], int]]):
+    """
+    Applies expense changes to the rollups in one bulk write. Each change is
+    an expense document and +1 (added) or -1 (removed); an edit is the old
+    document removed plus the new one added.
+    """
+    deltas: Dict[Tuple[ObjectId, datetime, str], List[float]] = {}
+    for doc, sign in changes:
+        delta = deltas.setdefault(_bucket(doc), [0.0, 0])
+        delta[0] += sign * doc["amount"]
+        delta[1] += sign
+
+    operations = [
+        UpdateOne(
+            {"owner_id": owner_id, "month": month, "category": category},
+            {"$inc": {"total": total, "count": count}, "$unset": {STALE_FIELD: ""}},
+            upsert=True,
+        )
+        for (owner_id, month, category), (total, count) in deltas.items()
+        if total or count
+    ]
+    if operations:
+        await db_ops.bulk_write(db, EXPENSE_ROLLUPS_COLLECTION, operations, ordered=False)
+
+async def add_expenses(db: AsyncIOMotorDatabase, docs: List[Dict[str, Any]]):
+    await apply_changes(db, ((doc, 1) for doc in docs))
+
+async def remove_expenses(db: AsyncIOMotorDatabase, docs: List[Dict[str, Any]]):
+    await apply_changes(db, ((doc, -1) for doc in docs))
+
+async def replace_expense(db: AsyncIOMotorDatabase, before: Dict[str, Any], after: Dict[str, Any]):
+    """Moves an edited expense between buckets if its amount, date or category changed."""
+    if _bucket(before) == _bucket(after) and before["amount"] == after["amount"]:
+        return
+    await apply_changes(db, [(before, -1), (after, 1)])
+
+def _rollup_pipeline(match: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Computes rollup documents from the raw expenses."""
+    return [
+        {"$match": match},
+        {"$group": {
+            "_id": {
+                "owner_id": "$owner_id",
+                "month": {"$dateFromParts": {"year": {"$year": "$date"}, "month": {"$month": "$date"}}},
+                "category": "$category",
+            },
+            "total": {"$sum": "$amount"},
+            "count": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "owner_id": "$_id.owner_id",
+            "month": "$_id.month",
+            "category": "$_id.category",
+            "total": 1,
+            "count": 1,
+        }},
+    ]
+
+async def rebuild_rollups(db: AsyncIOMotorDatabase, owner_id: Optional[ObjectId] = None):
+    """
+    Recomputes the rollups from the raw expenses, for one user or everyone.
+    Used to backfill the collection and to repair drift. Buckets are rewritten
+    in place and only then are buckets with no expenses left removed, so
+    readers never see totals missing part way through.
+    """
+    match = {"owner_id": owner_id} if owner_id is not None else {}
+    # Every existing bucket is marked; rewriting it or an expense write to it clears the mark
+    token = uuid.uuid4().hex
+    await db_ops.update_many(db, EXPENSE_ROLLUPS_COLLECTION, match, {"$set": {STALE_FIELD: token}})
+
+    operations = []
+    async for doc in db_ops.aggregate(db, expense_service.EXPENSES_COLLECTION, _rollup_pipeline(match)):
+        operations.append(ReplaceOne(
+            {"owner_id": doc["owner_id"], "month": doc["month"], "category": doc["category"]}, doc, upsert=True
+        ))
+        if len(operations) == REBUILD_BATCH_SIZE:
+            await db_ops.bulk_write(db, EXPENSE_ROLLUPS_COLLECTION, operations, ordered=False)
+            operations = []
+    if operations:
+        await db_ops.bulk_write(db, EXPENSE_ROLLUPS_COLLECTION, operations, ordered=False)
+
+    await db_ops.delete_many(db, EXPENSE_ROLLUPS_COLLECTION, {**match, STALE_FIELD: token})
+
+async def backfill_if_empty(db: AsyncIOMotorDatabase):
+    """
+    Builds the rollups on first startup after upgrading, when expenses exist
+    but no rollups do. Every worker calls this on startup; one builds them
+    while the others start without waiting.
+    """
+    if await db_ops.find_one(db, EXPENSE_ROLLUPS_COLLECTION, {}, projection={"_id": True}) is not None:
+        return
+    if await db_ops.find_one(db, expense_service.EXPENSES_COLLECTION, {}, projection={"_id": True}) is None:
+        return
+    if not await shared_state.state.try_lock(BACKFILL_LOCK, BACKFILL_LOCK_SECONDS):
+        return
+    try:
+        print("Building expense rollups...")
+        await rebuild_rollups(db)
+    finally:
+        await shared_state.state.unlock(BACKFILL_LOCK)
+
+async def find_rollup_drift(db: AsyncIOMotorDatabase, owner_id: Optional[ObjectId] = None, tolerance: float = 0.005) -> List[Dict[str, Any]]:
+    """
+    Compares the stored rollups with the raw expenses without changing anything.
+    Returns the buckets whose stored total or count is wrong.
+    """
+    match = {"owner_id": owner_id} if owner_id is not None else {}
+    expected = {}
+    async for doc in db_ops.aggregate(db, expense_service.EXPENSES_COLLECTION, _rollup_pipeline(match)):
+        expected[(doc["owner_id"], doc["month"], doc["category"])] = (doc["total"], doc["count"])
+
+    stored = {}
+    async for doc in db_ops.find(db, EXPENSE_ROLLUPS_COLLECTION, {**match, "count": {"$ne": 0}}):
+        stored[(doc["owner_id"], doc["month"], doc["category"])] = (doc["total"], doc["count"])
+
+    drift = []
+    for key in expected.keys() | stored.keys():
+        expected_total, expected_count = expected.get(key, (0.0, 0))
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        if expected_count != stored_count or abs(expected_total - stored_total) > tolerance:
+            owner, month, category = key
+            drift.append({
+                "owner_id": owner, "month": month, "category": category,
+                "expected": {"total": expected_total, "count": expected_count},
+                "stored": {"total": stored_total, "count": stored_count},
+            })
+    return drift
@@ -2,29 +2,45 @@ from motor.motor_asyncio import AsyncIOMotorDatabase
 from typing import Optional
 
 from ..models.schemas import UserCreate, UserInDB
-from ..security import get_password_hash
+from ..security import hash_password
+from . import db_ops
 
 USERS_COLLECTION = "users"
 
 async def get_user_by_email(db: AsyncIOMotorDatabase, email: str) -> Optional[UserInDB]:
     """Finds a user by their email in the database."""
-    user_doc = await db[USERS_COLLECTION].find_one({"email": email})
+    user_doc = await db_ops.find_one(db, USERS_COLLECTION, {"email": email})
     if user_doc:
         return UserInDB(**user_doc)
     return None
 
 async def create_user(db: AsyncIOMotorDatabase, user: UserCreate) -> UserInDB:
-    """Creates a new user in the database."""
-    hashed_password = get_password_hash(user.password)
+    """
+    Creates a new user in the database, with the ID it was stored under.
+    Raises DuplicateKeyError if the email is already registered.
+    """
+    hashed_password = await hash_password(user.password)
     
     user_in_db = UserInDB(
         email=user.email,
         hashed_password=hashed_password
     )
     
-    # Using model_dump to convert Pydantic model to a dict for MongoDB
-    user_doc = user_in_db.model_dump(exclude={"id"}) 
+    # Using model_dump to convert Pydantic model to a dict for MongoDB; the
+    # model's generated id is stored as _id so the returned user matches
+    user_doc = {"_id": user_in_db.id, **user_in_db.model_dump(exclude={"id"})}
     
-    await db[USERS_COLLECTION].insert_one(user_doc)
+    await db_ops.insert_one(db, USERS_COLLECTION, user_doc)
     
-    return user_in_db
\ No newline at end of file
+    return user_in_db
+
+async def update_password_hash(db: AsyncIOMotorDatabase, email: str, hashed_password: str):
+    """
+    Replaces a user's stored password hash, e.g. after a bcrypt cost change.
+    Callers must also call auth.invalidate_user, which drops the cached copies.
+    """
+    await db_ops.update_one(
+        db, USERS_COLLECTION,
+        {"email": email},
+        {"$set": {"hashed_password": hashed_password}}
+    )
@@ -0,0 +1,268 @@
+"""
+State shared by every worker process: counters, cache invalidation signals,
+rate-limit token buckets and locks.
+
+With one process everything can live in memory ("local", the default). Under
+`python -m app.serve` with several workers, or several nodes, set
+SHARED_STATE_BACKEND=mongo so a write handled by one worker invalidates the
+caches of all of them. Hot paths never wait on the store: each process keeps
+a mirror of the generation numbers it has seen, and a sync task pulls other
+workers' changes into it every SHARED_STATE_SYNC_SECONDS.
+"""
+import asyncio
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+from .cache import LRUCache
+from .config import settings
+from .services import db_ops
+
+SHARED_STATE_COLLECTION = "shared_state"
+
+class SharedState(ABC):
+    """Where shared state lives. Subclass this to back it with another store."""
+    # Identifies this store's generations; it changes whenever they may have been reset
+    epoch: str = ""
+
+    async def start(self):
+        pass
+
+    @abstractmethod
+    async def incr(self, key: str, amount: int = 1) -> int:
+        """Adds `amount` to a counter (missing counters start at 0) and returns the new value."""
+
+    @abstractmethod
+    async def get(self, key: str) -> int:
+        """A counter's value (0 if it is missing)."""
+
+    @abstractmethod
+    async def changes_since(self, since: Any) -> Tuple[Dict[str, int], Any]:
+        """
+        Counters changed since the position `since` (None for "now"), and the
+        position to pass next time. Counters may be reported more than once.
+        """
+
+    @abstractmethod
+    async def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        """
+        Takes `cost` tokens from a bucket refilled at `rate` tokens a second up
+        to `capacity` (new buckets start full). Returns 0 if they were taken,
+        otherwise the seconds until enough will be available.
+        """
+
+    @abstractmethod
+    async def try_lock(self, key: str, seconds: float) -> bool:
+        """
+        Takes the lock `key` for at most `seconds` if no one holds it.
+        Returns whether it was taken; an expired lock can be taken again.
+        """
+
+    @abstractmethod
+    async def unlock(self, key: str):
+        """Releases a lock taken with try_lock."""
+
+class LocalSharedState(SharedState):
+    """The default backend: state for this process only."""
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self._counters: Dict[str, int] = {}
+        # key -> (tokens, time of the last refill); idle keys are evicted first
+        self._buckets = LRUCache(max_size=lambda: settings.rate_limit_max_buckets, name="rate_buckets")
+        # key -> time the lock expires
+        self._locks: Dict[str, float] = {}
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        self._counters[key] = self._counters.get(key, 0) + amount
+        return self._counters[key]
+
+    async def get(self, key: str) -> int:
+        return self._counters.get(key, 0)
+
+    async def changes_since(self, since: Any) -> Tuple[Dict[str, int], Any]:
+        # Nothing else writes to this process's counters
+        return {}, since
+
+    async def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        now = time.monotonic()
+        tokens, refilled_at = self._buckets.get(key, (capacity, now))
+        tokens = min(capacity, tokens + (now - refilled_at) * rate)
+        retry_after = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            retry_after = (cost - tokens) / rate
+        self._buckets.set(key, (tokens, now))
+        return retry_after
+
+    async def try_lock(self, key: str, seconds: float) -> bool:
+        now = time.monotonic()
+        if self._locks.get(key, now) > now:
+            return False
+        self._locks[key] = now + seconds
+        return True
+
+    async def unlock(self, key: str):
+        self._locks.pop(key, None)
+
+class MongoSharedState(SharedState):
+    """
+    State in the `shared_state` collection: one document per counter, bucket
+    or lock. Counters are permanent, since a generation that went backwards
+    could make stale cache entries current again; idle buckets and locks expire.
+    """
+    # A change committed just behind a newer one can have an earlier
+    # timestamp, so each sync looks back this far past the last one seen.
+    SYNC_OVERLAP = timedelta(seconds=5)
+
+    def __init__(self, db: AsyncIOMotorDatabase):
+        self.db = db
+
+    async def start(self):
+        try:
+            doc = await db_ops.find_one_and_update(
+                self.db, SHARED_STATE_COLLECTION, {"_id": "epoch"},
+                {"$setOnInsert": {"epoch": uuid.uuid4().hex[:8]}}, upsert=True
+            )
+        except DuplicateKeyError:
+            # Another worker starting at the same moment created it first
+            doc = await db_ops.find_one(self.db, SHARED_STATE_COLLECTION, {"_id": "epoch"})
+        self.epoch = doc["epoch"]
+
+    async def incr(self, key: str, amount: int = 1) -> int:
+        doc = await db_ops.find_one_and_update(
+            self.db, SHARED_STATE_COLLECTION, {"_id": key},
+            {"$inc": {"value": amount}, "$currentDate": {"updated_at": True}}, upsert=True
+        )
+        return doc["value"]
+
+    async def get(self, key: str) -> int:
+        doc = await db_ops.find_one(self.db, SHARED_STATE_COLLECTION, {"_id": key}, {"value": 1})
+        return doc["value"] if doc is not None else 0
+
+    async def changes_since(self, since: Optional[datetime]) -> Tuple[Dict[str, int], Optional[datetime]]:
+        if since is None:
+            # Positions come from the server's clock, as updated_at does
+            hello = await db_ops.command(self.db, "hello")
+            return {}, hello["localTime"]
+        docs = await db_ops.find(
+            self.db, SHARED_STATE_COLLECTION,
+            {"updated_at": {"$gt": since - self.SYNC_OVERLAP}}, {"value": 1, "updated_at": 1}
+        ).to_list(None)
+        changes = {doc["_id"]: doc["value"] for doc in docs}
+        return changes, max([since] + [doc["updated_at"] for doc in docs])
+
+    async def take(self, key: str, cost: float, rate: float, capacity: float) -> float:
+        now = time.time()
+        # Refill and take in one atomic update, so concurrent workers cannot both spend the same tokens
+        refilled = {"$min": [capacity, {"$add": [
+            {"$ifNull": ["$tokens", capacity]},
+            {"$multiply": [{"$max": [0, {"$subtract": [now, {"$ifNull": ["$refilled_at", now]}]}]}, rate]},
+        ]}]}
+        doc = await db_ops.find_one_and_update(
+            self.db, SHARED_STATE_COLLECTION, {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "refilled_at": now}},
+                {"$set": {
+                    "taken": {"$gte": ["$tokens", cost]},
+                    # Gone once it would have refilled completely anyway
+                    "expires_at": {"$add": ["$$NOW", int(1000 * capacity / rate) + 1000]},
+                }},
+                {"$set": {"tokens": {"$cond": ["$taken", {"$subtract": ["$tokens", cost]}, "$tokens"]}}},
+            ],
+            upsert=True
+        )
+        return 0.0 if doc["taken"] else (cost - doc["tokens"]) / rate
+
+    async def try_lock(self, key: str, seconds: float) -> bool:
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches only an expired lock; while one is held the upsert collides with it
+            await db_ops.find_one_and_update(
+                self.db, SHARED_STATE_COLLECTION, {"_id": f"lock:{key}", "expires_at": {"$lt": now}},
+                {"$set": {"expires_at": now + timedelta(seconds=seconds)}}, upsert=True
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def unlock(self, key: str):
+        await db_ops.find_one_and_delete(self.db, SHARED_STATE_COLLECTION, {"_id": f"lock:{key}"})
+
+# This process's state; also where per-process rate limits keep their buckets
+local_state = LocalSharedState()
+state: SharedState = local_state
+
+class Generations:
+    """
+    Per-key generation numbers in the shared state, for invalidating cache
+    entries: bumping a key's generation makes everything cached under an older
+    one unusable. `get` reads this process's mirror, which sees its own bumps
+    at once and other workers' within SHARED_STATE_SYNC_SECONDS; `current`
+    asks the store, for callers that cannot accept that delay.
+    """
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._seen: Dict[str, int] = {}
+        _generations[namespace] = self
+
+    def get(self, key: Hashable) -> int:
+        return self._seen.get(str(key), 0)
+
+    async def bump(self, key: Hashable) -> int:
+        value = await state.incr(f"{self.namespace}:{key}")
+        self._observe(str(key), value)
+        return value
+
+    async def current(self, key: Hashable) -> int:
+        self._observe(str(key), await state.get(f"{self.namespace}:{key}"))
+        return self.get(key)
+
+    def _observe(self, key: str, value: int):
+        # Syncs and reads can report an older value than one already seen
+        if value > self._seen.get(key, 0):
+            self._seen[key] = value
+
+_generations: Dict[str, Generations] = {}
+
+def epoch() -> str:
+    return state.epoch
+
+async def _sync_loop(interval: float):
+    position = None
+    while True:
+        try:
+            changes, position = await state.changes_since(position)
+        except Exception as e:
+            # A store outage must not stop the loop; invalidations catch up once it is back
+            print(f"Shared state sync failed: {e!r}")
+        else:
+            for full_key, value in changes.items():
+                namespace, _, key = full_key.partition(":")
+                if namespace in _generations:
+                    _generations[namespace]._observe(key, value)
+        await asyncio.sleep(interval)
+
+_sync_task: Optional[asyncio.Task] = None
+
+async def start(db: AsyncIOMotorDatabase):
+    """Opens the configured backend and starts syncing. Called from the application lifespan."""
+    global state, _sync_task
+    if settings.shared_state_backend == "mongo":
+        state = MongoSharedState(db)
+        # Only other processes' changes need syncing
+        if settings.shared_state_sync_seconds > 0:
+            _sync_task = asyncio.create_task(_sync_loop(settings.shared_state_sync_seconds))
+    await state.start()
+
+async def stop():
+    global _sync_task
+    if _sync_task is not None:
+        _sync_task.cancel()
+        await asyncio.gather(_sync_task, return_exceptions=True)
+        _sync_task = None
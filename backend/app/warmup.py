@@ -0,0 +1,41 @@
+"""
+Optional preloading of heavy subsystems at startup (WARMUP_PRELOAD).
+
+The OCR engine (cv2, numpy, PIL, pytesseract) and NumPy for analytics and
+learned categories are imported on first use, which keeps startup fast but
+puts the import on the first request that needs them. Preloading moves it
+back to startup, for processes that will certainly need them.
+"""
+import asyncio
+import importlib
+import os
+from typing import Awaitable, Callable, Dict, Iterable
+
+from .executors import ocr_executor
+
+def _import_ocr_engine() -> int:
+    importlib.import_module("app.services.ocr_engine")
+    return os.getpid()
+
+async def _preload_ocr():
+    # The engine runs in the OCR pool's processes, so that is where it is
+    # imported. One job per worker also makes the pool start every process.
+    if ocr_executor.pool is None:
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(
+        loop.run_in_executor(ocr_executor.pool, _import_ocr_engine) for _ in range(ocr_executor.max_workers)
+    ))
+
+async def _preload_analytics():
+    importlib.import_module("numpy")
+
+PRELOADS: Dict[str, Callable[[], Awaitable[None]]] = {
+    "ocr": _preload_ocr,
+    "analytics": _preload_analytics,
+}
+
+async def preload(names: Iterable[str]):
+    """Loads the named subsystems now rather than on first use. Called once the executors have started."""
+    for name in names:
+        await PRELOADS[name]()
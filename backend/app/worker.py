@@ -0,0 +1,116 @@
+# backend/app/worker.py
+"""
+Receipt OCR job worker.
+
+Workers claim queued jobs from the Mongo-backed `ocr_jobs` collection, run the
+OCR engine on them and write the result back. They run inside the API process
+(see OCR_JOB_WORKERS) or standalone, scaled separately from the API:
+
+    python -m app.worker
+"""
+import asyncio
+import signal
+from typing import List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from . import warmup
+from .config import settings
+from .database import connect_to_mongo, close_mongo_connection, get_database
+from .executors import ExecutorBusyError, start_executors, shutdown_executors
+from .services import job_service, ocr_service
+
+async def process_job(db: AsyncIOMotorDatabase, job: dict, stop: asyncio.Event):
+    """Runs OCR for one claimed job and records the outcome."""
+    if job["attempts"] > job_service.MAX_JOB_ATTEMPTS:
+        await job_service.fail_job(db, job["_id"], "There was an error processing the file.")
+        return
+
+    try:
+        result = await ocr_service.process_receipt_bytes(bytes(job["image"]), job["filename"], db, job["owner_id"])
+    except ExecutorBusyError as e:
+        # The OCR pool is shared with synchronous uploads; try again once it has room.
+        await job_service.requeue_job(db, job["_id"])
+        await _sleep_until_stopped(stop, e.retry_after)
+    except ValueError as e:
+        await job_service.fail_job(db, job["_id"], str(e))
+    except TimeoutError:
+        await job_service.fail_job(db, job["_id"], "Processing the receipt took too long.")
+    except Exception:
+        await job_service.fail_job(db, job["_id"], "There was an error processing the file.")
+    else:
+        await job_service.complete_job(db, job["_id"], result)
+
+async def _sleep_until_stopped(stop: asyncio.Event, seconds: float):
+    try:
+        await asyncio.wait_for(stop.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+
+# Longest wait between attempts while the database keeps failing
+MAX_ERROR_BACKOFF_SECONDS = 30
+
+async def run_worker(db: AsyncIOMotorDatabase, stop: asyncio.Event):
+    """Claims and processes jobs one at a time until `stop` is set."""
+    failures = 0
+    while not stop.is_set():
+        try:
+            job = await job_service.claim_next_job(db, settings.ocr_job_lease_seconds)
+            if job is not None:
+                await process_job(db, job, stop)
+            failures = 0
+            if job is None:
+                await _sleep_until_stopped(stop, settings.ocr_job_poll_seconds)
+        except Exception as e:
+            # A database outage must not end the loop for good; a job whose
+            # outcome was not recorded is claimed again once its lease expires.
+            failures += 1
+            backoff = min(settings.ocr_job_poll_seconds * 2 ** (failures - 1), MAX_ERROR_BACKOFF_SECONDS)
+            print(f"OCR job worker error (retrying in {backoff:g}s): {e!r}")
+            await _sleep_until_stopped(stop, backoff)
+
+class JobWorkers:
+    """A group of worker loops sharing one stop signal."""
+    def __init__(self):
+        self._stop: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self, db: AsyncIOMotorDatabase, count: int):
+        self._stop = asyncio.Event()
+        self._tasks = [asyncio.create_task(run_worker(db, self._stop)) for _ in range(count)]
+
+    async def stop(self):
+        """Lets in-flight jobs finish, then stops every worker loop."""
+        if self._stop is None:
+            return
+        self._stop.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._stop = None
+
+# Worker loops run inside the API process when OCR_JOB_WORKERS > 0
+job_workers = JobWorkers()
+
+async def main():
+    await connect_to_mongo()
+    start_executors()
+    # Every job needs the OCR engine, so it is loaded before the first one arrives
+    await warmup.preload({"ocr", *settings.warmup_preload})
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    # One loop per OCR process keeps the pool busy without overfilling its queue.
+    job_workers.start(get_database(), settings.ocr_workers)
+    print(f"OCR worker started with {settings.ocr_workers} workers.")
+    await stop.wait()
+
+    print("Stopping OCR worker...")
+    await job_workers.stop()
+    shutdown_executors()
+    await close_mongo_connection()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1 @@
+# Benchmarks for the Smart Finance Assistant backend
@@ -0,0 +1,84 @@
+"""
+Helpers for driving the real FastAPI app in-process with concurrent clients.
+"""
+import asyncio
+import time
+from contextlib import ExitStack, asynccontextmanager
+from unittest import mock
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List
+
+import httpx
+
+from . import _env  # noqa: F401  (must run before the app is imported)
+from app.main import app, lifespan
+
+
+@asynccontextmanager
+async def app_client(mongo_stand_in: bool = False) -> AsyncIterator[httpx.AsyncClient]:
+    """
+    Runs the app's lifespan and yields an HTTP client wired straight to it.
+    With `mongo_stand_in`, the app gets an in-process mongomock database
+    instead of MONGO_DETAILS (`pip install mongomock-motor`). It models no
+    indexes, query planning or I/O, so its numbers are only comparable with
+    other stand-in runs.
+    """
+    with ExitStack() as stack:
+        if mongo_stand_in:
+            from mongomock_motor import AsyncMongoMockClient
+            from app import database
+            stand_in = AsyncMongoMockClient()
+            stack.enter_context(mock.patch.object(
+                database.motor.motor_asyncio, "AsyncIOMotorClient", lambda *args, **kwargs: stand_in))
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=300) as client:
+                yield client
+
+
+async def register_and_login(client: httpx.AsyncClient, email: str, password: str = "benchmark-password") -> Dict[str, str]:
+    """Registers a user (if needed) and returns the Authorization header for them."""
+    await client.post("/api/auth/register", json={"email": email, "password": password})
+    response = await client.post("/api/auth/token", json={"email": email, "password": password})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def run_load(send: Callable[[], Awaitable[httpx.Response]], requests: int, concurrency: int) -> Dict[str, Any]:
+    """
+    Sends `requests` requests with at most `concurrency` in flight and reports
+    throughput and latency percentiles in milliseconds.
+    """
+    latencies: List[float] = []
+    errors = 0
+    remaining = iter(range(requests))
+
+    async def client_loop():
+        nonlocal errors
+        for _ in remaining:
+            start = time.perf_counter()
+            response = await send()
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "rps": round(requests / elapsed, 1),
+        "p50_ms": round(1000 * percentile(latencies, 0.50), 2),
+        "p95_ms": round(1000 * percentile(latencies, 0.95), 2),
+        "p99_ms": round(1000 * percentile(latencies, 0.99), 2),
+    }
@@ -0,0 +1,17 @@
+"""
+Placeholder settings so benchmarks can import the app without a `.env` file.
+Nothing is overridden when a `.env` file or real environment variables exist,
+except that rate limiting is off unless RATE_LIMIT_ENABLED is set in the
+environment.
+"""
+import os
+
+if not os.path.exists(".env"):
+    os.environ.setdefault("MONGO_DETAILS", "mongodb://localhost:27017")
+    os.environ.setdefault("DATABASE_NAME", "finance_assistant_bench")
+    os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+    os.environ.setdefault("ALGORITHM", "HS256")
+    os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+
+# Benchmarks send far more requests per user, all from one address, than the rate limits allow
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
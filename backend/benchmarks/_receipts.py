@@ -0,0 +1,55 @@
+"""
+A reproducible set of synthetic receipt photos for upload benchmarks.
+
+Each receipt is a different merchant, item list and total, drawn on white
+paper over a darker table and JPEG-encoded like a phone photo, so every image
+in a set is a distinct OCR job (no OCR cache hits on the first upload).
+"""
+import random
+from typing import List
+
+from ._seed import MERCHANTS, TYPICAL_AMOUNTS
+
+ITEMS = ["Pongal", "Vadai", "Masala Tea", "Veg Thali", "Cold Coffee", "Taxi Fare", "Fuel Petrol",
+         "Notebook", "Shampoo", "Rice 5kg", "Detergent", "Data Pack", "Energy Charges", "Paracetamol"]
+
+
+def receipt_lines(rng: random.Random) -> List[str]:
+    category = rng.choice(list(MERCHANTS))
+    lines = [rng.choice(MERCHANTS[category]).upper(), f"Bill No: {rng.randint(1000, 99999)}"]
+    subtotal = 0.0
+    for item in rng.sample(ITEMS, rng.randint(2, 6)):
+        price = round(rng.uniform(0.2, 1.5) * TYPICAL_AMOUNTS[category], 2)
+        subtotal += price
+        lines.append(f"{item:<14}{price:>9.2f}")
+    lines += [f"Sub Total     {subtotal:>9.2f}", f"Total         {subtotal * 1.05:>9.2f}", "Thank you, visit again"]
+    return lines
+
+
+def make_receipt_photo(lines: List[str], width: int = 1600, seed: int = 0) -> bytes:
+    """A JPEG of the receipt text on paper, placed slightly off-centre on a table."""
+    import cv2
+    import numpy as np
+
+    rng = random.Random(seed)
+    height = int(width * 4 / 3)
+    photo = np.full((height, width, 3), rng.randint(40, 90), np.uint8)
+
+    paper_w, paper_h = width // 2, int(height * 0.85)
+    x0 = (width - paper_w) // 2 + rng.randint(-width // 10, width // 10)
+    y0 = (height - paper_h) // 2
+    photo[y0:y0 + paper_h, x0:x0 + paper_w] = rng.randint(225, 245)
+
+    font_scale = paper_w / 700
+    line_height = int(45 * font_scale)
+    for i, line in enumerate(lines):
+        cv2.putText(photo, line, (x0 + line_height, y0 + line_height * (i + 2)), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (20, 20, 20), max(1, int(2 * font_scale)))
+    ok, encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def synthetic_receipts(count: int, seed: int = 5) -> List[bytes]:
+    """`count` distinct receipt photos; the same seed always gives the same images."""
+    rng = random.Random(seed)
+    return [make_receipt_photo(receipt_lines(rng), seed=seed + i) for i in range(count)]
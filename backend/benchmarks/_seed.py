@@ -0,0 +1,96 @@
+"""
+Synthetic expense data with a realistic shape: a few categories dominate,
+merchants repeat, amounts are log-normal and dates spread over several years.
+"""
+import random
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from app.services import category_model_service, expense_service, rollup_service, user_service
+
+MERCHANTS = {
+    "Food": ["Saravana Bhavan", "Starbucks", "Swiggy", "Zomato", "Cafe Coffee Day", "Domino's"],
+    "Travel": ["Uber", "Ola", "Metro Card", "Indian Oil", "IndiGo"],
+    "Shopping": ["Amazon", "DMart", "Walmart", "Target", "Local Market"],
+    "Bills": ["Electricity Board", "Airtel Phone", "Water Bill", "Internet"],
+    "Misc": ["Pharmacy", "Gift", "Donation"],
+}
+CATEGORY_WEIGHTS = {"Food": 0.4, "Travel": 0.2, "Shopping": 0.2, "Bills": 0.1, "Misc": 0.1}
+TYPICAL_AMOUNTS = {"Food": 12, "Travel": 20, "Shopping": 45, "Bills": 80, "Misc": 25}
+
+
+def generate_expenses(owner_id: ObjectId, count: int, years: int = 3, seed: int = 42) -> Iterator[Dict[str, Any]]:
+    rng = random.Random(seed)
+    categories = list(CATEGORY_WEIGHTS)
+    weights = list(CATEGORY_WEIGHTS.values())
+    start = datetime(2026, 1, 1) - timedelta(days=365 * years)
+    span_seconds = 365 * years * 24 * 3600
+    for _ in range(count):
+        category = rng.choices(categories, weights)[0]
+        yield {
+            "description": rng.choice(MERCHANTS[category]),
+            "amount": round(rng.lognormvariate(0, 0.6) * TYPICAL_AMOUNTS[category], 2),
+            "category": category,
+            "date": start + timedelta(seconds=rng.randrange(span_seconds)),
+            "owner_id": owner_id,
+        }
+
+
+async def seed_expenses(db: AsyncIOMotorDatabase, owner_id: ObjectId, count: int, batch_size: int = 10_000):
+    """Replaces a user's expenses with `count` synthetic ones and rebuilds their rollups."""
+    await db[expense_service.EXPENSES_COLLECTION].delete_many({"owner_id": owner_id})
+    batch: List[Dict[str, Any]] = []
+    for doc in generate_expenses(owner_id, count):
+        batch.append(doc)
+        if len(batch) == batch_size:
+            await db[expense_service.EXPENSES_COLLECTION].insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        await db[expense_service.EXPENSES_COLLECTION].insert_many(batch, ordered=False)
+    await rollup_service.rebuild_rollups(db, owner_id)
+
+
+def rows_per_user(rows: int, users: int, skew: float = 1.1) -> List[int]:
+    """Splits `rows` over `users` Zipf-style: a few heavy users and a long tail of light ones."""
+    weights = [1 / (rank + 1) ** skew for rank in range(users)]
+    total = sum(weights)
+    counts = [int(rows * weight / total) for weight in weights]
+    counts[0] += rows - sum(counts)
+    return counts
+
+
+async def seed_users(db: AsyncIOMotorDatabase, email_prefix: str, users: int, rows: int, hashed_password: str,
+                     batch_size: int = 10_000) -> List[Dict[str, Any]]:
+    """
+    Replaces every user whose email starts with `email_prefix` (and their
+    expenses, rollups and learned categories) with `users` new ones sharing
+    `rows` synthetic expenses. Rollups are kept up to date as batches go in,
+    the same way the app's own write paths do it.
+    """
+    old_ids = [doc["_id"] async for doc in db[user_service.USERS_COLLECTION].find(
+        {"email": {"$regex": f"^{email_prefix}"}}, {"_id": True})]
+    if old_ids:
+        await db[expense_service.EXPENSES_COLLECTION].delete_many({"owner_id": {"$in": old_ids}})
+        await db[rollup_service.EXPENSE_ROLLUPS_COLLECTION].delete_many({"owner_id": {"$in": old_ids}})
+        await db[category_model_service.CATEGORY_MODELS_COLLECTION].delete_many({"_id": {"$in": old_ids}})
+        await db[user_service.USERS_COLLECTION].delete_many({"_id": {"$in": old_ids}})
+
+    seeded = [{"_id": ObjectId(), "email": f"{email_prefix}{i}@example.com", "hashed_password": hashed_password}
+              for i in range(users)]
+    await db[user_service.USERS_COLLECTION].insert_many([dict(user) for user in seeded])
+
+    batch: List[Dict[str, Any]] = []
+    for i, (user, count) in enumerate(zip(seeded, rows_per_user(rows, users))):
+        for doc in generate_expenses(user["_id"], count, seed=i):
+            batch.append(doc)
+            if len(batch) == batch_size:
+                await db[expense_service.EXPENSES_COLLECTION].insert_many(batch, ordered=False)
+                await rollup_service.add_expenses(db, batch)
+                batch = []
+    if batch:
+        await db[expense_service.EXPENSES_COLLECTION].insert_many(batch, ordered=False)
+        await rollup_service.add_expenses(db, batch)
+    return seeded
@@ -0,0 +1,59 @@
+"""
+Latency of the insights and analytics endpoints for a synthetic user with
+100k+ expenses.
+
+Needs a reachable MongoDB 5.0+ (MONGO_DETAILS); it writes to DATABASE_NAME.
+
+    cd backend
+    python -m benchmarks.analytics [--expenses 100000] [--requests 50]
+"""
+import argparse
+import asyncio
+import json
+
+from ._app import app_client, register_and_login, run_load
+from ._seed import seed_expenses
+from app.database import get_database
+from app.services import user_service
+
+EMAIL = "analytics-bench@example.com"
+
+ENDPOINTS = [
+    "/api/insights/summary",
+    "/api/insights/by-category",
+    "/api/insights/timeseries?granularity=day&start_date=2023-01-01T00:00:00Z&end_date=2026-01-01T00:00:00Z&rolling_window=7",
+    "/api/insights/timeseries?granularity=week&start_date=2023-01-01T00:00:00Z&end_date=2026-01-01T00:00:00Z",
+    "/api/insights/timeseries?granularity=month&start_date=2023-01-01T00:00:00Z&end_date=2026-01-01T00:00:00Z&rolling_window=3",
+    "/api/insights/category-matrix?start_date=2023-01-01T00:00:00Z&end_date=2026-01-01T00:00:00Z",
+    "/api/insights/month-over-month?months=36",
+    "/api/insights/top-merchants?start_date=2023-01-01T00:00:00Z&end_date=2026-01-01T00:00:00Z",
+]
+
+
+async def run(expenses: int, requests: int, concurrency: int):
+    async with app_client() as client:
+        headers = await register_and_login(client, EMAIL)
+        db = get_database()
+        user = await user_service.get_user_by_email(db, EMAIL)
+        await seed_expenses(db, user.id, expenses)
+
+        results = {}
+        for url in ENDPOINTS:
+            async def send(url=url):
+                return await client.get(url, headers=headers)
+            results[url] = await run_load(send, requests, concurrency)
+
+    print(json.dumps({"benchmark": "analytics", "expenses": expenses, "results": results}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--expenses", type=int, default=100_000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(run(args.expenses, args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
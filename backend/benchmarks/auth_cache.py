@@ -0,0 +1,52 @@
+"""
+Requests per second for GET /api/expenses/ with and without the
+authenticated-user cache in `auth.get_current_user`.
+
+Needs a reachable MongoDB (MONGO_DETAILS); it writes to DATABASE_NAME.
+
+    cd backend
+    python -m benchmarks.auth_cache [--requests 2000] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import json
+
+from ._app import app_client, register_and_login, run_load
+from app import auth
+from app.config import settings
+
+
+async def run(requests: int, concurrency: int):
+    async with app_client() as client:
+        headers = await register_and_login(client, "auth-cache-bench@example.com")
+        for i in range(20):
+            await client.post("/api/expenses/", headers=headers, json={
+                "description": f"Coffee {i}", "amount": 4.5, "category": "Food", "date": "2025-09-05T10:00:00Z",
+            })
+
+        async def send():
+            return await client.get("/api/expenses/", headers=headers)
+
+        results = {}
+        configured_ttl = settings.auth_cache_ttl_seconds
+        for label, ttl in (("uncached", 0), ("cached", configured_ttl or 30.0)):
+            settings.auth_cache_ttl_seconds = ttl
+            auth._user_cache.clear()
+            await run_load(send, requests // 10, concurrency)  # warm-up
+            results[label] = await run_load(send, requests, concurrency)
+        settings.auth_cache_ttl_seconds = configured_ttl
+
+    results["speedup"] = round(results["cached"]["rps"] / results["uncached"]["rps"], 2)
+    print(json.dumps({"benchmark": "auth_cache", "results": results}, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Training and prediction cost of the per-user learned category model.
+
+Trains a model on synthetic expense descriptions, as the expense write paths
+do, then times predictions for short descriptions and full receipt texts and
+reports held-out accuracy. No database is needed.
+
+    cd backend
+    python -m benchmarks.category_model [--examples 50 500 5000] [--predictions 2000]
+"""
+import argparse
+import json
+import random
+import time
+
+from . import _env  # noqa: F401  (must run before the app is imported)
+from .classifier import make_corpus
+
+MERCHANTS = {
+    "Food": ["Saravana Bhavan", "Cafe Coffee Day", "Starbucks", "Domino's", "Swiggy order", "Zomato order", "A2B sweets"],
+    "Travel": ["Uber trip", "Ola ride", "Namma Metro recharge", "Indian Oil fuel", "IRCTC ticket", "Rapido bike"],
+    "Groceries": ["DMart", "Reliance Fresh", "BigBasket order", "More supermarket", "Nilgiris"],
+    "Bills": ["BESCOM electricity", "Airtel postpaid", "Jio recharge", "ACT broadband", "Water bill"],
+    "Health": ["Apollo Pharmacy", "MedPlus", "Cult.fit membership", "Dr Rao clinic"],
+}
+
+
+def make_examples(count: int, seed: int = 3) -> list:
+    rng = random.Random(seed)
+    examples = []
+    for _ in range(count):
+        category = rng.choice(list(MERCHANTS))
+        description = f"{rng.choice(MERCHANTS[category])} {rng.choice(['', 'payment', 'order', 'visit', '#' + str(rng.randint(1, 999))])}"
+        examples.append({"description": description.strip(), "category": category})
+    return examples
+
+
+def main():
+    import numpy as np
+    from app.services import category_model_service
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--examples", type=int, nargs="+", default=[50, 500, 5000])
+    parser.add_argument("--predictions", type=int, default=2000)
+    args = parser.parse_args()
+
+    receipts = make_corpus(args.predictions)
+    results = []
+    for count in args.examples:
+        examples = make_examples(count)
+        held_out = make_examples(args.predictions, seed=99)
+        model = category_model_service._empty_model()
+
+        start = time.perf_counter()
+        for example in examples:
+            model.learn(example["category"], category_model_service.extract_features(example["description"]), 1)
+        learn_us = 1e6 * (time.perf_counter() - start) / count
+
+        # The first prediction after learning rebuilds the log-probability tables
+        start = time.perf_counter()
+        model.predict("warm up")
+        rebuild_ms = 1000 * (time.perf_counter() - start)
+
+        def time_predictions(texts):
+            timings = []
+            for text in texts:
+                start = time.perf_counter()
+                model.predict(text)
+                timings.append(time.perf_counter() - start)
+            return {"p50_us": round(1e6 * float(np.percentile(timings, 50)), 1),
+                    "p99_us": round(1e6 * float(np.percentile(timings, 99)), 1)}
+
+        correct = sum(
+            (model.predict(example["description"]) or ("",))[0] == example["category"] for example in held_out
+        )
+        results.append({
+            "examples": count,
+            "learn_us_per_expense": round(learn_us, 1),
+            "table_rebuild_ms": round(rebuild_ms, 2),
+            "predict_description": time_predictions([example["description"] for example in held_out]),
+            "predict_receipt_text": time_predictions(receipts),
+            "held_out_accuracy": round(correct / len(held_out), 3),
+            "model_kb": model.nbytes // 1024,
+        })
+        print(json.dumps(results[-1]))
+
+    print(json.dumps({"benchmark": "category_model", "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Receipt classification throughput: the compiled rules engine against the
+previous per-keyword substring scan.
+
+Runs both over a corpus of synthetic OCR receipt texts and reports time per
+receipt and how often the two agree. Disagreements come from whole-word
+matching ("ola" inside "chocolate") and the merchant aliases, which the old
+scan did not have.
+
+A substring scan costs one pass over the text per term, while the compiled
+engine tokenises once, so the second half pads the bundled rules with
+synthetic merchants and times both approaches over the same, growing rule set.
+
+    cd backend
+    python -m benchmarks.classifier [--receipts 5000] [--repeat 5] [--extra-merchants 0 250 1000] [--show-disagreements 10]
+"""
+import argparse
+import json
+import random
+import time
+
+from . import _env  # noqa: F401  (must run before the app is imported)
+
+
+def legacy_classify(text: str) -> str:
+    """The classifier as it was before the rules file: one substring scan per keyword."""
+    text = text.lower()
+    scores = {"Food": 0, "Travel": 0, "Shopping": 0, "Bills": 0, "Misc": 1}
+    keyword_scores = {
+        "Food": {"restaurant": 10, "bhavan": 10, "cafe": 8, "food": 5, "hotel": 5, "swiggy": 5, "zomato": 5, "pongal": 3, "vadai": 3, "roast": 3, "tea": 2},
+        "Travel": {"uber": 10, "ola": 10, "taxi": 8, "flight": 8, "fuel": 5, "gas": 5, "metro": 3},
+        "Shopping": {"walmart": 10, "target": 10, "amazon": 10, "dmart": 8, "market": 5},
+        "Bills": {"bill": 2, "invoice": 2, "electricity": 10, "phone": 8, "bill no": -5}
+    }
+    for category, keywords in keyword_scores.items():
+        for keyword, score in keywords.items():
+            if keyword in text:
+                scores[category] += score
+    return max(scores, key=scores.get)
+
+
+HEADERS = [
+    "SARAVANA BHAVAN", "Cafe Coffee Day", "Hotel Annapoorna", "Starbucks Coffee", "McDonald's",
+    "Uber India Systems", "Ola Cabs", "Indian Oil Fuel Station", "IRCTC E-Ticket", "IndiGo Boarding Pass",
+    "DMart Supermarket", "Walmart Supercenter", "Amazon.in Order", "Reliance Fresh", "Big Bazaar",
+    "BESCOM Electricity", "Airtel Postpaid", "Reliance Jio", "Tata Power", "Corner Store",
+]
+ITEMS = [
+    "Pongal", "Vadai", "Masala Tea", "Chocolate Cake", "Roast Chicken", "Veg Thali", "Cold Coffee",
+    "Fuel Petrol", "Metro Card", "Taxi Fare", "Toll", "Notebook", "Shampoo", "Rice 5kg", "Phone Charger",
+    "Detergent", "Energy Charges", "Fixed Charges", "Data Pack", "Las Vegas Mug",
+]
+FOOTERS = [
+    "Bill No: {n}", "Invoice #{n}", "Thank you, visit again", "GSTIN 29ABCDE1234F1Z5",
+    "Customer Care 1800-{n}", "Cashier: {n}", "Net Banking Ref {n}",
+]
+
+
+def substring_scanner(rules: dict):
+    """The old approach generalised to a rules file: one `in` check per term."""
+    terms = []
+    for category, rule in rules["categories"].items():
+        terms += [(term, category, weight) for term, weight in rule.get("keywords", {}).items()]
+        terms += [(term, category, -weight) for term, weight in rule.get("negative", {}).items()]
+    for rule in rules.get("merchant_aliases", {}).values():
+        terms += [(alias, rule["category"], rule["weight"]) for alias in rule["aliases"]]
+
+    def classify(text: str) -> str:
+        text = text.lower()
+        scores = dict.fromkeys(rules["categories"], 0)
+        scores[rules["default_category"]] = rules["default_score"]
+        for term, category, weight in terms:
+            if term in text:
+                scores[category] += weight
+        return max(scores, key=scores.get)
+    return classify
+
+
+def with_extra_merchants(rules: dict, count: int, seed: int = 11) -> dict:
+    """The rules plus `count` made-up merchants with two aliases each."""
+    rng = random.Random(seed)
+    rules = json.loads(json.dumps(rules))
+    categories = list(rules["categories"])
+    for i in range(count):
+        name = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(5, 10)))
+        rules["merchant_aliases"][f"{name}-{i}"] = {
+            "category": rng.choice(categories), "weight": 10, "aliases": [name, f"{name} retail"],
+        }
+    return rules
+
+
+def make_corpus(count: int, seed: int = 7) -> list:
+    """Receipt-like texts: a merchant line, item lines with prices, totals and footer lines."""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        lines = [rng.choice(HEADERS), f"Date: {rng.randint(1, 28):02d}/0{rng.randint(1, 9)}/2025"]
+        subtotal = 0.0
+        for item in rng.sample(ITEMS, rng.randint(2, 8)):
+            price = round(rng.uniform(10, 900), 2)
+            subtotal += price
+            lines.append(f"{item:<20} {rng.randint(1, 3)} {price:>9.2f}")
+        lines += [f"Sub Total {subtotal:>18.2f}", f"Total {subtotal * 1.05:>22.2f}"]
+        lines += [rng.choice(FOOTERS).format(n=rng.randint(1000, 99999)) for _ in range(rng.randint(1, 3))]
+        corpus.append("\n".join(lines))
+    return corpus
+
+
+def time_per_receipt(classify, corpus: list, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            classify(text)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus)
+
+
+def main():
+    from app.services import category_classifier
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--receipts", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--extra-merchants", type=int, nargs="+", default=[0, 250, 1000])
+    parser.add_argument("--show-disagreements", type=int, default=0, metavar="N")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.receipts)
+    start = time.perf_counter()
+    category_classifier.load_rules(category_classifier.DEFAULT_RULES_PATH)
+    compile_ms = 1000 * (time.perf_counter() - start)
+
+    def compiled(text: str) -> str:
+        return category_classifier.classify(text).category
+
+    legacy_us = 1e6 * time_per_receipt(legacy_classify, corpus, args.repeat)
+    compiled_us = 1e6 * time_per_receipt(compiled, corpus, args.repeat)
+
+    disagreements = [(text, legacy_classify(text), compiled(text)) for text in corpus if legacy_classify(text) != compiled(text)]
+    for text, old, new in disagreements[:args.show_disagreements]:
+        print(f"--- legacy={old} compiled={new}\n{text}")
+
+    with open(category_classifier.DEFAULT_RULES_PATH, encoding="utf-8") as f:
+        bundled_rules = json.load(f)
+    scaling = []
+    for extra in args.extra_merchants:
+        rules = with_extra_merchants(bundled_rules, extra)
+        engine = category_classifier.CategoryRules(rules)
+        scan_us = 1e6 * time_per_receipt(substring_scanner(rules), corpus, args.repeat)
+        engine_us = 1e6 * time_per_receipt(engine.classify, corpus, args.repeat)
+        scaling.append({
+            "extra_merchants": extra,
+            "substring_scan_us_per_receipt": round(scan_us, 2),
+            "compiled_us_per_receipt": round(engine_us, 2),
+            "speedup": round(scan_us / engine_us, 2),
+        })
+
+    print(json.dumps({
+        "benchmark": "classifier",
+        "receipts": len(corpus),
+        "rules_compile_ms": round(compile_ms, 2),
+        "legacy_us_per_receipt": round(legacy_us, 2),
+        "compiled_us_per_receipt": round(compiled_us, 2),
+        "speedup": round(legacy_us / compiled_us, 2),
+        "agreement": round(1 - len(disagreements) / len(corpus), 4),
+        "scaling": scaling,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Cold-start import cost of the API, measured with `python -X importtime`.
+
+Imports app.main in a fresh interpreter (best of --runs), reports the total
+and the modules that took longest, and exits with status 1 if the total is
+over --budget-ms or if any module that should only load on first use (the
+OCR stack and NumPy) was imported.
+
+    cd backend
+    python -m benchmarks.import_time [--budget-ms 1000] [--runs 3] [--top 15] [--module app.main]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from typing import Any, Dict, List, Tuple
+
+from . import _env  # noqa: F401  (sets placeholder settings for the child interpreter)
+
+# Loaded lazily; importing any of them at startup is a regression
+LAZY_MODULES = ["cv2", "numpy", "PIL", "pytesseract", "app.services.ocr_engine"]
+
+
+def import_times(module: str) -> Tuple[float, List[Dict[str, Any]]]:
+    """The module's cumulative import time in ms, and every imported module's own and cumulative time."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=os.environ,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules.append({"module": name.strip(), "self_ms": int(self_us) / 1000, "cumulative_ms": int(cumulative_us) / 1000})
+    total = next(entry["cumulative_ms"] for entry in modules if entry["module"] == module)
+    return total, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1000)
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to take the best of.")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    # The fastest run is the one least disturbed by the rest of the machine
+    total, modules = min((import_times(args.module) for _ in range(args.runs)), key=lambda run: run[0])
+    imported = {entry["module"] for entry in modules}
+    eager = [name for name in LAZY_MODULES if name in imported]
+
+    report = {
+        "benchmark": "import_time",
+        "module": args.module,
+        "total_ms": round(total, 1),
+        "budget_ms": args.budget_ms,
+        "modules_imported": len(modules),
+        "slowest": [
+            {**entry, "self_ms": round(entry["self_ms"], 1), "cumulative_ms": round(entry["cumulative_ms"], 1)}
+            for entry in sorted(modules, key=lambda entry: entry["self_ms"], reverse=True)[:args.top]
+        ],
+        "eagerly_imported": eager,
+    }
+    print(json.dumps(report, indent=2))
+    if total > args.budget_ms or eager:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Latency and peak RSS of receipt preprocessing against image size.
+
+Compares the old path (full-size BGR decode + grayscale) with the new
+preprocessing stage (reduced grayscale decode, receipt crop, width
+normalisation) on synthetic phone-style receipt photos. Each measurement runs
+in a fresh process so peak RSS is not polluted by earlier runs.
+
+    cd backend
+    python -m benchmarks.ocr_preprocess [--megapixels 1 4 12 24] [--repeat 5] [--ocr]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import time
+
+from . import _env  # noqa: F401  (must run before the app is imported)
+
+
+def make_receipt_photo(megapixels: float) -> bytes:
+    """Renders a receipt (white paper with text) on a dark table as a JPEG."""
+    import cv2
+    import numpy as np
+
+    width = int((megapixels * 1_000_000 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    photo = np.full((height, width, 3), 60, np.uint8)
+
+    paper_w, paper_h = width // 4, int(height * 0.9)
+    x0, y0 = (width - paper_w) // 2, (height - paper_h) // 2
+    photo[y0:y0 + paper_h, x0:x0 + paper_w] = 235
+
+    font_scale = paper_w / 600
+    line_height = int(40 * font_scale)
+    lines = ["SARAVANA BHAVAN", "Pongal      2   120.00", "Vadai       1    45.00",
+             "Tea         2    40.00", "Sub Total        205.00", "Total            215.25"]
+    for i, line in enumerate(lines * 4):
+        y = y0 + line_height * (i + 2)
+        if y > y0 + paper_h - line_height:
+            break
+        cv2.putText(photo, line, (x0 + line_height, y), cv2.FONT_HERSHEY_SIMPLEX,
+                    font_scale, (20, 20, 20), max(1, int(2 * font_scale)))
+    ok, encoded = cv2.imencode(".jpg", photo, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    return encoded.tobytes()
+
+
+def _measure(path: str, image_content: bytes, repeat: int, queue):
+    import cv2
+    import numpy as np
+    from app.services import ocr_engine, ocr_service
+
+    options = ocr_service.get_ocr_options()
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if path == "full_decode":
+            image = cv2.imdecode(np.frombuffer(image_content, np.uint8), cv2.IMREAD_COLOR)
+            gray_image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        elif path == "preprocess":
+            gray_image = ocr_engine.preprocess_receipt_image(
+                image_content, options.target_width, options.max_pixels)
+        else:
+            ocr_engine.run_ocr_passes(image_content, options)
+            gray_image = None
+        timings.append(time.perf_counter() - start)
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put({
+        "path": path,
+        "output_shape": list(gray_image.shape) if gray_image is not None else None,
+        "mean_ms": round(1000 * sum(timings) / len(timings), 2),
+        "min_ms": round(1000 * min(timings), 2),
+        # ru_maxrss is in KB on Linux
+        "peak_rss_delta_mb": round((peak_rss - baseline_rss) / 1024, 1),
+    })
+
+
+def run_isolated(path: str, image_content: bytes, repeat: int) -> dict:
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    process = context.Process(target=_measure, args=(path, image_content, repeat, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megapixels", type=float, nargs="+", default=[1, 4, 12, 24])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--ocr", action="store_true", help="also time the full OCR engine (needs tesseract)")
+    args = parser.parse_args()
+
+    paths = ["full_decode", "preprocess"] + (["ocr"] if args.ocr else [])
+    results = []
+    for megapixels in args.megapixels:
+        image_content = make_receipt_photo(megapixels)
+        for path in paths:
+            result = run_isolated(path, image_content, args.repeat)
+            result.update(megapixels=megapixels, file_kb=len(image_content) // 1024)
+            results.append(result)
+            print(json.dumps(result))
+
+    print(json.dumps({"benchmark": "ocr_preprocess", "cpu_count": os.cpu_count(), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Login throughput, and the tail latency of GET /api/expenses/ while logins are
+under load. bcrypt runs on the bounded password hashing pool, so expense
+requests should stay fast however many logins are in flight.
+
+Needs a reachable MongoDB (MONGO_DETAILS); it writes to DATABASE_NAME.
+
+    cd backend
+    python -m benchmarks.password_hashing [--logins 200] [--login-concurrency 16]
+"""
+import argparse
+import asyncio
+import json
+
+from ._app import app_client, register_and_login, run_load
+from app.executors import password_executor
+
+
+async def run(logins: int, login_concurrency: int, reads: int, read_concurrency: int):
+    email, password = "password-bench@example.com", "benchmark-password"
+    async with app_client() as client:
+        headers = await register_and_login(client, email, password)
+
+        async def login():
+            return await client.post("/api/auth/token", json={"email": email, "password": password})
+
+        async def list_expenses():
+            return await client.get("/api/expenses/", headers=headers)
+
+        idle = await run_load(list_expenses, reads, read_concurrency)
+        login_result, under_load = await asyncio.gather(
+            run_load(login, logins, login_concurrency),
+            run_load(list_expenses, reads, read_concurrency),
+        )
+
+    print(json.dumps({
+        "benchmark": "password_hashing",
+        "results": {
+            "logins": login_result,
+            "expenses_idle": idle,
+            "expenses_during_logins": under_load,
+            "password_pool": password_executor.stats(),
+        },
+    }, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=200)
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    parser.add_argument("--reads", type=int, default=1000)
+    parser.add_argument("--read-concurrency", type=int, default=8)
+    args = parser.parse_args()
+    asyncio.run(run(args.logins, args.login_concurrency, args.reads, args.read_concurrency))
+
+
+if __name__ == "__main__":
+    main()
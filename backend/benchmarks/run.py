@@ -0,0 +1,245 @@
+"""
+The end-to-end benchmark suite: throughput, latency percentiles and peak RSS
+for the main API flows at several dataset sizes, as JSON for comparing
+releases.
+
+For each dataset size it seeds synthetic users (a few heavy, many light) and
+expenses, then drives the real app in-process with concurrent clients:
+register, login, expense create/update/list/delete, both insights endpoints,
+and receipt upload with a fixed set of synthetic receipt photos (first cold,
+then again as OCR cache hits).
+
+Runs against MONGO_DETAILS / DATABASE_NAME, replacing only its own
+`bench-user-*` accounts, or with --stand-in against an in-process mongomock
+database (`pip install mongomock-motor`), which needs no server but models
+no indexes or I/O. Stand-in numbers are only comparable with other stand-in
+runs, and 1M rows in it needs several GB of memory.
+
+    cd backend
+    python -m benchmarks.run [--rows 1000 100000 1000000] [--stand-in] [--output results.json]
+    python -m benchmarks.run --baseline last-release.json [--max-regression 1.25]
+
+With --baseline, scenarios whose p95 latency grew (or throughput fell) by
+more than --max-regression times are listed and the exit status is 1.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from ._app import app_client, run_load
+from ._receipts import synthetic_receipts
+from ._seed import seed_users
+from app import security
+from app.config import settings
+from app.database import get_database
+from app.services import ocr_cache, user_service
+
+EMAIL_PREFIX = "bench-user-"
+PASSWORD = "benchmark-password"
+
+SCENARIOS = [
+    "register", "login", "create_expense", "update_expense", "list_expenses",
+    "insights_summary", "insights_by_category", "delete_expense", "upload_receipt", "upload_receipt_cached",
+]
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident memory so far of this process and of its finished children (OCR workers), in MB."""
+    # ru_maxrss is in KB on Linux
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_dataset(client, rows: int, users: int, args: argparse.Namespace, receipts: List[bytes]) -> Dict[str, Any]:
+    db = get_database()
+    rng = random.Random(rows)
+
+    start = time.perf_counter()
+    # One hash at the configured cost serves every seeded user
+    seeded = await seed_users(db, EMAIL_PREFIX, users, rows, security.get_password_hash(PASSWORD))
+    seed_seconds = time.perf_counter() - start
+    # Tokens are minted directly; logging everyone in would only benchmark bcrypt
+    headers = [{"Authorization": f"Bearer {security.create_access_token({'sub': user['email']})}"} for user in seeded]
+
+    def any_user() -> Dict[str, str]:
+        return rng.choice(headers)
+
+    created: List[tuple] = []
+    register_ids = itertools.count()
+    run_id = f"{rows}-{int(time.time())}"
+
+    async def register():
+        return await client.post("/api/auth/register", json={
+            "email": f"bench-register-{run_id}-{next(register_ids)}@example.com", "password": PASSWORD})
+
+    async def login():
+        return await client.post("/api/auth/token", json={"email": rng.choice(seeded)["email"], "password": PASSWORD})
+
+    async def create_expense():
+        user = any_user()
+        response = await client.post("/api/expenses/", headers=user, json={
+            "description": rng.choice(["Starbucks", "Uber", "DMart", "Airtel Phone", "Pharmacy"]),
+            "amount": round(rng.uniform(1, 200), 2),
+            "category": rng.choice(["Food", "Travel", "Shopping", "Bills", "Misc"]),
+            "date": f"2025-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}T12:00:00Z",
+        })
+        if response.status_code == 201:
+            created.append((user, response.json()["id"]))
+        return response
+
+    updates = itertools.count()
+
+    async def update_expense():
+        user, expense_id = created[next(updates) % len(created)]
+        return await client.put(f"/api/expenses/{expense_id}", headers=user, json={
+            "amount": round(rng.uniform(1, 200), 2), "category": rng.choice(["Food", "Travel", "Shopping"])})
+
+    async def list_expenses():
+        return await client.get("/api/expenses/?limit=50", headers=any_user())
+
+    async def insights_summary():
+        return await client.get("/api/insights/summary", headers=any_user())
+
+    async def insights_by_category():
+        return await client.get("/api/insights/by-category", headers=any_user())
+
+    async def delete_expense():
+        user, expense_id = created.pop()
+        return await client.delete(f"/api/expenses/{expense_id}", headers=user)
+
+    upload_index = itertools.count()
+
+    async def upload_receipt():
+        i = next(upload_index) % len(receipts)
+        return await client.post("/api/upload/receipt", headers=any_user(),
+                                 files={"file": (f"receipt-{i}.jpg", receipts[i], "image/jpeg")})
+
+    senders: Dict[str, Callable] = {
+        "register": register, "login": login, "create_expense": create_expense,
+        "update_expense": update_expense, "list_expenses": list_expenses,
+        "insights_summary": insights_summary, "insights_by_category": insights_by_category,
+        "delete_expense": delete_expense, "upload_receipt": upload_receipt, "upload_receipt_cached": upload_receipt,
+    }
+
+    results: Dict[str, Any] = {}
+    for scenario in args.scenarios:
+        if scenario in ("register", "login"):
+            requests = args.auth_requests
+        elif scenario.startswith("upload_receipt"):
+            requests = len(receipts)
+        elif scenario in ("update_expense", "delete_expense"):
+            requests = min(args.requests, len(created))
+        else:
+            requests = args.requests
+        if requests == 0:
+            continue
+
+        persistent_ocr_cache = settings.ocr_cache_persistent
+        if scenario == "upload_receipt":
+            # Cold: every receipt goes through OCR. The shared Mongo tier is
+            # skipped rather than cleared, and the memory tier refills for the cached run.
+            ocr_cache._memory_cache.clear()
+            settings.ocr_cache_persistent = False
+        try:
+            results[scenario] = {**await run_load(senders[scenario], requests, args.concurrency), "peak_rss_mb": peak_rss_mb()}
+        finally:
+            settings.ocr_cache_persistent = persistent_ocr_cache
+        print(json.dumps({"rows": rows, "scenario": scenario, **results[scenario]}), file=sys.stderr)
+
+    await db[user_service.USERS_COLLECTION].delete_many({"email": {"$regex": f"^bench-register-{run_id}-"}})
+    return {"rows": rows, "users": users, "seed_seconds": round(seed_seconds, 1), "scenarios": results}
+
+
+def find_regressions(report: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[Dict[str, Any]]:
+    """Scenarios present in both reports whose p95 grew, or throughput fell, by more than `max_regression` times."""
+    previous = {(dataset["rows"], name): result for dataset in baseline["datasets"] for name, result in dataset["scenarios"].items()}
+    regressions = []
+    for dataset in report["datasets"]:
+        for name, result in dataset["scenarios"].items():
+            before = previous.get((dataset["rows"], name))
+            if before is None:
+                continue
+            p95_ratio = result["p95_ms"] / before["p95_ms"] if before["p95_ms"] else 1.0
+            rps_ratio = before["rps"] / result["rps"] if result["rps"] else float("inf")
+            if p95_ratio > max_regression or rps_ratio > max_regression:
+                regressions.append({
+                    "rows": dataset["rows"], "scenario": name,
+                    "p95_ms": [before["p95_ms"], result["p95_ms"]], "rps": [before["rps"], result["rps"]],
+                })
+    return regressions
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    receipts = synthetic_receipts(args.receipts)
+    report: Dict[str, Any] = {
+        "benchmark": "suite",
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": "stand-in" if args.stand_in else "mongodb",
+        "settings": {
+            "bcrypt_rounds": settings.bcrypt_rounds,
+            "ocr_workers": settings.ocr_workers,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+        },
+        "datasets": [],
+    }
+    async with app_client(mongo_stand_in=args.stand_in) as client:
+        for rows in args.rows:
+            users = args.users or max(10, min(1000, rows // 1000))
+            report["datasets"].append(await run_dataset(client, rows, users, args, receipts))
+    report["peak_rss_mb"] = peak_rss_mb()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 100_000])
+    parser.add_argument("--users", type=int, default=0, help="Seeded users (default: one per 1000 rows, 10 to 1000).")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--auth-requests", type=int, default=50, help="Requests for register and login, which are bcrypt bound.")
+    parser.add_argument("--receipts", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--stand-in", action="store_true", help="Use an in-process mongomock database.")
+    parser.add_argument("--output", help="Also write the report to this file.")
+    parser.add_argument("--baseline", help="A previous report to compare against.")
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            report["regressions"] = find_regressions(report, json.load(f), args.max_regression)
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    if report.get("regressions"):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cost of turning an expense listing into a JSON response, on the default path
+and on the orjson fast path (FAST_JSON_RESPONSES).
+
+The encoding part needs no database: it serializes synthetic expense
+documents the way FastAPI does for the list route (format, validate against
+ExpenseResponse, dump, json.dumps) and the way the fast path does, and checks
+both give the same JSON. With --end-to-end it also times GET /api/expenses/
+for one user holding that many expenses, with the setting off and on, using
+MONGO_DETAILS or (with --stand-in) an in-process mongomock database.
+
+    cd backend
+    python -m benchmarks.serialization [--rows 10000] [--repeat 20] [--end-to-end [--stand-in]]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any, Callable, Dict, List
+
+from bson import ObjectId
+
+from . import _env  # noqa: F401  (must run before the app is imported)
+from ._seed import generate_expenses
+
+
+def time_calls(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return {"median_ms": round(1000 * statistics.median(timings), 2), "min_ms": round(1000 * min(timings), 2)}
+
+
+def encoding(rows: int, repeat: int) -> Dict[str, Any]:
+    from pydantic import TypeAdapter
+    from app import serialization
+    from app.models import schemas
+    from app.routers.expenses_router import format_expense
+
+    docs = [{"_id": ObjectId(), **doc} for doc in generate_expenses(ObjectId(), rows)]
+    adapter = TypeAdapter(List[schemas.ExpenseResponse])
+
+    def default_path() -> bytes:
+        # What FastAPI does with the route's return value and response_model
+        content = adapter.dump_python(adapter.validate_python([format_expense(doc) for doc in docs]), mode="json")
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+    def fast_path() -> bytes:
+        return serialization.dumps(serialization.expense_list_json(docs))
+
+    default_body, fast_body = default_path(), fast_path()
+    default_time, fast_time = time_calls(default_path, repeat), time_calls(fast_path, repeat)
+    return {
+        "rows": rows,
+        "default": default_time,
+        "fast": fast_time,
+        "speedup": round(default_time["median_ms"] / fast_time["median_ms"], 1),
+        "body_kb": {"default": len(default_body) // 1024, "fast": len(fast_body) // 1024},
+        "same_json": json.loads(default_body) == json.loads(fast_body),
+    }
+
+
+async def end_to_end(rows: int, repeat: int, stand_in: bool) -> Dict[str, Any]:
+    from ._app import app_client
+    from ._seed import seed_users
+    from app import security
+    from app.config import settings
+    from app.database import get_database
+
+    results: Dict[str, Any] = {"rows": rows}
+    fast_setting = settings.fast_json_responses
+    async with app_client(mongo_stand_in=stand_in) as client:
+        user, = await seed_users(get_database(), "bench-serialization-", 1, rows, security.get_password_hash("unused"))
+        headers = {"Authorization": f"Bearer {security.create_access_token({'sub': user['email']})}"}
+        try:
+            for name, fast in (("default", False), ("fast", True)):
+                settings.fast_json_responses = fast
+                timings = []
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    response = await client.get("/api/expenses/", headers=headers)
+                    response.raise_for_status()
+                    timings.append(time.perf_counter() - start)
+                results[name] = {"median_ms": round(1000 * statistics.median(timings), 1),
+                                 "min_ms": round(1000 * min(timings), 1)}
+        finally:
+            settings.fast_json_responses = fast_setting
+    results["speedup"] = round(results["default"]["median_ms"] / results["fast"]["median_ms"], 2)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--end-to-end", action="store_true", help="Also time the list route through the app.")
+    parser.add_argument("--stand-in", action="store_true", help="Use an in-process mongomock database for --end-to-end.")
+    args = parser.parse_args()
+
+    report: Dict[str, Any] = {"benchmark": "serialization", "encoding": encoding(args.rows, args.repeat)}
+    print(json.dumps(report["encoding"]))
+    if args.end_to_end:
+        report["end_to_end"] = asyncio.run(end_to_end(args.rows, args.repeat, args.stand_in))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict
+from unittest import mock
+
+import httpx
+import pytest
+
+# Placeholder settings, so the tests need no .env file; set before the app is imported
+os.environ.setdefault("MONGO_DETAILS", "mongodb://localhost:27017")
+os.environ.setdefault("DATABASE_NAME", "finance_assistant_test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("ALGORITHM", "HS256")
+os.environ.setdefault("ACCESS_TOKEN_EXPIRE_MINUTES", "60")
+# Cheap hashes and no background OCR job loops
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+os.environ.setdefault("OCR_JOB_WORKERS", "0")
+
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+from app import database, shared_state  # noqa: E402
+from app.main import app, lifespan  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@asynccontextmanager
+async def running_app(mongo_client: AsyncMongoMockClient) -> AsyncIterator[httpx.AsyncClient]:
+    """Runs the app's lifespan against an in-process mongomock database and yields a client wired to it."""
+    with mock.patch.object(database.motor.motor_asyncio, "AsyncIOMotorClient", lambda *args, **kwargs: mongo_client):
+        async with lifespan(app):
+            transport = httpx.ASGITransport(app=app, client=("203.0.113.7", 50000))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                yield client
+
+
+@pytest.fixture
+async def client() -> AsyncIterator[httpx.AsyncClient]:
+    # Rate-limit buckets and generations from earlier tests must not leak into this one
+    shared_state.local_state.__init__()
+    async with running_app(AsyncMongoMockClient()) as client:
+        yield client
+
+
+@pytest.fixture
+def login(client: httpx.AsyncClient) -> Callable[[str], Awaitable[Dict[str, str]]]:
+    """Registers a user and returns the Authorization header for them."""
+    async def register_and_login(email: str, password: str = "test-password") -> Dict[str, str]:
+        response = await client.post("/api/auth/register", json={"email": email, "password": password})
+        response.raise_for_status()
+        response = await client.post("/api/auth/token", json={"email": email, "password": password})
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return register_and_login
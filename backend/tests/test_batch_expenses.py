@@ -0,0 +1,135 @@
+import pytest
+from bson import ObjectId
+
+from app.database import get_database
+from app.models import schemas
+from app.services import db_ops, insights_cache, rollup_service
+from app.services.expense_service import EXPENSES_COLLECTION
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def headers(client, login):
+    return await login("batch@example.com")
+
+
+async def create(client, headers, description, amount, category, date="2026-10-01"):
+    response = await client.post("/api/expenses/", headers=headers, json={
+        "description": description, "amount": amount, "category": category, "date": date,
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+async def category_totals(owner_id):
+    totals = {}
+    async for doc in get_database()[rollup_service.EXPENSE_ROLLUPS_COLLECTION].find({"owner_id": owner_id, "count": {"$ne": 0}}):
+        totals[doc["category"]] = (round(doc["total"], 2), doc["count"])
+    return totals
+
+
+async def test_update_by_ids_reports_each_id_once_in_request_order(client, headers, login):
+    coffee = await create(client, headers, "Coffee", 4, "Food")
+    taxi = await create(client, headers, "Taxi", 20, "Travel")
+    theirs = await create(client, await login("other@example.com"), "Lunch", 12, "Food")
+    owner_id = ObjectId(coffee["owner_id"])
+    generation = insights_cache.get_generation(owner_id)
+
+    missing = str(ObjectId())
+    response = await client.patch("/api/expenses/batch", headers=headers, json={
+        "ids": [taxi["id"], "not-an-id", coffee["id"], theirs["id"], taxi["id"], missing],
+        "update": {"category": "Work"},
+    })
+    assert response.status_code == 200
+    assert response.json() == {"matched": 2, "results": [
+        {"id": taxi["id"], "status": "updated"},
+        {"id": "not-an-id", "status": "invalid_id"},
+        {"id": coffee["id"], "status": "updated"},
+        {"id": theirs["id"], "status": "not_found"},
+        {"id": missing, "status": "not_found"},
+    ]}
+
+    expenses = await get_database()[EXPENSES_COLLECTION].find({}, {"category": 1}).to_list(None)
+    assert {str(doc["_id"]): doc["category"] for doc in expenses} == {
+        coffee["id"]: "Work", taxi["id"]: "Work", theirs["id"]: "Food",
+    }
+    assert await category_totals(owner_id) == {"Work": (24, 2)}
+    assert await category_totals(ObjectId(theirs["owner_id"])) == {"Food": (12, 1)}
+    assert insights_cache.get_generation(owner_id) > generation
+
+
+async def test_delete_by_filter_removes_only_matching_expenses(client, headers):
+    await create(client, headers, "Coffee", 4, "Food", "2026-09-15")
+    lunch = await create(client, headers, "Lunch", 12, "Food", "2026-10-02")
+    await create(client, headers, "Taxi", 20, "Travel", "2026-10-03")
+    owner_id = ObjectId(lunch["owner_id"])
+    generation = insights_cache.get_generation(owner_id)
+
+    response = await client.post("/api/expenses/batch-delete", headers=headers, json={
+        "filter": {"category": "Food", "start_date": "2026-10-01"},
+    })
+    assert response.status_code == 200
+    assert response.json() == {"matched": 1, "results": [{"id": lunch["id"], "status": "deleted"}]}
+
+    remaining = (await client.get("/api/expenses/", headers=headers)).json()
+    assert sorted(expense["description"] for expense in remaining) == ["Coffee", "Taxi"]
+    assert await category_totals(owner_id) == {"Food": (4, 1), "Travel": (20, 1)}
+    assert insights_cache.get_generation(owner_id) > generation
+
+    # Nothing matched: nothing written, nothing invalidated
+    generation = insights_cache.get_generation(owner_id)
+    response = await client.post("/api/expenses/batch-delete", headers=headers, json={"ids": [lunch["id"]]})
+    assert response.json() == {"matched": 0, "results": [{"id": lunch["id"], "status": "not_found"}]}
+    assert insights_cache.get_generation(owner_id) == generation
+
+
+async def test_filters_matching_more_than_the_cap_change_nothing(client, headers, monkeypatch):
+    monkeypatch.setattr(schemas, "MAX_BATCH_EXPENSES", 2)
+    for amount in (1, 2, 3):
+        await create(client, headers, "Snack", amount, "Food")
+
+    for method, path, body in (
+        ("PATCH", "/api/expenses/batch", {"filter": {"category": "Food"}, "update": {"category": "Treats"}}),
+        ("POST", "/api/expenses/batch-delete", {"filter": {"category": "Food"}}),
+    ):
+        response = await client.request(method, path, headers=headers, json=body)
+        assert response.status_code == 400
+        assert response.json()["detail"] == "The filter matches more than 2 expenses. Narrow it down."
+
+    assert await get_database()[EXPENSES_COLLECTION].count_documents({"category": "Food"}) == 3
+
+
+@pytest.mark.parametrize("body", [
+    {"update": {"category": "Work"}},
+    {"ids": [], "filter": {}, "update": {"category": "Work"}},
+])
+async def test_exactly_one_selector_is_required(client, headers, body):
+    response = await client.patch("/api/expenses/batch", headers=headers, json=body)
+    assert response.status_code == 422
+
+
+async def test_an_empty_update_is_rejected(client, headers):
+    coffee = await create(client, headers, "Coffee", 4, "Food")
+    response = await client.patch("/api/expenses/batch", headers=headers, json={"ids": [coffee["id"]], "update": {}})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "No fields to update."
+
+
+async def test_rollups_are_rebuilt_when_an_expense_vanishes_mid_batch(client, headers, monkeypatch):
+    coffee = await create(client, headers, "Coffee", 4, "Food")
+    lunch = await create(client, headers, "Lunch", 12, "Food")
+    owner_id = ObjectId(coffee["owner_id"])
+    real_update_many = db_ops.update_many
+
+    async def update_many(db, collection, query, update):
+        # Another request deletes one of the loaded expenses before the update lands
+        await db[EXPENSES_COLLECTION].delete_one({"_id": ObjectId(lunch["id"])})
+        return await real_update_many(db, collection, query, update)
+
+    monkeypatch.setattr(db_ops, "update_many", update_many)
+    response = await client.patch("/api/expenses/batch", headers=headers, json={
+        "ids": [coffee["id"], lunch["id"]], "update": {"category": "Work"},
+    })
+    assert response.status_code == 200
+    assert await category_totals(owner_id) == {"Work": (4, 1)}
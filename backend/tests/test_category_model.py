@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import pytest
+
+from app.database import get_database
+from app.models.schemas import ExpenseCreate, ExpenseUpdate, UserCreate
+from app.services import category_model_service, expense_service, user_service
+from app.services.category_model_service import CATEGORY_MODELS_COLLECTION, RECEIPT_FEATURES_FIELD
+
+pytestmark = pytest.mark.anyio
+
+RECEIPT = "GREEN GROCER\nOrganic apples 3.20\nSourdough loaf 4.10\nTOTAL 7.30"
+
+
+@pytest.fixture
+async def user(client):
+    return await user_service.create_user(get_database(), UserCreate(email="model@example.com", password="test-password"))
+
+
+async def stored_counts(user):
+    doc = await get_database()[CATEGORY_MODELS_COLLECTION].find_one({"_id": user.id})
+    # Forgotten counts stay behind as zeros
+    counts = {
+        key: {bucket: count for bucket, count in buckets.items() if count}
+        for key, buckets in doc.get("counts", {}).items()
+    }
+    examples = {key: count for key, count in doc.get("examples", {}).items() if count}
+    return {key: buckets for key, buckets in counts.items() if buckets}, examples
+
+
+def scanned_expense(**fields):
+    return ExpenseCreate(**{
+        "description": "Green Grocer", "amount": 7.3, "category": "Groceries",
+        "date": datetime(2026, 10, 1), "receipt_text": RECEIPT, **fields,
+    })
+
+
+async def test_receipt_features_are_stored_but_not_listed(user):
+    db = get_database()
+    created = await expense_service.add_expense(db, scanned_expense(), user)
+    stored = await db[expense_service.EXPENSES_COLLECTION].find_one({"_id": created["_id"]})
+    assert "receipt_text" not in stored
+    assert stored[RECEIPT_FEATURES_FIELD] == category_model_service.receipt_features(RECEIPT)
+
+    listed = await expense_service.find_expenses(db, {"owner_id": user.id}).to_list(None)
+    assert RECEIPT_FEATURES_FIELD not in listed[0]
+
+
+async def test_deleting_a_scanned_expense_forgets_its_receipt(user):
+    db = get_database()
+    created = await expense_service.add_expense(db, scanned_expense(), user)
+    await expense_service.delete_expense_by_id(db, str(created["_id"]), user)
+    assert await stored_counts(user) == ({}, {})
+
+
+async def test_recategorising_moves_receipt_features(user):
+    db = get_database()
+    kept = await expense_service.add_expense(db, scanned_expense(category="Food"), user)
+    created = await expense_service.add_expense(db, scanned_expense(), user)
+    await expense_service.update_expense_by_id(db, str(created["_id"]), ExpenseUpdate(category="Food"), user)
+    counts_after_single, examples_after_single = await stored_counts(user)
+
+    await expense_service.update_expenses(db, ExpenseUpdate(category="Groceries"), user, ids=[str(kept["_id"]), str(created["_id"])])
+    await expense_service.delete_expenses(db, user, ids=[str(kept["_id"]), str(created["_id"])])
+
+    # Both expenses, receipt features included, were learned under Food alone
+    food = category_model_service._category_key("Food")
+    assert set(counts_after_single) == {food} and examples_after_single == {food: 2}
+    assert await stored_counts(user) == ({}, {})
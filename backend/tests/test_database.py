@@ -0,0 +1,28 @@
+from pymongo import monitoring
+
+from app import database
+from app.config import settings
+
+
+def test_pool_bounds_are_left_to_the_connection_string_by_default():
+    options = database._client_options()
+    assert "maxPoolSize" not in options and "minPoolSize" not in options
+
+
+def test_pool_bounds_are_passed_when_set(monkeypatch):
+    monkeypatch.setattr(settings, "mongo_max_pool_size", 20)
+    monkeypatch.setattr(settings, "mongo_min_pool_size", 2)
+    options = database._client_options()
+    assert options["maxPoolSize"] == 20 and options["minPoolSize"] == 2
+
+
+def test_utilisation_uses_the_pool_size_the_driver_reports():
+    stats = database.ConnectionPoolStats()
+    address = ("mongo", 27017)
+    # A maxPoolSize from the connection string, which the settings do not know about
+    stats.pool_created(monitoring.PoolCreatedEvent(address, {"maxPoolSize": 4}))
+    stats.connection_check_out_started(monitoring.ConnectionCheckOutStartedEvent(address))
+    stats.connection_checked_out(monitoring.ConnectionCheckedOutEvent(address, 1, 0.001))
+
+    assert stats.stats()["max_pool_size"] == 4
+    assert stats.stats()["utilisation"] == 0.25
@@ -0,0 +1,64 @@
+from datetime import datetime
+
+import pytest
+
+from app.config import settings
+from app.database import get_database
+from app.models.schemas import ExpenseCreate, ExpenseUpdate, UserCreate
+from app.services import db_ops, expense_service, user_service
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user(client):
+    return await user_service.create_user(get_database(), UserCreate(email="calls@example.com", password="test-password"))
+
+
+async def test_expense_writes_are_single_round_trips(user):
+    db = get_database()
+    expense = ExpenseCreate(description="Coffee", amount=5, category="Food", date=datetime(2026, 10, 1))
+
+    with db_ops.count_db_calls() as counter:
+        created = await expense_service.add_expense(db, expense, user)
+    # No read-back of the inserted document
+    assert dict(counter.by_operation) == {
+        "expenses.insert_one": 1,
+        "expense_rollups.bulk_write": 1,
+        "category_models.update_one": 1,
+    }
+
+    with db_ops.count_db_calls() as counter:
+        updated = await expense_service.update_expense_by_id(db, str(created["_id"]), ExpenseUpdate(amount=7), user)
+    assert updated["amount"] == 7
+    # The previous version comes back with the update; the new one is built locally
+    assert dict(counter.by_operation) == {
+        "expenses.find_one_and_update": 1,
+        "expense_rollups.bulk_write": 1,
+    }
+
+    with db_ops.count_db_calls() as counter:
+        assert await expense_service.delete_expense_by_id(db, str(created["_id"]), user)
+    assert dict(counter.by_operation) == {
+        "expenses.find_one_and_delete": 1,
+        "expense_rollups.bulk_write": 1,
+        "category_models.update_one": 1,
+    }
+
+
+async def test_register_is_one_insert(client, monkeypatch):
+    monkeypatch.setattr(settings, "db_calls_header", True)
+    response = await client.post("/api/auth/register", json={"email": "new@example.com", "password": "test-password"})
+    assert response.status_code == 201
+    assert response.headers["X-DB-Calls"] == "1"
+
+    # Duplicates are rejected by the unique index, not by a lookup first
+    response = await client.post("/api/auth/register", json={"email": "new@example.com", "password": "test-password"})
+    assert response.status_code == 400
+    assert response.headers["X-DB-Calls"] == "1"
+
+
+async def test_db_calls_header_is_off_by_default(client):
+    response = await client.post("/api/auth/register", json={"email": "quiet@example.com", "password": "test-password"})
+    assert response.status_code == 201
+    assert "X-DB-Calls" not in response.headers
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.executors import BoundedExecutor, ExecutorBusyError
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def executor():
+    executor = BoundedExecutor("test", lambda workers: ThreadPoolExecutor(max_workers=workers))
+    executor.start(max_workers=1, max_queue=0)
+    yield executor
+    executor.shutdown()
+
+
+async def _until(condition):
+    for _ in range(200):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition never became true")
+
+
+async def test_a_timed_out_job_keeps_its_slot_until_the_worker_finishes(executor):
+    release = threading.Event()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await executor.run(release.wait, timeout=0.05)
+
+    # The worker is still busy with the abandoned job, so nothing more is admitted
+    assert executor.stats()["running"] == 1
+    with pytest.raises(ExecutorBusyError):
+        await executor.run(lambda: None)
+
+    release.set()
+    await _until(lambda: executor.in_flight == 0)
+    assert await executor.run(lambda: "done") == "done"
+
+
+async def test_stats_count_outcomes_separately(executor):
+    def fail():
+        raise ValueError("broken")
+
+    assert await executor.run(lambda: 1) == 1
+    with pytest.raises(ValueError):
+        await executor.run(fail)
+    release = threading.Event()
+    with pytest.raises(asyncio.TimeoutError):
+        await executor.run(release.wait, timeout=0.01)
+    release.set()
+    await _until(lambda: executor.in_flight == 0)
+
+    stats = executor.stats()
+    assert (stats["completed"], stats["failed"], stats["timed_out"]) == (1, 1, 1)
+    assert stats["running"] == stats["queued"] == 0
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app.services import expense_service
+
+pytestmark = pytest.mark.anyio
+
+# Several expenses share a date, so pages must break ties on _id
+DATES = ["2026-10-03", "2026-10-01", "2026-10-02", "2026-10-02", "2026-10-02", "2026-10-01", "2026-10-02"]
+
+
+@pytest.fixture
+async def headers(client, login):
+    headers = await login("pages@example.com")
+    for number, date in enumerate(DATES):
+        response = await client.post("/api/expenses/", headers=headers, json={
+            "description": f"Expense {number}", "amount": number + 1, "category": "Food", "date": date,
+        })
+        response.raise_for_status()
+    return headers
+
+
+def _sort_key(expense):
+    return expense["date"], expense["id"]
+
+
+async def test_listing_is_newest_first_with_ties_broken_by_id(client, headers):
+    expenses = (await client.get("/api/expenses/", headers=headers)).json()
+    assert len(expenses) == len(DATES)
+    assert [_sort_key(expense) for expense in expenses] == sorted(map(_sort_key, expenses), reverse=True)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, len(DATES), len(DATES) + 1])
+async def test_pages_across_equal_dates_skip_and_repeat_nothing(client, headers, limit):
+    everything = (await client.get("/api/expenses/", headers=headers)).json()
+
+    pages, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = await client.get("/api/expenses/", headers=headers, params=params)
+        assert response.status_code == 200
+        pages.append(response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if cursor is None:
+            break
+
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+    assert [expense["id"] for page in pages for expense in page] == [expense["id"] for expense in everything]
+
+
+async def test_stream_resumes_from_a_page_cursor(client, headers):
+    first = await client.get("/api/expenses/", headers=headers, params={"limit": 3})
+    rest = await client.get("/api/expenses/stream", headers=headers, params={"cursor": first.headers["X-Next-Cursor"]})
+    streamed = [json.loads(line) for line in rest.text.splitlines()]
+
+    everything = (await client.get("/api/expenses/", headers=headers)).json()
+    assert [expense["id"] for expense in first.json() + streamed] == [expense["id"] for expense in everything]
+
+
+@pytest.mark.parametrize("cursor", ["not-a-cursor", "W10=", expense_service.encode_cursor({"date": datetime(2026, 1, 1), "_id": "x"})])
+async def test_invalid_cursors_are_rejected(client, headers, cursor):
+    for path in ("/api/expenses/", "/api/expenses/stream"):
+        response = await client.get(path, headers=headers, params={"limit": 2, "cursor": cursor})
+        assert response.status_code == 400
+        assert response.json()["detail"] == "Invalid cursor."
+
+
+def test_cursor_round_trips_the_sort_key():
+    doc = {"date": datetime(2026, 10, 2, 9, 30), "_id": ObjectId()}
+    assert expense_service.decode_cursor(expense_service.encode_cursor(doc)) == (doc["date"], doc["_id"])
@@ -0,0 +1,64 @@
+import pytest
+
+from app.config import settings
+from app.database import get_database
+from app.services.expense_service import EXPENSES_COLLECTION
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def headers(client, login, monkeypatch):
+    # Small batches, so a file that breaks part way has batches committed before it
+    monkeypatch.setattr(settings, "import_batch_size", 10)
+    return await login("import@example.com")
+
+
+def csv_rows(count: int) -> bytes:
+    return "".join(f"2026-10-01,Expense number {row},{row},Food\n" for row in range(1, count + 1)).encode()
+
+
+async def upload(client, headers, content: bytes, filename: str = "expenses.csv"):
+    response = await client.post("/api/expenses/import", headers=headers, files={"file": (filename, content)})
+    assert response.status_code == 200
+    return response.json()
+
+
+async def test_row_errors_are_reported_without_stopping_the_import(client, headers):
+    content = b"date,description,amount,category\n" + csv_rows(3) + b"not-a-date,Bad,1,Food\n2026-10-02,Extra,1,Food,more\n" + csv_rows(2)
+    report = await upload(client, headers, content)
+    assert report["imported"] == 5
+    assert report["failed"] == 2
+    assert [error["row"] for error in report["errors"]] == [4, 5]
+    assert report["errors"][1]["error"] == "Row has more fields than the header."
+    assert report["error"] is None
+
+
+async def test_undecodable_files_keep_the_rows_read_before_the_problem(client, headers):
+    # Well past the text decoder's read size, so earlier rows are parsed and committed first
+    content = b"date,description,amount,category\n" + csv_rows(500) + b"2026-10-01,Caf\xe9,1,Food\n"
+    report = await upload(client, headers, content)
+
+    imported = await get_database()[EXPENSES_COLLECTION].count_documents({})
+    assert imported == report["imported"] > 0
+    assert report["error"].startswith("The file must be UTF-8 encoded. The import stopped after row ")
+
+
+async def test_malformed_csv_stops_with_a_partial_report(client, headers):
+    content = b"date,description,amount,category\n" + csv_rows(25) + b'2026-10-01,"' + b"x" * 200_000 + b'",1,Food\n' + csv_rows(5)
+    report = await upload(client, headers, content)
+
+    assert report["imported"] == 25
+    assert await get_database()[EXPENSES_COLLECTION].count_documents({}) == 25
+    assert report["error"].startswith("Malformed CSV: ")
+    assert report["error"].endswith("The import stopped after row 25.")
+
+
+async def test_ndjson_imports_and_reports_bad_lines(client, headers):
+    content = b'{"date": "2026-10-01", "description": "Lunch", "amount": 12, "category": "Food"}\n\n[1]\n{bad\n'
+    report = await upload(client, headers, content, "expenses.ndjson")
+    assert report["imported"] == 1
+    assert [(error["row"], error["error"]) for error in report["errors"]] == [
+        (3, "Each line must be a JSON object."),
+        (4, "Invalid JSON."),
+    ]
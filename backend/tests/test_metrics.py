@@ -0,0 +1,36 @@
+import pytest
+from bson import ObjectId
+
+from app import metrics
+
+pytestmark = pytest.mark.anyio
+
+
+def recorded_routes(method: str):
+    prefix = f'http_request_duration_seconds_count{{method="{method}",route="'
+    return {line[len(prefix):].split('"')[0] for line in metrics.render().splitlines() if line.startswith(prefix)}
+
+
+async def test_request_latency_is_recorded_by_route_template(client, login):
+    headers = await login("metrics@example.com")
+    await client.delete(f"/api/expenses/{ObjectId()}", headers=headers)
+    # A parameter equal to another segment of the path names only its own segment
+    await client.get("/api/upload/jobs/upload", headers=headers)
+    await client.get("/no/such/route")
+
+    assert "/api/expenses/{expense_id}" in recorded_routes("DELETE")
+    assert {"/api/upload/jobs/{job_id}", "unmatched"} <= recorded_routes("GET")
+    assert not {route for route in recorded_routes("GET") if "upload/jobs/upload" in route or route.startswith("/{")}
+
+
+def test_peak_memory_gauge_is_optional():
+    # resource is Unix only; without it the gauge is simply not registered
+    assert ("process_max_resident_memory_bytes" in metrics.render()) == (metrics.resource is not None)
+
+
+def test_metrics_must_render_their_samples():
+    class Incomplete(metrics.Metric):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "Never registered.")
@@ -0,0 +1,161 @@
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+from app import shared_state
+from app.config import settings
+from app.main import app
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Stands in for the clock the local buckets refill by; advance it with clock.now += seconds."""
+    fake = SimpleNamespace(now=1000.0, time=time.time)
+    fake.monotonic = lambda: fake.now
+    monkeypatch.setattr(shared_state, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def limits(monkeypatch, clock):
+    """One token a second, bursts of three, every route costing one."""
+    monkeypatch.setattr(settings, "rate_limit_enabled", True)
+    monkeypatch.setattr(settings, "rate_limit_shared", False)
+    monkeypatch.setattr(settings, "rate_limit_rate", 1.0)
+    monkeypatch.setattr(settings, "rate_limit_burst", 3.0)
+    monkeypatch.setattr(settings, "rate_limit_route_costs", {})
+
+
+# --- LocalSharedState.take ---
+
+async def test_take_spends_a_full_bucket_then_reports_the_wait(clock):
+    state = shared_state.LocalSharedState()
+    assert [await state.take("key", 1, rate=2, capacity=3) for _ in range(3)] == [0, 0, 0]
+    # Empty: one token arrives in half a second
+    assert await state.take("key", 1, rate=2, capacity=3) == pytest.approx(0.5)
+
+
+async def test_take_refills_at_the_rate_up_to_the_capacity(clock):
+    state = shared_state.LocalSharedState()
+    assert await state.take("key", 3, rate=1, capacity=3) == 0
+
+    clock.now += 2
+    assert await state.take("key", 3, rate=1, capacity=3) == pytest.approx(1)
+    # A refused take spends nothing
+    clock.now += 1
+    assert await state.take("key", 3, rate=1, capacity=3) == 0
+
+    # Idle time beyond a full bucket is not banked
+    clock.now += 100
+    assert await state.take("key", 3, rate=1, capacity=3) == 0
+    assert await state.take("key", 1, rate=1, capacity=3) > 0
+
+
+async def test_take_keeps_buckets_apart(clock):
+    state = shared_state.LocalSharedState()
+    assert await state.take("a", 2, rate=1, capacity=2) == 0
+    assert await state.take("b", 2, rate=1, capacity=2) == 0
+    assert await state.take("a", 1, rate=1, capacity=2) > 0
+
+
+async def test_take_evicts_the_least_recently_used_bucket(clock, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_max_buckets", 2)
+    state = shared_state.LocalSharedState()
+    assert await state.take("a", 2, rate=1, capacity=2) == 0
+    assert await state.take("a", 1, rate=1, capacity=2) > 0
+    await state.take("b", 1, rate=1, capacity=2)
+    await state.take("c", 1, rate=1, capacity=2)
+
+    # "a" was evicted, so it starts again from a full bucket
+    assert await state.take("a", 2, rate=1, capacity=2) == 0
+
+
+async def test_shared_buckets_are_spent_by_every_worker(clock):
+    clock.time = lambda: clock.now
+    db = AsyncMongoMockClient()["rate_limit_test"]
+    workers = [shared_state.MongoSharedState(db), shared_state.MongoSharedState(db)]
+    assert await workers[0].take("key", 2, rate=1, capacity=3) == 0
+    assert await workers[1].take("key", 2, rate=1, capacity=3) == pytest.approx(1)
+
+    clock.now += 1
+    assert await workers[1].take("key", 2, rate=1, capacity=3) == 0
+    assert await workers[0].take("key", 1, rate=1, capacity=3) == pytest.approx(1)
+
+
+# --- The middleware ---
+
+async def test_burst_then_429_with_retry_after_then_refill(client, login, limits, clock):
+    headers = await login("limited@example.com")
+    clock.now += 10
+
+    for _ in range(3):
+        assert (await client.get("/api/expenses/", headers=headers)).status_code == 200
+    response = await client.get("/api/expenses/", headers=headers)
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+
+    clock.now += 1
+    assert (await client.get("/api/expenses/", headers=headers)).status_code == 200
+    assert (await client.get("/api/expenses/", headers=headers)).status_code == 429
+
+
+async def test_route_costs_are_taken_per_route(client, login, limits, monkeypatch, clock):
+    headers = await login("costly@example.com")
+    clock.now += 10
+    monkeypatch.setattr(settings, "rate_limit_route_costs", {"GET /api/expenses/": 2})
+
+    assert (await client.get("/api/expenses/", headers=headers)).status_code == 200
+    response = await client.get("/api/expenses/", headers=headers)
+    assert response.status_code == 429
+    # One token left, two needed
+    assert response.headers["Retry-After"] == "1"
+
+
+async def test_auth_routes_are_limited_by_ip(client, login, limits, clock):
+    headers = await login("by-ip@example.com")
+    clock.now += 10
+
+    for _ in range(3):
+        response = await client.post("/api/auth/token", json={"email": "by-ip@example.com", "password": "wrong-password"})
+        assert response.status_code == 401
+    # A token does not move auth requests to the user's bucket
+    response = await client.post("/api/auth/token", json={"email": "by-ip@example.com", "password": "wrong-password"}, headers=headers)
+    assert response.status_code == 429
+
+    # The user's own bucket is untouched
+    assert (await client.get("/api/expenses/", headers=headers)).status_code == 200
+    # And another address has its own
+    transport = httpx.ASGITransport(app=app, client=("198.51.100.20", 50000))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as other_client:
+        response = await other_client.post("/api/auth/token", json={"email": "by-ip@example.com", "password": "wrong-password"})
+        assert response.status_code == 401
+
+
+async def test_probes_scrapes_and_preflights_are_exempt(client, limits):
+    for _ in range(3):
+        await client.get("/")
+    assert (await client.get("/")).status_code == 429
+
+    assert (await client.get("/health/ready")).status_code == 200
+    assert (await client.get("/metrics")).status_code == 200
+    preflight = await client.options("/", headers={"Origin": "http://localhost:5173", "Access-Control-Request-Method": "GET"})
+    assert preflight.status_code == 200
+
+
+async def test_429_carries_cors_headers(client, limits):
+    for _ in range(3):
+        await client.get("/")
+    response = await client.get("/", headers={"Origin": "http://localhost:5173"})
+    assert response.status_code == 429
+    assert "access-control-allow-origin" in response.headers
+
+
+async def test_disabled_limits_let_everything_through(client, limits, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    for _ in range(10):
+        assert (await client.get("/")).status_code == 200
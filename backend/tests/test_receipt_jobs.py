@@ -0,0 +1,26 @@
+import pytest
+
+from app.config import settings
+from app.database import get_database
+from app.services.job_service import OCR_JOBS_COLLECTION
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_oversized_images_are_refused_before_they_are_queued(client, login, monkeypatch):
+    monkeypatch.setattr(settings, "ocr_max_upload_bytes", 1024)
+    headers = await login("jobs@example.com")
+
+    response = await client.post(
+        "/api/upload/jobs", headers=headers,
+        files={"file": ("receipt.png", b"x" * 1025, "image/png")},
+    )
+    assert response.status_code == 413
+    assert await get_database()[OCR_JOBS_COLLECTION].count_documents({}) == 0
+
+    response = await client.post(
+        "/api/upload/jobs", headers=headers,
+        files={"file": ("receipt.png", b"x" * 1024, "image/png")},
+    )
+    assert response.status_code == 202
+    assert await get_database()[OCR_JOBS_COLLECTION].count_documents({}) == 1
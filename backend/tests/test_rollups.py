@@ -0,0 +1,126 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from app import shared_state
+from app.database import get_database
+from app.services import db_ops, rollup_service
+from app.services.expense_service import EXPENSES_COLLECTION
+from app.services.rollup_service import EXPENSE_ROLLUPS_COLLECTION
+
+pytestmark = pytest.mark.anyio
+
+
+async def buckets(owner_id=None):
+    """Non-empty rollup buckets as {(month, category): (total, count)}."""
+    query = {"count": {"$ne": 0}, **({"owner_id": owner_id} if owner_id is not None else {})}
+    return {
+        (f"{doc['month']:%Y-%m}", doc["category"]): (round(doc["total"], 2), doc["count"])
+        async for doc in get_database()[EXPENSE_ROLLUPS_COLLECTION].find(query)
+    }
+
+
+@pytest.fixture
+async def headers(client, login):
+    return await login("rollups@example.com")
+
+
+async def create(client, headers, amount, category, date):
+    response = await client.post("/api/expenses/", headers=headers, json={
+        "description": "Expense", "amount": amount, "category": category, "date": date,
+    })
+    response.raise_for_status()
+    return response.json()
+
+
+async def test_writes_keep_the_rollups_in_step(client, headers):
+    coffee = await create(client, headers, 4.5, "Food", "2026-09-03")
+    await create(client, headers, 10, "Food", "2026-09-20")
+    await create(client, headers, 30, "Travel", "2026-10-01")
+    assert await buckets() == {("2026-09", "Food"): (14.5, 2), ("2026-10", "Travel"): (30, 1)}
+
+    # A new amount stays in its bucket
+    await client.put(f"/api/expenses/{coffee['id']}", headers=headers, json={"amount": 5.5})
+    assert await buckets() == {("2026-09", "Food"): (15.5, 2), ("2026-10", "Travel"): (30, 1)}
+
+    # A new category or month moves it to another bucket
+    await client.put(f"/api/expenses/{coffee['id']}", headers=headers, json={"category": "Travel", "date": "2026-10-02"})
+    assert await buckets() == {("2026-09", "Food"): (10, 1), ("2026-10", "Travel"): (35.5, 2)}
+
+    response = await client.delete(f"/api/expenses/{coffee['id']}", headers=headers)
+    assert response.status_code == 204
+    assert await buckets() == {("2026-09", "Food"): (10, 1), ("2026-10", "Travel"): (30, 1)}
+    assert await rollup_service.find_rollup_drift(get_database()) == []
+
+
+async def test_rebuild_repairs_one_users_drift_in_place(client, headers, login, monkeypatch):
+    mine = await create(client, headers, 10, "Food", "2026-09-03")
+    await create(client, headers, 20, "Food", "2026-10-03")
+    theirs = await create(client, await login("other@example.com"), 5, "Food", "2026-09-03")
+    owner_id, other_id = ObjectId(mine["owner_id"]), ObjectId(theirs["owner_id"])
+
+    rollups = get_database()[EXPENSE_ROLLUPS_COLLECTION]
+    # Drift: a wrong total, a missing bucket and a bucket with no expenses behind it
+    await rollups.update_one({"owner_id": owner_id, "category": "Food", "count": 1, "total": 10}, {"$set": {"total": 99}})
+    await rollups.delete_one({"owner_id": owner_id, "total": 20})
+    await rollups.insert_one({"owner_id": owner_id, "month": datetime(2026, 8, 1), "category": "Gone", "total": 7, "count": 1})
+    await rollups.update_one({"owner_id": other_id}, {"$set": {"total": 50}})
+    assert len(await rollup_service.find_rollup_drift(get_database(), owner_id)) == 3
+
+    # Readers must never find the user's totals missing while the rebuild writes
+    seen = []
+    real_bulk_write = db_ops.bulk_write
+
+    async def bulk_write(db, collection, operations, ordered=True):
+        seen.append(await buckets(owner_id))
+        return await real_bulk_write(db, collection, operations, ordered)
+
+    monkeypatch.setattr(db_ops, "bulk_write", bulk_write)
+    await rollup_service.rebuild_rollups(get_database(), owner_id)
+
+    assert seen and all(seen)
+    assert await buckets(owner_id) == {("2026-09", "Food"): (10, 1), ("2026-10", "Food"): (20, 1)}
+    assert await rollups.count_documents({rollup_service.STALE_FIELD: {"$exists": True}}) == 0
+    # Other users' buckets are left alone
+    assert await buckets(other_id) == {("2026-09", "Food"): (50, 1)}
+
+
+async def test_rebuild_writes_in_batches(client, headers, monkeypatch):
+    for month in range(1, 6):
+        await create(client, headers, month, "Food", f"2026-{month:02}-01")
+    await get_database()[EXPENSE_ROLLUPS_COLLECTION].delete_many({})
+    monkeypatch.setattr(rollup_service, "REBUILD_BATCH_SIZE", 2)
+
+    with db_ops.count_db_calls() as counter:
+        await rollup_service.rebuild_rollups(get_database())
+    assert counter.by_operation["expense_rollups.bulk_write"] == 3
+    assert len(await buckets()) == 5
+
+
+async def test_backfill_builds_missing_rollups_once(client, headers, monkeypatch):
+    await create(client, headers, 10, "Food", "2026-09-03")
+    db = get_database()
+    await db[EXPENSE_ROLLUPS_COLLECTION].delete_many({})
+
+    # Another worker is already backfilling
+    assert await shared_state.state.try_lock(rollup_service.BACKFILL_LOCK, 60)
+    await rollup_service.backfill_if_empty(db)
+    assert await buckets() == {}
+    await shared_state.state.unlock(rollup_service.BACKFILL_LOCK)
+
+    await rollup_service.backfill_if_empty(db)
+    assert await buckets() == {("2026-09", "Food"): (10, 1)}
+    # The lock is released for the next startup
+    assert await shared_state.state.try_lock(rollup_service.BACKFILL_LOCK, 60)
+
+    # Existing rollups are never rebuilt on startup
+    with db_ops.count_db_calls() as counter:
+        await rollup_service.backfill_if_empty(db)
+    assert dict(counter.by_operation) == {"expense_rollups.find_one": 1}
+
+
+async def test_backfill_skips_an_empty_database(client):
+    await rollup_service.backfill_if_empty(get_database())
+    assert await get_database()[EXPENSES_COLLECTION].count_documents({}) == 0
+    assert await buckets() == {}
@@ -0,0 +1,46 @@
+import os
+import sys
+
+import pytest
+
+from app import serve
+from app.config import get_settings, settings
+
+
+@pytest.fixture
+def start(monkeypatch):
+    """Runs `python -m app.serve` with the given arguments, up to where uvicorn would start."""
+    started = {}
+
+    def run_api(workers, host, port):
+        started.update(workers=workers, backend=os.environ.get("SHARED_STATE_BACKEND"))
+
+    monkeypatch.setattr(serve, "run_api", run_api)
+    monkeypatch.setattr(serve, "start_ocr_worker", lambda: None)
+    explicitly_set = get_settings().model_fields_set
+    saved = set(explicitly_set)
+
+    def start(*argv):
+        monkeypatch.setattr(sys, "argv", ["app.serve", *argv])
+        serve.main()
+        return started
+
+    yield start
+    os.environ.pop("SHARED_STATE_BACKEND", None)
+    explicitly_set.clear()
+    explicitly_set.update(saved)
+
+
+def test_several_workers_share_state_through_mongo_by_default(start):
+    assert "shared_state_backend" not in get_settings().model_fields_set
+    assert start("--workers", "4") == {"workers": 4, "backend": "mongo"}
+
+
+def test_one_worker_keeps_local_state(start):
+    assert start("--workers", "1") == {"workers": 1, "backend": None}
+
+
+def test_several_workers_with_local_state_are_refused(start, monkeypatch):
+    monkeypatch.setattr(settings, "shared_state_backend", "local")
+    with pytest.raises(SystemExit):
+        start("--workers", "2")
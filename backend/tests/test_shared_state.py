@@ -0,0 +1,158 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from app import shared_state
+from app.config import settings
+from app.services import db_ops, insights_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def mongo_db(monkeypatch):
+    real_command = db_ops.command
+
+    async def command(db, name, *args, **kwargs):
+        # mongomock has no hello; sync positions come from its clock, as updated_at does
+        if name == "hello":
+            return {"localTime": datetime.utcnow()}
+        return await real_command(db, name, *args, **kwargs)
+
+    monkeypatch.setattr(db_ops, "command", command)
+    return AsyncMongoMockClient()["shared_state_test"]
+
+
+@pytest.fixture
+async def mongo_state(mongo_db, monkeypatch):
+    """This process's shared state on the mongo backend, syncing every 10ms."""
+    monkeypatch.setattr(settings, "shared_state_backend", "mongo")
+    monkeypatch.setattr(settings, "shared_state_sync_seconds", 0.01)
+    monkeypatch.setattr(shared_state, "state", shared_state.local_state)
+    await shared_state.start(mongo_db)
+    yield shared_state.state
+    await shared_state.stop()
+
+
+async def other_worker(db) -> shared_state.MongoSharedState:
+    """The same store as another worker process sees it."""
+    state = shared_state.MongoSharedState(db)
+    await state.start()
+    return state
+
+
+async def wait_for(condition, timeout: float = 2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "condition not met in time"
+        await asyncio.sleep(0.01)
+
+
+async def test_workers_share_one_epoch(mongo_db, mongo_state):
+    assert isinstance(mongo_state, shared_state.MongoSharedState)
+    assert (await other_worker(mongo_db)).epoch == mongo_state.epoch
+    # A fresh store is a different epoch
+    assert (await other_worker(AsyncMongoMockClient()["another"])).epoch != mongo_state.epoch
+
+
+async def test_counters_are_shared(mongo_db, mongo_state):
+    other = await other_worker(mongo_db)
+    assert await mongo_state.incr("test:a") == 1
+    assert await other.incr("test:a") == 2
+    assert await mongo_state.get("test:a") == 2
+    assert await other.get("test:missing") == 0
+
+
+async def test_mirrors_converge_through_the_sync_loop(mongo_db, mongo_state):
+    generations = shared_state.Generations("sync-test")
+    other = await other_worker(mongo_db)
+
+    # Bumps from this process are seen at once
+    assert await generations.bump("key") == 1
+    assert generations.get("key") == 1
+
+    # Another worker's bumps arrive with the next sync
+    await other.incr("sync-test:key")
+    await other.incr("sync-test:other-key")
+    await wait_for(lambda: generations.get("key") == 2 and generations.get("other-key") == 1)
+
+
+async def test_current_sees_other_workers_bumps_without_waiting(mongo_db, mongo_state, monkeypatch):
+    # No sync loop: only current() can learn about the other worker's bump
+    await shared_state.stop()
+    generations = shared_state.Generations("current-test")
+    other = await other_worker(mongo_db)
+
+    await other.incr("current-test:key")
+    assert generations.get("key") == 0
+    assert await generations.current("key") == 1
+    assert generations.get("key") == 1
+
+
+async def test_mirrors_never_go_backwards(mongo_state):
+    generations = shared_state.Generations("backwards-test")
+    generations._observe("key", 5)
+    generations._observe("key", 3)
+    assert generations.get("key") == 5
+
+
+async def test_insights_etag_follows_other_workers_writes(mongo_db, mongo_state):
+    user_id = ObjectId()
+    other = await other_worker(mongo_db)
+    etag = insights_cache.etag_for(user_id, "summary")
+    assert insights_cache.etag_for(user_id, "summary") == etag
+
+    # Another worker records an expense write for the user
+    await other.incr(f"insights:{user_id}")
+    await insights_cache.refresh_generation(user_id)
+    assert insights_cache.etag_for(user_id, "summary") != etag
+
+
+async def test_etag_changes_with_the_epoch(monkeypatch):
+    user_id = ObjectId()
+    first = shared_state.LocalSharedState()
+    monkeypatch.setattr(shared_state, "state", first)
+    etag = insights_cache.etag_for(user_id, "summary")
+
+    # A fresh store restarts generations at zero; the same generation must not give the same ETag
+    monkeypatch.setattr(shared_state, "state", shared_state.LocalSharedState())
+    assert insights_cache.get_generation(user_id) == 0
+    assert insights_cache.etag_for(user_id, "summary") != etag
+
+
+async def test_locks_are_exclusive_between_workers(mongo_db, mongo_state):
+    other = await other_worker(mongo_db)
+    assert await mongo_state.try_lock("job", 60)
+    assert not await other.try_lock("job", 60)
+    assert not await mongo_state.try_lock("job", 60)
+    assert await other.try_lock("another-job", 60)
+
+    await mongo_state.unlock("job")
+    assert await other.try_lock("job", 60)
+
+
+async def test_expired_locks_can_be_taken_again(mongo_db, mongo_state):
+    other = await other_worker(mongo_db)
+    assert await mongo_state.try_lock("job", -1)
+    assert await other.try_lock("job", 60)
+
+    local = shared_state.LocalSharedState()
+    assert await local.try_lock("job", -1)
+    assert await local.try_lock("job", 60)
+    assert not await local.try_lock("job", 60)
+    await local.unlock("job")
+    assert await local.try_lock("job", 60)
+
+
+def test_backends_must_implement_the_interface():
+    class Incomplete(shared_state.SharedState):
+        async def incr(self, key: str, amount: int = 1) -> int:
+            return 0
+
+    with pytest.raises(TypeError):
+        Incomplete()
+    with pytest.raises(TypeError):
+        insights_cache.InsightsCacheBackend()